@@ -3,18 +3,27 @@ import math
 import time
 import json
 from Connect4 import Connect4
+from tree_capture import CapturePolicy, KEEP_SUBTREE, KEEP_NONE, research_pv
+from search_stats import SearchStats
+from transposition import BEST_MOVE, TERMINAL_DEPTH, EXACT, bound_type
+from search_control import best_move_async, memory_checked
 
 
 class Connect4AI_TreeSaver:
-    def __init__(self, game, max_depth=4):
+    def __init__(self, game, max_depth=4, tt=None):
         """
         game: instance of Connect4 class
         max_depth: how deep minimax will search
+        tt: optional TranspositionTable kept between moves
         """
         self.game = game
         self.max_depth = max_depth
+        self.tt = tt
         self.tree_data = None
         self.node_id_counter = 0
+        self.capture = CapturePolicy()
+        self.stats = SearchStats(pruning=True)
+        self.control = None  # optional SearchControl for cancellation
 
     def get_valid_moves(self, board):
         moves = []
@@ -67,42 +76,74 @@ class Connect4AI_TreeSaver:
             result.append(''.join(row))
         return '\n'.join(result)
 
-    def minimax(self, board, depth, alpha, beta, maximizing, move=None, parent_id=None):
-        """Minimax with tree structure capture"""
-        
+    def minimax(self, board, depth, alpha, beta, maximizing, move=None, parent_id=None, keep=KEEP_SUBTREE):
+        """Minimax with tree structure capture; keep: what the capture keeps of this node"""
+        if self.control is not None:
+            self.control.check()
+        self.stats.node(depth, 'MAX' if maximizing else 'MIN')
+
         # Create node
         node_id = self.node_id_counter
         self.node_id_counter += 1
-        
-        node = {
-            'id': node_id,
-            'parent_id': parent_id,
-            'depth': depth,
-            'move': move,
-            'node_type': 'MAX' if maximizing else 'MIN',
-            'alpha': alpha if alpha != -math.inf else None,
-            'beta': beta if beta != math.inf else None,
-            'board_state': self.board_to_string(board),
-            'children': [],
-            'value': None,
-            'best_move': None,
-            'terminal': False,
-            'pruned': False
-        }
+
+        node = None
+        ply = self.max_depth - depth
+        recorded_start = self.capture.recorded_nodes
+        if self.capture.should_record(ply, keep):
+            node = {
+                'id': node_id,
+                'parent_id': parent_id,
+                'depth': depth,
+                'move': move,
+                'node_type': 'MAX' if maximizing else 'MIN',
+                'alpha': alpha if alpha != -math.inf else None,
+                'beta': beta if beta != math.inf else None,
+                'board_state': self.board_to_string(board),
+                'children': [],
+                'value': None,
+                'best_move': None,
+                'terminal': False,
+                'pruned': False
+            }
+            self.capture.record(node)
+
+        # A stored result may settle this node (never the root, it needs a move)
+        tt_key = None
+        tt_move = None
+        if self.tt is not None:
+            tt_key = self.tt.key(board, maximizing)
+            entry = self.tt.probe(tt_key, depth)
+            if entry is not None:
+                tt_move = entry[BEST_MOVE]
+                value = self.tt.cutoff(entry, depth, alpha, beta)
+                if value is not None and ply > 0:
+                    self.stats.tt_hits += 1
+                    if node is not None:
+                        node['terminal'] = True
+                        node['terminal_type'] = 'TT'
+                        node['value'] = value
+                        node['best_move'] = tt_move
+                    return node, value
+        alpha_start, beta_start = alpha, beta
         
         # Check terminal state
         terminal, winner = self.is_terminal(board)
         
         if terminal:
-            node['terminal'] = True
-            node['terminal_type'] = 'WIN' if winner else 'DRAW'
             if winner == 1:
-                node['value'] = 10**9
+                value = 10**9
             elif winner == 2:
-                node['value'] = -10**9
+                value = -10**9
             else:
-                node['value'] = 0
-            return node, node['value']
+                value = 0
+            self.stats.terminal_hits += 1
+            if tt_key is not None:
+                self.tt.store(tt_key, TERMINAL_DEPTH, value, EXACT)
+            if node is not None:
+                node['terminal'] = True
+                node['terminal_type'] = 'WIN' if winner else 'DRAW'
+                node['value'] = value
+            return node, value
 
         # Check depth limit
         if depth == 0:
@@ -110,14 +151,25 @@ class Connect4AI_TreeSaver:
             self.game.board = board
             value = self.game.advanced_dynamic_heuristic()
             self.game.board = old_board
-            
-            node['terminal'] = True
-            node['terminal_type'] = 'LEAF'
-            node['value'] = value
+            self.stats.leaf_evals += 1
+            if tt_key is not None:
+                self.tt.store(tt_key, 0, value, EXACT)
+
+            if node is not None:
+                node['terminal'] = True
+                node['terminal_type'] = 'LEAF'
+                node['value'] = value
             return node, value
 
         valid_moves = self.get_valid_moves(board)
-        node['valid_moves'] = valid_moves
+        # Search the stored best move first
+        if tt_move in valid_moves:
+            valid_moves.remove(tt_move)
+            valid_moves.insert(0, tt_move)
+        if node is not None:
+            node['valid_moves'] = valid_moves
+        else:
+            keep = KEEP_NONE
 
         if maximizing:
             best_val = -math.inf
@@ -125,9 +177,11 @@ class Connect4AI_TreeSaver:
 
             for i, child_move in enumerate(valid_moves):
                 new_b = self.simulate_move(board, child_move, 1)
-                child_node, eval_val = self.minimax(new_b, depth - 1, alpha, beta, False, child_move, node_id)
+                child_node, eval_val = self.minimax(new_b, depth - 1, alpha, beta, False, child_move, node_id,
+                                                    self.capture.keep_child(keep, i == 0))
                 
-                node['children'].append(child_node)
+                if node is not None and child_node is not None:
+                    node['children'].append(child_node)
 
                 if eval_val > best_val:
                     best_val = eval_val
@@ -137,10 +191,15 @@ class Connect4AI_TreeSaver:
                 
                 # Mark pruning
                 if beta <= alpha:
+                    self.stats.cutoff(i, len(valid_moves) - i - 1)
                     # Mark remaining moves as pruned
                     for pruned_move in valid_moves[i+1:]:
+                        pruned_id = self.node_id_counter
+                        self.node_id_counter += 1
+                        if node is None or not self.capture.should_record(ply + 1, self.capture.keep_child(keep, False)):
+                            continue
                         pruned_node = {
-                            'id': self.node_id_counter,
+                            'id': pruned_id,
                             'parent_id': node_id,
                             'depth': depth - 1,
                             'move': pruned_move,
@@ -150,23 +209,21 @@ class Connect4AI_TreeSaver:
                             'beta': beta,
                             'children': []
                         }
-                        self.node_id_counter += 1
+                        self.capture.record(pruned_node)
                         node['children'].append(pruned_node)
                     break
 
-            node['value'] = best_val
-            node['best_move'] = best_move
-            return node, best_val
-
         else:
             best_val = math.inf
             best_move = None
 
             for i, child_move in enumerate(valid_moves):
                 new_b = self.simulate_move(board, child_move, 2)
-                child_node, eval_val = self.minimax(new_b, depth - 1, alpha, beta, True, child_move, node_id)
+                child_node, eval_val = self.minimax(new_b, depth - 1, alpha, beta, True, child_move, node_id,
+                                                    self.capture.keep_child(keep, i == 0))
                 
-                node['children'].append(child_node)
+                if node is not None and child_node is not None:
+                    node['children'].append(child_node)
 
                 if eval_val < best_val:
                     best_val = eval_val
@@ -176,10 +233,15 @@ class Connect4AI_TreeSaver:
                 
                 # Mark pruning
                 if beta <= alpha:
+                    self.stats.cutoff(i, len(valid_moves) - i - 1)
                     # Mark remaining moves as pruned
                     for pruned_move in valid_moves[i+1:]:
+                        pruned_id = self.node_id_counter
+                        self.node_id_counter += 1
+                        if node is None or not self.capture.should_record(ply + 1, self.capture.keep_child(keep, False)):
+                            continue
                         pruned_node = {
-                            'id': self.node_id_counter,
+                            'id': pruned_id,
                             'parent_id': node_id,
                             'depth': depth - 1,
                             'move': pruned_move,
@@ -189,17 +251,37 @@ class Connect4AI_TreeSaver:
                             'beta': beta,
                             'children': []
                         }
-                        self.node_id_counter += 1
+                        self.capture.record(pruned_node)
                         node['children'].append(pruned_node)
                     break
 
+        if tt_key is not None:
+            self.tt.store(tt_key, depth, best_val, bound_type(best_val, alpha_start, beta_start), best_move)
+
+        if node is not None:
             node['value'] = best_val
             node['best_move'] = best_move
-            return node, best_val
+            if self.capture.research_best(node, keep):
+                research_pv(self, node, lambda: self.minimax(
+                    self.simulate_move(board, best_move, 1 if maximizing else 2), depth - 1,
+                    alpha_start, beta_start, not maximizing, best_move, node_id)[0])
+            node['searched_subtree'] = self.node_id_counter - node_id
+            self.capture.finish_node(node)
+            node['recorded_subtree'] = self.capture.recorded_nodes - recorded_start
+        return node, best_val
+
+    def best_move(self, capture=None):
+        """
+        Get the best move and save the tree
 
-    def best_move(self):
-        """Get the best move and save the tree"""
+        capture: optional CapturePolicy limiting which nodes are recorded
+        """
         self.node_id_counter = 0
+        self.capture = capture if capture is not None else CapturePolicy()
+        self.capture.reset()
+        self.stats.reset()
+        if self.tt is not None:
+            self.tt.new_search(self.game.board)
         
         print("\n" + "="*60)
         print("Running Minimax and saving tree...")
@@ -207,15 +289,20 @@ class Connect4AI_TreeSaver:
         
         start_time = time.time()
         
-        tree_root, value = self.minimax(
-            board=self.game.board,
-            depth=self.max_depth,
-            alpha=-math.inf,
-            beta=math.inf,
-            maximizing=(self.game.turn == 1),
-            move=None,
-            parent_id=None
-        )
+        self.capture.begin_search()
+        try:
+            with memory_checked(self):
+                tree_root, value = self.minimax(
+                    board=self.game.board,
+                    depth=self.max_depth,
+                    alpha=-math.inf,
+                    beta=math.inf,
+                    maximizing=(self.game.turn == 1),
+                    move=None,
+                    parent_id=None
+                )
+        finally:
+            self.capture.end_search()
         
         elapsed = time.time() - start_time
         
@@ -231,7 +318,11 @@ class Connect4AI_TreeSaver:
                 'computation_time': elapsed,
                 'current_turn': self.game.turn,
                 'board_width': self.game.width,
-                'board_height': self.game.length
+                'board_height': self.game.length,
+                'capture': self.capture.summary(),
+                'peak_memory': self.capture.peak_memory(),
+                'search_stats': self.stats.summary(),
+                'transposition': self.tt.summary() if self.tt is not None else None
             }
         }
         
@@ -240,8 +331,18 @@ class Connect4AI_TreeSaver:
         print(f"Time: {elapsed:.3f} seconds")
         print("="*60 + "\n")
 
+        if tree_root['best_move'] is None:
+            valid = self.get_valid_moves(self.game.board)
+            if valid:
+                return valid[0]
+            return 0
+
         return tree_root['best_move']
 
+    async def best_move_async(self, deadline=None, executor=None, **kwargs):
+        """Search off the event loop; returns the best move so far at the deadline or on cancel"""
+        return await best_move_async(self, deadline, executor, **kwargs)
+
     def save_tree_to_json(self, filename='minimax_tree.json'):
         """Save the tree to a JSON file"""
         if self.tree_data is None:
@@ -275,39 +376,10 @@ class Connect4AI_TreeSaver:
             return False
 
     def get_tree_stats(self):
-        """Get statistics about the tree"""
+        """Get statistics about the last search, counted while searching"""
         if self.tree_data is None:
             return None
-        
-        def count_nodes(node, stats):
-            if node.get('pruned', False):
-                stats['pruned'] += 1
-                return
-            
-            stats['total'] += 1
-            
-            if node.get('terminal', False):
-                stats['terminal'] += 1
-            
-            if node['node_type'] == 'MAX':
-                stats['max_nodes'] += 1
-            else:
-                stats['min_nodes'] += 1
-            
-            for child in node.get('children', []):
-                count_nodes(child, stats)
-        
-        stats = {
-            'total': 0,
-            'max_nodes': 0,
-            'min_nodes': 0,
-            'terminal': 0,
-            'pruned': 0
-        }
-        
-        count_nodes(self.tree_data['root'], stats)
-        
-        return stats
+        return dict(self.tree_data['metadata']['search_stats'])
 
 
 if __name__ == "__main__":
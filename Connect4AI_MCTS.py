@@ -0,0 +1,590 @@
+import math
+import random
+import time
+import json
+from Connect4 import Connect4
+from tree_capture import CapturePolicy, KEEP_SUBTREE
+from search_stats import SearchStats
+from search_control import best_move_async
+
+# Disc slip model of Connect4AI_Expectiminimax.expectation_value:
+# (offset from the chosen column, probability)
+SLIP_MODEL = ((0, 0.6), (-1, 0.2), (1, 0.2))
+
+
+class MCTSNode:
+    # Thousands of nodes are made per move, so keep them small
+    __slots__ = ('move', 'mover', 'chance', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, mover, untried=None, chance=False):
+        """
+        move: column that led here (the chosen column for a CHANCE node,
+              the column the disc landed in otherwise)
+        mover: player who made that move; wins are counted for them
+        untried: columns not expanded yet (MAX/MIN nodes)
+        chance: the move was chosen but the disc has not landed yet
+        """
+        self.move = move
+        self.mover = mover
+        self.chance = chance
+        self.children = {}
+        self.untried = untried if untried is not None else []
+        self.visits = 0
+        self.wins = 0.0
+
+
+class MCTSTree:
+    def __init__(self):
+        """
+        Search tree kept between moves, like a TranspositionTable.
+
+        Pass the same tree to every search of the game. A search starts
+        from the node of the current position if the tree already has it
+        (e.g. the position after the opponent's reply), keeping the
+        playouts made under it; the rest of the tree is dropped.
+        """
+        self.root = None
+        self.cells = None
+        self.slip = None
+        self.reused = 0
+        self.searches = 0
+
+    def find(self, cells, player, height, slip):
+        """
+        The node of the position in cells with player to move, searched
+        below the current root; becomes the new root. Returns the root and
+        whether it came from the previous search.
+        """
+        self.searches += 1
+        node = None
+        if self.root is not None and self.slip == slip:
+            node = self.descend(self.root, list(self.cells), cells, player, height)
+
+        reused = node is not None
+        if node is None:
+            node = MCTSNode(None, 3 - player, open_columns(cells, height))
+        else:
+            self.reused += 1
+
+        self.root = node
+        self.cells = tuple(cells)
+        self.slip = slip
+        return node, reused
+
+    def descend(self, node, board, target, player, height):
+        if board == target:
+            return node if node.mover != player else None
+
+        # Discs never move, so follow only the children whose disc is in target.
+        # With slip several chosen columns can land the same disc: keep the
+        # most played node
+        best = None
+        for child in node.children.values():
+            outcomes = child.children.values() if child.chance else (child,)
+            for landed in outcomes:
+                col = landed.move
+                row = sum(1 for r in range(height) if board[col * height + r] != 0)
+                if row == height or target[col * height + row] != landed.mover:
+                    continue
+                board[col * height + row] = landed.mover
+                found = self.descend(landed, board, target, player, height)
+                board[col * height + row] = 0
+                if found is not None and (best is None or found.visits > best.visits):
+                    best = found
+        return best
+
+    def clear(self):
+        self.root = None
+        self.cells = None
+
+    def summary(self):
+        return {
+            'searches': self.searches,
+            'reused': self.reused,
+            'root_visits': self.root.visits if self.root is not None else 0
+        }
+
+
+def open_columns(cells, height):
+    return [c for c in range(len(cells) // height) if cells[c * height + height - 1] == 0]
+
+
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        count += 1
+        stack.extend(current.children.values())
+    return count
+
+
+def board_lines(width, height):
+    """
+    Cell indices of every line of 4 or more cells, in the four directions
+    Connect4.calculate_score() counts: horizontal, vertical and both diagonals
+    """
+    lines = []
+    for dc, dr in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        for c in range(width):
+            for r in range(height):
+                # Only start where the line enters the board
+                if 0 <= c - dc < width and 0 <= r - dr < height:
+                    continue
+                line = []
+                x, y = c, r
+                while 0 <= x < width and 0 <= y < height:
+                    line.append(x * height + y)
+                    x += dc
+                    y += dr
+                if len(line) >= 4:
+                    lines.append(line)
+    return lines
+
+
+class Connect4AI_MCTS:
+    def __init__(self, game, max_depth=4, playouts=2000, time_limit=None, slip=False,
+                 exploration=1.4, tree=None, seed=None):
+        """
+        game: instance of Connect4 class
+        max_depth: search effort; the search runs until the root has
+                   max_depth * playouts playouts, counting the ones kept
+                   from earlier searches. Iterative deepening therefore
+                   grows one tree in steps instead of starting over
+        playouts: random playouts per unit of max_depth
+        time_limit: optional seconds of playouts per best_move() call (the
+                    tree_data export comes on top); the search also stops
+                    when its SearchControl is stopped
+        slip: play with the disc slip model of Connect4AI_Expectiminimax
+              (60% chosen column, 20% each neighbour); every move in the
+              tree and in the playouts samples where the disc lands
+        exploration: UCT exploration constant
+        tree: optional MCTSTree kept between moves (one is made if None,
+              so an engine reused for the whole game keeps its tree)
+        seed: seed for the playouts, for repeatable searches
+
+        Games are played to a full board and won on connected fours, as in
+        the GUI: a playout scores 1 for a win, 0.5 for a tie.
+        """
+        self.game = game
+        self.max_depth = max_depth
+        self.playouts = playouts
+        self.time_limit = time_limit
+        self.slip = slip
+        self.exploration = exploration
+        self.tree = tree if tree is not None else MCTSTree()
+        self.rng = random.Random(seed)
+        self.lines = board_lines(game.width, game.length)
+        self.tree_data = None
+        self.node_id_counter = 0
+        self.best_value = None
+        self.capture = CapturePolicy()
+        self.stats = SearchStats(chance=slip)
+        self.control = None  # optional SearchControl for cancellation
+
+    # ------------------------------
+    # Rules on a flat board: cells[col * height + row]
+    # ------------------------------
+    def landing(self, col, heights):
+        """Column the disc chosen for col lands in"""
+        if not self.slip:
+            return col
+
+        options = []
+        total = 0.0
+        for offset, p in SLIP_MODEL:
+            c = col + offset
+            if 0 <= c < self.game.width and heights[c] < self.game.length:
+                options.append((c, p))
+                total += p
+
+        r = self.rng.random() * total
+        for c, p in options:
+            r -= p
+            if r < 0:
+                return c
+        return options[-1][0]
+
+    def probabilities(self, col, heights):
+        """Landing column -> probability, as in expectation_value()"""
+        if not self.slip:
+            return {col: 1.0}
+        normalized = {col + offset: p for offset, p in SLIP_MODEL
+                      if 0 <= col + offset < self.game.width and heights[col + offset] < self.game.length}
+        total = sum(normalized.values())
+        return {c: p / total for c, p in normalized.items()}
+
+    def result(self, cells):
+        """+1 if player 1 has more connected fours, -1 if player 2 has, 0 for a tie"""
+        scores = [0, 0, 0]
+        for line in self.lines:
+            run_player = 0
+            run = 0
+            for i in line:
+                p = cells[i]
+                if p == run_player:
+                    run += 1
+                else:
+                    if run > 3 and run_player:
+                        scores[run_player] += run - 3
+                    run_player = p
+                    run = 1
+            if run > 3 and run_player:
+                scores[run_player] += run - 3
+
+        if scores[1] > scores[2]:
+            return 1
+        if scores[2] > scores[1]:
+            return -1
+        return 0
+
+    def playout(self, cells, heights, player):
+        """Play random moves until the board is full"""
+        height = self.game.length
+        columns = [c for c in range(self.game.width) if heights[c] < height]
+        random_value = self.rng.random
+
+        while columns:
+            col = columns[int(random_value() * len(columns))]
+            if self.slip:
+                col = self.landing(col, heights)
+            cells[col * height + heights[col]] = player
+            heights[col] += 1
+            if heights[col] == height:
+                columns.remove(col)
+            player = 3 - player
+
+        return self.result(cells)
+
+    # ------------------------------
+    # Search
+    # ------------------------------
+    def iterate(self, root, root_cells, root_heights, root_player):
+        """One selection, expansion, playout and backup from the root"""
+        height = self.game.length
+        cells = list(root_cells)
+        heights = list(root_heights)
+        player = root_player
+        node = root
+        path = [node]
+        ply = 0
+        log = math.log
+        sqrt = math.sqrt
+        c = self.exploration
+
+        while True:
+            if node.chance:
+                col = self.landing(node.move, heights)
+                cells[col * height + heights[col]] = node.mover
+                heights[col] += 1
+                player = 3 - node.mover
+
+                child = node.children.get(col)
+                if child is None:
+                    child = MCTSNode(col, node.mover, open_columns(cells, height))
+                    node.children[col] = child
+                    path.append(child)
+                    break
+                node = child
+                path.append(node)
+                continue
+
+            self.stats.node(ply, 'MAX' if player == 1 else 'MIN')
+            if self.control is not None:
+                self.control.nodes += 1
+
+            if node.untried:
+                col = node.untried.pop(int(self.rng.random() * len(node.untried)))
+                if self.slip:
+                    child = MCTSNode(col, player, chance=True)
+                    node.children[col] = child
+                    node = child
+                    path.append(node)
+                    ply += 1
+                    self.stats.node(ply, 'CHANCE')
+                    continue
+
+                cells[col * height + heights[col]] = player
+                heights[col] += 1
+                child = MCTSNode(col, player, open_columns(cells, height))
+                node.children[col] = child
+                path.append(child)
+                player = 3 - player
+                break
+
+            if not node.children:
+                break  # full board
+
+            log_visits = log(node.visits)
+            node = max(node.children.values(),
+                       key=lambda n: n.wins / n.visits + c * sqrt(log_visits / n.visits))
+            path.append(node)
+            ply += 1
+            if node.chance:
+                self.stats.node(ply, 'CHANCE')
+            else:
+                cells[node.move * height + heights[node.move]] = player
+                heights[node.move] += 1
+                player = 3 - player
+
+        if any(h < height for h in heights):
+            self.stats.leaf_evals += 1
+        else:
+            self.stats.terminal_hits += 1
+        value = self.playout(cells, heights, player)
+
+        # Win 1, tie 0.5, loss 0 for the player who made each move
+        win_1 = (1 + value) / 2
+        for n in path:
+            n.visits += 1
+            n.wins += win_1 if n.mover == 1 else 1 - win_1
+
+    def best_move(self, capture=None):
+        """
+        Get the best move (the most played root move) and save the tree
+
+        capture: optional CapturePolicy limiting which nodes are recorded
+
+        Node 'depth' in the tree and in nodes_by_depth is the ply below
+        the root; there is no remaining depth in MCTS.
+        """
+        self.node_id_counter = 0
+        self.capture = capture if capture is not None else CapturePolicy()
+        self.capture.reset()
+        self.stats.reset()
+
+        height = self.game.length
+        cells = [cell for column in self.game.board for cell in column]
+        heights = [sum(1 for cell in column if cell != 0) for column in self.game.board]
+        player = self.game.turn
+
+        root, reused = self.tree.find(cells, player, height, self.slip)
+        reused_visits = root.visits
+        target = self.max_depth * self.playouts
+        deadline = time.time() + self.time_limit if self.time_limit is not None else None
+
+        start_time = time.time()
+        playouts = 0
+        while root.visits < target:
+            if deadline is not None and time.time() >= deadline:
+                break
+            if self.control is not None and self.control.is_stopped():
+                break
+            self.iterate(root, cells, heights, player)
+            playouts += 1
+        elapsed = time.time() - start_time
+
+        best = max(root.children.values(), key=lambda n: n.visits, default=None)
+        if best is not None and best.visits > 0:
+            best_move = best.move
+            win = best.wins / best.visits
+            self.best_value = 2 * win - 1 if player == 1 else 1 - 2 * win
+        else:
+            valid = open_columns(cells, height)
+            best_move = min(valid, key=lambda col: abs(col - self.game.width // 2)) if valid else 0
+            self.best_value = None
+
+        self.capture.begin_search()
+        try:
+            tree_root = self.export(root, cells, heights, 0, None)
+        finally:
+            self.capture.end_search()
+
+        self.tree_data = {
+            'root': tree_root,
+            'metadata': {
+                'algorithm': 'mcts',
+                'max_depth': self.max_depth,
+                'total_nodes': self.node_id_counter,
+                'best_move': best_move,
+                'best_value': self.best_value,
+                'computation_time': elapsed,
+                'current_turn': self.game.turn,
+                'board_width': self.game.width,
+                'board_height': self.game.length,
+                'playouts': playouts,
+                'root_visits': root.visits,
+                'reused_visits': reused_visits if reused else 0,
+                'playouts_per_sec': playouts / elapsed if elapsed > 0 else None,
+                'slip': self.slip,
+                'exploration': self.exploration,
+                'note': 'Values are mean playout results for player 1 (+1 win, -1 loss)',
+                'capture': self.capture.summary(),
+                'peak_memory': self.capture.peak_memory(),
+                'search_stats': self.stats.summary(),
+                'tree': self.tree.summary(),
+                'transposition': None
+            }
+        }
+
+        return best_move
+
+    async def best_move_async(self, deadline=None, executor=None, **kwargs):
+        """Search off the event loop; returns the best move so far at the deadline or on cancel"""
+        return await best_move_async(self, deadline, executor, **kwargs)
+
+    # ------------------------------
+    # Tree export
+    # ------------------------------
+    def value_for_player_1(self, node):
+        win = node.wins / node.visits if node.visits else 0.5
+        return 2 * win - 1 if node.mover == 1 else 1 - 2 * win
+
+    def board_to_string(self, cells, heights):
+        """Convert board to string representation"""
+        height = self.game.length
+        return '\n'.join(''.join(str(cells[c * height + r]) for c in range(self.game.width))
+                         for r in range(height - 1, -1, -1))
+
+    def export(self, node, cells, heights, ply, parent_id, keep=KEEP_SUBTREE):
+        """
+        tree_data node for node and its played children, in the format of
+        the other engines. Every node is counted in node_id_counter, the
+        CapturePolicy decides which ones are recorded; the search is over,
+        so the principal variation follows the most played moves exactly.
+        The memory ceiling is checked for every node the export visits.
+        """
+        self.capture.check_memory()
+        if not self.capture.should_record(ply, keep):
+            self.node_id_counter += count_nodes(node)
+            return None
+        recorded_start = self.capture.recorded_nodes
+
+        node_id = self.node_id_counter
+        self.node_id_counter += 1
+        height = self.game.length
+        player = 3 - node.mover
+
+        if node.chance:
+            distribution = self.probabilities(node.move, heights)
+            chance_node = {
+                'id': node_id,
+                'parent_id': parent_id,
+                'depth': ply,
+                'move': node.move,
+                'node_type': 'CHANCE',
+                'chosen_col': node.move,
+                'board_state': self.board_to_string(cells, heights),
+                'probability_distribution': {str(k): v for k, v in distribution.items()},
+                'outcomes': [],
+                'expected_value': self.value_for_player_1(node),
+                'visits': node.visits
+            }
+            self.capture.record(chance_node)
+
+            for col, child in sorted(node.children.items()):
+                cells[col * height + heights[col]] = node.mover
+                heights[col] += 1
+                child_node = self.export(child, cells, heights, ply, node_id, self.capture.keep_child(keep, True))
+                heights[col] -= 1
+                cells[col * height + heights[col]] = 0
+
+                outcome = {
+                    'actual_column': col,
+                    'probability': distribution.get(col, 0),
+                    'value': self.value_for_player_1(child),
+                    'visits': child.visits
+                }
+                if child_node is not None:
+                    outcome['child_node'] = child_node
+                chance_node['outcomes'].append(outcome)
+
+            chance_node['searched_subtree'] = self.node_id_counter - node_id
+            chance_node['recorded_subtree'] = self.capture.recorded_nodes - recorded_start
+            return chance_node
+
+        full = all(h == height for h in heights)
+        best = max(node.children.values(), key=lambda n: n.visits, default=None)
+        tree_node = {
+            'id': node_id,
+            'parent_id': parent_id,
+            'depth': ply,
+            'move': node.move,
+            'node_type': 'MAX' if player == 1 else 'MIN',
+            'board_state': self.board_to_string(cells, heights),
+            'children': [],
+            'value': self.value_for_player_1(node),
+            'visits': node.visits,
+            'best_move': best.move if best is not None else None,
+            'terminal': full or not node.children,
+            'valid_moves': open_columns(cells, height)
+        }
+        if tree_node['terminal']:
+            tree_node['terminal_type'] = 'TERMINAL' if full else 'LEAF'
+        self.capture.record(tree_node)
+
+        for col, child in sorted(node.children.items()):
+            child_keep = self.capture.keep_child(keep, child is best)
+            if child.chance:
+                child_node = self.export(child, cells, heights, ply + 1, node_id, child_keep)
+            else:
+                cells[col * height + heights[col]] = player
+                heights[col] += 1
+                child_node = self.export(child, cells, heights, ply + 1, node_id, child_keep)
+                heights[col] -= 1
+                cells[col * height + heights[col]] = 0
+
+            if child_node is not None:
+                tree_node['children'].append(child_node)
+
+        tree_node['searched_subtree'] = self.node_id_counter - node_id
+        self.capture.finish_node(tree_node)
+        tree_node['recorded_subtree'] = self.capture.recorded_nodes - recorded_start
+        return tree_node
+
+    def save_tree_to_json(self, filename='mcts_tree.json'):
+        """Save the tree to a JSON file"""
+        if self.tree_data is None:
+            print("No tree data available. Run best_move() first.")
+            return False
+
+        try:
+            with open(filename, 'w') as f:
+                json.dump(self.tree_data, f, indent=2)
+            print(f"✓ Tree saved to {filename}")
+            return True
+        except Exception as e:
+            print(f"✗ Error saving tree: {e}")
+            return False
+
+    def save_tree_to_python(self, filename='mcts_tree.py'):
+        """Save the tree as a Python dictionary"""
+        if self.tree_data is None:
+            print("No tree data available. Run best_move() first.")
+            return False
+
+        try:
+            with open(filename, 'w') as f:
+                f.write("# Auto-generated MCTS tree data\n")
+                f.write("# Import this in your GUI: from mcts_tree import tree_data\n\n")
+                f.write(f"tree_data = {repr(self.tree_data)}")
+            print(f"✓ Tree saved to {filename}")
+            return True
+        except Exception as e:
+            print(f"✗ Error saving tree: {e}")
+            return False
+
+    def get_tree_stats(self):
+        """Get statistics about the last search, counted while searching"""
+        if self.tree_data is None:
+            return None
+        return dict(self.tree_data['metadata']['search_stats'])
+
+
+if __name__ == "__main__":
+    x = Connect4()
+    ai = Connect4AI_MCTS(x, time_limit=2.0, playouts=100000)
+
+    while True:
+        print(x)
+
+        if x.turn == 1:
+            col = int(input("Player 1 column: "))
+        else:
+            print("\nAI thinking...")
+            col = ai.best_move()
+            meta = ai.tree_data['metadata']
+            print(f"Column {col} | {meta['playouts']} playouts in {meta['computation_time']:.2f}s "
+                  f"({meta['reused_visits']} kept from the last move)")
+
+        x.play(col)
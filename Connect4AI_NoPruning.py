@@ -3,6 +3,9 @@ import copy
 import time
 import json
 from Connect4 import Connect4
+from tree_capture import CapturePolicy, KEEP_SUBTREE, KEEP_NONE, research_pv
+from search_stats import SearchStats
+from search_control import best_move_async, memory_checked
 
 
 class Connect4AI_NoPruning_TreeSaver:
@@ -11,6 +14,9 @@ class Connect4AI_NoPruning_TreeSaver:
         self.max_depth = max_depth
         self.tree_data = None
         self.node_id_counter = 0
+        self.capture = CapturePolicy()
+        self.stats = SearchStats()
+        self.control = None  # optional SearchControl for cancellation
 
     def get_valid_moves(self, board):
         moves = []
@@ -50,25 +56,32 @@ class Connect4AI_NoPruning_TreeSaver:
             result.append(''.join(row))
         return '\n'.join(result)
 
-    def minimax(self, board, depth, maximizing, move=None, parent_id=None):
-        """Minimax WITHOUT pruning - explores entire tree"""
-        
+    def minimax(self, board, depth, maximizing, move=None, parent_id=None, keep=KEEP_SUBTREE):
+        """Minimax WITHOUT pruning - explores entire tree; keep: what the capture keeps of this node"""
+        if self.control is not None:
+            self.control.check()
+        self.stats.node(depth, 'MAX' if maximizing else 'MIN')
+
         # Create node
         node_id = self.node_id_counter
         self.node_id_counter += 1
         
-        node = {
-            'id': node_id,
-            'parent_id': parent_id,
-            'depth': depth,
-            'move': move,
-            'node_type': 'MAX' if maximizing else 'MIN',
-            'board_state': self.board_to_string(board),
-            'children': [],
-            'value': None,
-            'best_move': None,
-            'terminal': False
-        }
+        node = None
+        recorded_start = self.capture.recorded_nodes
+        if self.capture.should_record(self.max_depth - depth, keep):
+            node = {
+                'id': node_id,
+                'parent_id': parent_id,
+                'depth': depth,
+                'move': move,
+                'node_type': 'MAX' if maximizing else 'MIN',
+                'board_state': self.board_to_string(board),
+                'children': [],
+                'value': None,
+                'best_move': None,
+                'terminal': False
+            }
+            self.capture.record(node)
         
         valid_moves = self.get_valid_moves(board)
 
@@ -77,56 +90,79 @@ class Connect4AI_NoPruning_TreeSaver:
             temp_game = copy.deepcopy(self.game)
             temp_game.board = board
             value = temp_game.advanced_dynamic_heuristic()
-            
-            node['terminal'] = True
-            node['terminal_type'] = 'LEAF' if depth == 0 else 'TERMINAL'
-            node['value'] = value
-            node['valid_moves'] = valid_moves
+            if depth == 0:
+                self.stats.leaf_evals += 1
+            else:
+                self.stats.terminal_hits += 1
+
+            if node is not None:
+                node['terminal'] = True
+                node['terminal_type'] = 'LEAF' if depth == 0 else 'TERMINAL'
+                node['value'] = value
+                node['valid_moves'] = valid_moves
             return node, value
 
-        node['valid_moves'] = valid_moves
+        if node is not None:
+            node['valid_moves'] = valid_moves
+        else:
+            keep = KEEP_NONE
 
         if maximizing:
             best_value = -math.inf
             best_move = None
 
             # Explore ALL children (no pruning)
-            for child_move in valid_moves:
+            for i, child_move in enumerate(valid_moves):
                 new_board = self.simulate_move(board, child_move, 1)
-                child_node, value = self.minimax(new_board, depth - 1, False, child_move, node_id)
+                child_node, value = self.minimax(new_board, depth - 1, False, child_move, node_id,
+                                                 self.capture.keep_child(keep, i == 0))
                 
-                node['children'].append(child_node)
+                if node is not None and child_node is not None:
+                    node['children'].append(child_node)
 
                 if value > best_value:
                     best_value = value
                     best_move = child_move
 
-            node['value'] = best_value
-            node['best_move'] = best_move
-            return node, best_value
-
         else:
             best_value = math.inf
             best_move = None
 
             # Explore ALL children (no pruning)
-            for child_move in valid_moves:
+            for i, child_move in enumerate(valid_moves):
                 new_board = self.simulate_move(board, child_move, 2)
-                child_node, value = self.minimax(new_board, depth - 1, True, child_move, node_id)
+                child_node, value = self.minimax(new_board, depth - 1, True, child_move, node_id,
+                                                 self.capture.keep_child(keep, i == 0))
                 
-                node['children'].append(child_node)
+                if node is not None and child_node is not None:
+                    node['children'].append(child_node)
 
                 if value < best_value:
                     best_value = value
                     best_move = child_move
 
+        if node is not None:
             node['value'] = best_value
             node['best_move'] = best_move
-            return node, best_value
+            if self.capture.research_best(node, keep):
+                research_pv(self, node, lambda: self.minimax(
+                    self.simulate_move(board, best_move, 1 if maximizing else 2), depth - 1,
+                    not maximizing, best_move, node_id)[0])
+            node['searched_subtree'] = self.node_id_counter - node_id
+            self.capture.finish_node(node)
+            node['recorded_subtree'] = self.capture.recorded_nodes - recorded_start
+        return node, best_value
 
-    def best_move(self):
-        """Pick the best move and save the tree"""
+    def best_move(self, capture=None):
+        """
+        Pick the best move and save the tree
+
+        capture: optional CapturePolicy limiting which nodes are recorded
+        """
         self.node_id_counter = 0
+        self.capture = capture if capture is not None else CapturePolicy()
+        self.capture.reset()
+        self.stats.reset()
         
         print("\n" + "="*60)
         print("Running Minimax (NO PRUNING) and saving tree...")
@@ -134,13 +170,18 @@ class Connect4AI_NoPruning_TreeSaver:
         
         start_time = time.time()
         
-        tree_root, value = self.minimax(
-            board=self.game.board,
-            depth=self.max_depth,
-            maximizing=(self.game.turn == 1),
-            move=None,
-            parent_id=None
-        )
+        self.capture.begin_search()
+        try:
+            with memory_checked(self):
+                tree_root, value = self.minimax(
+                    board=self.game.board,
+                    depth=self.max_depth,
+                    maximizing=(self.game.turn == 1),
+                    move=None,
+                    parent_id=None
+                )
+        finally:
+            self.capture.end_search()
         
         elapsed = time.time() - start_time
         
@@ -156,7 +197,10 @@ class Connect4AI_NoPruning_TreeSaver:
                 'computation_time': elapsed,
                 'current_turn': self.game.turn,
                 'board_width': self.game.width,
-                'board_height': self.game.length
+                'board_height': self.game.length,
+                'capture': self.capture.summary(),
+                'peak_memory': self.capture.peak_memory(),
+                'search_stats': self.stats.summary()
             }
         }
         
@@ -173,6 +217,10 @@ class Connect4AI_NoPruning_TreeSaver:
 
         return tree_root['best_move']
 
+    async def best_move_async(self, deadline=None, executor=None, **kwargs):
+        """Search off the event loop; returns the best move so far at the deadline or on cancel"""
+        return await best_move_async(self, deadline, executor, **kwargs)
+
     def save_tree_to_json(self, filename='minimax_no_pruning_tree.json'):
         """Save the tree to a JSON file"""
         if self.tree_data is None:
@@ -206,43 +254,10 @@ class Connect4AI_NoPruning_TreeSaver:
             return False
 
     def get_tree_stats(self):
-        """Get statistics about the tree"""
+        """Get statistics about the last search, counted while searching"""
         if self.tree_data is None:
             return None
-        
-        def count_nodes(node, stats, depth_counts):
-            stats['total'] += 1
-            
-            if node.get('terminal', False):
-                stats['terminal'] += 1
-            
-            current_depth = node['depth']
-            if current_depth not in depth_counts:
-                depth_counts[current_depth] = 0
-            depth_counts[current_depth] += 1
-            
-            if node['node_type'] == 'MAX':
-                stats['max_nodes'] += 1
-            else:
-                stats['min_nodes'] += 1
-            
-            for child in node.get('children', []):
-                count_nodes(child, stats, depth_counts)
-        
-        stats = {
-            'total': 0,
-            'max_nodes': 0,
-            'min_nodes': 0,
-            'terminal': 0
-        }
-        
-        depth_counts = {}
-        
-        count_nodes(self.tree_data['root'], stats, depth_counts)
-        
-        stats['nodes_by_depth'] = depth_counts
-        
-        return stats
+        return dict(self.tree_data['metadata']['search_stats'])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+
+
+class AnalysisCache:
+    def __init__(self, max_entries=64, max_bytes=256 * 1024 * 1024):
+        """
+        LRU cache of finished searches keyed by position and settings.
+
+        max_entries: maximum number of cached searches
+        max_bytes: rough cap on the memory held by the cached trees,
+                   based on the recorded_bytes of each tree's capture
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(board, turn, algorithm, depth):
+        return tuple(tuple(col) for col in board), turn, algorithm, depth
+
+    @staticmethod
+    def entry_size(result):
+        tree_data = result.get('tree_data') or {}
+        capture = tree_data.get('metadata', {}).get('capture') or {}
+        return capture.get('recorded_bytes', 0)
+
+    def get(self, key):
+        result = self.entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        size = self.entry_size(result)
+        if size > self.max_bytes:
+            return  # would evict everything else and still not fit
+
+        if key in self.entries:
+            self.total_bytes -= self.entry_size(self.entries.pop(key))
+
+        self.entries[key] = result
+        self.total_bytes += size
+
+        # Evict least recently used entries
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.total_bytes -= self.entry_size(old)
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
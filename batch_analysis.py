@@ -0,0 +1,253 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from Connect4 import Connect4
+from engines import ENGINES, create_engine
+from persistent_cache import PersistentCacheSet
+from tracing import Tracer, TraceWriter
+from transposition import TranspositionTable
+from tree_capture import CapturePolicy
+
+
+# ------------------------------
+# Reading positions
+# ------------------------------
+def game_from_moves(moves):
+    """Play a string of column digits from the empty board"""
+    game = Connect4()
+    for ch in moves:
+        if not ch.isdigit() or int(ch) >= game.width or game.play(int(ch)) == 1:
+            raise ValueError(f"Illegal move sequence: {moves}")
+    return game
+
+
+def game_from_board_string(text):
+    """
+    Rebuild a game from board_to_string() output: one row of cell digits
+    per line, top row first. Rows may also be separated by '/'. The side
+    to move is the player with fewer discs (player 1 on a tie).
+    """
+    rows = [row.strip() for row in text.replace('/', '\n').split('\n') if row.strip()]
+    game = Connect4()
+    if len(rows) != game.length or any(len(row) != game.width for row in rows):
+        raise ValueError(f"Board must be {game.length} rows of {game.width} cells")
+
+    for r, row in enumerate(reversed(rows)):
+        for c, cell in enumerate(row):
+            if cell not in '012':
+                raise ValueError(f"Bad cell '{cell}'")
+            game.board[c][r] = int(cell)
+
+    discs_1 = sum(col.count(1) for col in game.board)
+    discs_2 = sum(col.count(2) for col in game.board)
+    game.turn = 1 if discs_1 <= discs_2 else 2
+    game.calculate_score()
+    return game
+
+
+def read_positions(path):
+    """
+    Yield (index, position) for every position in the file, lazily.
+
+    A line is either a move sequence ("3323"), a board string with rows
+    separated by '/', or a JSON object with an optional "id" and either
+    "moves" or "board" (board_to_string() output, newlines allowed).
+    Blank lines and lines starting with '#' are skipped.
+    """
+    f = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        index = 0
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            if line.startswith('{'):
+                try:
+                    position = json.loads(line)
+                except ValueError:
+                    position = {'moves': line}  # reported as an illegal position
+            elif '/' in line:
+                position = {'board': line}
+            else:
+                position = {'moves': line}
+
+            yield index, position
+            index += 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+# ------------------------------
+# Analysis (runs in the worker processes)
+# ------------------------------
+# Read-only persistent caches opened by this worker process, by path
+persistent_caches = {}
+
+
+def open_persistent_cache(path, engine_name):
+    """The engine's own file of the cache set at path, see PersistentCacheSet"""
+    if path not in persistent_caches:
+        persistent_caches[path] = PersistentCacheSet(path, read_only=True)
+    return persistent_caches[path].get(engine_name)
+
+
+def finite(value):
+    if value is None or math.isinf(value) or math.isnan(value):
+        return None
+    return value
+
+
+def analyse_position(position, engine_name, depth, cache_path=None):
+    # The game and the engines print; stdout may be the results stream
+    with contextlib.redirect_stdout(io.StringIO()):
+        if 'board' in position:
+            game = game_from_board_string(position['board'])
+        else:
+            game = game_from_moves(position.get('moves', ''))
+
+        engine = create_engine(engine_name, game, max_depth=depth)
+        if cache_path is not None and hasattr(engine, 'tt'):
+            engine.tt = TranspositionTable(persistent=open_persistent_cache(cache_path, engine_name))
+        kwargs = {}
+        if hasattr(engine, 'capture'):
+            kwargs['capture'] = CapturePolicy(max_plies=0)  # keep only the root
+
+        start_time = time.perf_counter()
+        move = engine.best_move(**kwargs)
+        elapsed = time.perf_counter() - start_time
+
+    tree_data = getattr(engine, 'tree_data', None)
+    if tree_data is not None:
+        meta = tree_data['metadata']
+        score = meta.get('best_value', meta.get('expected_value'))
+    else:
+        score = engine.best_value
+
+    return {
+        'best_move': move,
+        'score': finite(score),
+        'nodes': engine.stats.summary()['total'],
+        'time': elapsed,
+        'turn': game.turn
+    }
+
+
+def analyse_chunk(chunk, engine_name, depth, trace=False, cache_path=None):
+    """
+    Analyse a list of (index, position) pairs. A position that cannot be
+    parsed gets an 'error' instead of a result. Returns (results, trace
+    events); events are only recorded when trace is set.
+
+    cache_path: persistent cache name the engines read positions from
+                (the engine's file <cache_path>.<engine_name>); every
+                worker opens it read-only
+    """
+    tracer = Tracer(f"batch worker {os.getpid()}") if trace else None
+    batch_span = tracer.span('batch', cat='batch', positions=len(chunk)) if trace else contextlib.nullcontext()
+
+    results = []
+    with batch_span:
+        for index, position in chunk:
+            result = {'index': index, 'id': position.get('id'), 'engine': engine_name, 'depth': depth}
+            span = tracer.span('position', cat='batch', index=index) if trace else contextlib.nullcontext()
+            try:
+                with span:
+                    result.update(analyse_position(position, engine_name, depth, cache_path))
+            except Exception as e:
+                result['error'] = str(e)
+            results.append(result)
+
+    return results, tracer.events if trace else []
+
+
+# ------------------------------
+# Driving the pool
+# ------------------------------
+def analyse_file(path, engine_name, depth, output='-', workers=None, chunk_size=16,
+                 max_in_flight=None, trace_file=None, cache_path=None):
+    """
+    Analyse every position in path and write one JSON line per position
+    to output as soon as its chunk finishes, so results arrive in
+    completion order; use 'index' to restore the input order.
+
+    Positions are read lazily and at most max_in_flight chunks are queued
+    at a time, so memory stays bounded however long the input is; trace
+    events are written to trace_file as each chunk finishes.
+    Returns the number of positions analysed.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    positions = read_positions(path)
+    chunks = iter(lambda: list(itertools.islice(positions, chunk_size)), [])
+    out = sys.stdout if output == '-' else open(output, 'w')
+    trace = TraceWriter(trace_file) if trace_file is not None else None
+    count = 0
+    errors = 0
+    start_time = time.time()
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            while True:
+                for chunk in itertools.islice(chunks, max_in_flight - len(pending)):
+                    pending.add(pool.submit(analyse_chunk, chunk, engine_name, depth,
+                                            trace_file is not None, cache_path))
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results, events = future.result()
+                    for result in results:
+                        out.write(json.dumps(result) + "\n")
+                        errors += 'error' in result
+                    out.flush()
+                    count += len(results)
+                    if trace is not None:
+                        trace.write(events)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if trace is not None:
+            trace.close()
+
+    elapsed = time.time() - start_time
+    print(f"Analysed {count} positions ({errors} errors) in {elapsed:.1f} seconds "
+          f"({count / elapsed if elapsed > 0 else 0:.1f} positions/s)", file=sys.stderr)
+
+    if trace is not None:
+        print(f"✓ Trace saved to {trace_file} ({trace.count} events)", file=sys.stderr)
+
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse a file of Connect 4 positions in parallel")
+    parser.add_argument('positions', help="file with one position per line, '-' for stdin")
+    parser.add_argument('--engine', choices=list(ENGINES), default='Connect4AI')
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=16, help="positions sent to a worker at a time")
+    parser.add_argument('--output', default='-', help="JSON lines output file, '-' for stdout")
+    parser.add_argument('--trace', default=None, help="save a Chrome trace of the batches to this file")
+    parser.add_argument('--cache', default=None,
+                        help="persistent cache name (e.g. from engine_server.py) to read positions from; "
+                             "the engine's file is <name>.<engine>")
+    args = parser.parse_args(argv)
+
+    analyse_file(args.positions, args.engine, args.depth, args.output, args.workers,
+                 args.chunk_size, trace_file=args.trace, cache_path=args.cache)
+
+
+if __name__ == "__main__":
+    main()
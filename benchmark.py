@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+from Connect4 import Connect4
+from engines import ENGINES, create_engine
+from profiling import Profiler
+from search_control import SearchControl
+
+POSITIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_positions.json')
+DEFAULT_DEPTHS = (2, 3, 4)
+
+# Deepest search run per engine unless limits are turned off; the chance
+# layers make expectiminimax roughly 20x slower per extra ply
+DEPTH_LIMITS = {
+    'Connect4AI_Expectiminimax': 3,
+    'Connect4AI_Expectiminimax_TreeSaver': 3,
+}
+
+
+# ------------------------------
+# Position corpus
+# ------------------------------
+def load_positions(filename=POSITIONS_FILE):
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+
+def make_game(moves):
+    """Play a string of column digits from the empty board"""
+    game = Connect4()
+    for ch in moves:
+        if game.play(int(ch)) == 1:
+            raise ValueError(f"Illegal move sequence: {moves}")
+    return game
+
+
+# ------------------------------
+# Measuring one search
+# ------------------------------
+def run_search(name, moves, depth, trace_memory=False, profile=False):
+    """
+    Run one search on a fresh game and engine.
+
+    Nodes are counted through a SearchControl, which the minimax engines
+    check once per MAX/MIN node, so their counts can be compared. MCTS
+    counts every selection step of every playout instead; it reports
+    'playouts' and leaves 'nodes' as None. Engine output is silenced. Returns a dict of measurements; peak memory
+    is only measured when trace_memory is set, and per-function timings
+    only when profile is set, because both slow the search down.
+    """
+    game = make_game(moves)
+    engine = create_engine(name, game, max_depth=depth)
+    control = SearchControl()
+    engine.control = control
+
+    profiler = Profiler(engine) if profile else None
+    if trace_memory:
+        tracemalloc.start()
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if profiler is not None:
+                profiler.start()
+            start_time = time.perf_counter()
+            move = engine.best_move()
+            elapsed = time.perf_counter() - start_time
+            if profiler is not None:
+                profiler.stop()
+
+        peak = None
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    result = {
+        'best_move': move,
+        'nodes': control.nodes,
+        'playouts': None,
+        'wall_time': elapsed,
+        'peak_memory_bytes': peak
+    }
+
+    tree_data = getattr(engine, 'tree_data', None)
+    if tree_data is not None:
+        result['tree_nodes'] = tree_data['metadata']['total_nodes']
+        if 'playouts' in tree_data['metadata']:
+            result['playouts'] = tree_data['metadata']['playouts']
+            result['nodes'] = None
+    result['search_stats'] = engine.stats.summary()
+    if profiler is not None:
+        result['profile'] = profiler.results()['functions']
+
+    return result
+
+
+def benchmark(engines=None, depths=DEFAULT_DEPTHS, phases=None, repeat=1,
+              memory=True, positions_file=POSITIONS_FILE, progress=True, depth_limits=DEPTH_LIMITS,
+              profile=False):
+    """
+    Run every engine over the position corpus at every depth.
+
+    engines: engine names from engines.ENGINES (default: all)
+    depths: search depths to run
+    phases: only run positions of these phases (default: all)
+    repeat: timing runs per search; the fastest one is kept
+    memory: make one extra run under tracemalloc for the peak memory
+    depth_limits: engine name -> deepest depth to run (None for no limits)
+    profile: make one extra run with per-function counters and timers
+
+    Returns a JSON-serialisable report.
+    """
+    corpus = load_positions(positions_file)
+    engines = list(engines or ENGINES)
+    positions = [p for p in corpus['positions'] if phases is None or p['phase'] in phases]
+
+    results = []
+    for name in engines:
+        for position in positions:
+            for depth in depths:
+                if depth_limits and depth > depth_limits.get(name, depth):
+                    continue
+
+                runs = [run_search(name, position['moves'], depth) for _ in range(max(1, repeat))]
+                best = min(runs, key=lambda r: r['wall_time'])
+
+                if memory:
+                    best['peak_memory_bytes'] = run_search(
+                        name, position['moves'], depth, trace_memory=True)['peak_memory_bytes']
+
+                if profile:
+                    best['profile'] = run_search(name, position['moves'], depth, profile=True)['profile']
+
+                if best['nodes'] is None:
+                    best['nodes_per_sec'] = None
+                else:
+                    best['nodes_per_sec'] = best['nodes'] / best['wall_time'] if best['wall_time'] > 0 else 0.0
+                best.update({
+                    'engine': name,
+                    'position': position['name'],
+                    'phase': position['phase'],
+                    'depth': depth
+                })
+                results.append(best)
+
+                if progress:
+                    work = f"{best['nodes']:>8} nodes" if best['nodes'] is not None \
+                        else f"{best['playouts']:>5} playouts"
+                    print(f"  {name:<36} {position['name']:<16} depth {depth}: "
+                          f"{work}  {best['wall_time']:.3f}s  Col {best['best_move']}")
+
+    return {
+        'corpus_version': corpus['version'],
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'depth_limits': depth_limits or {},
+        'results': results
+    }
+
+
+def print_report(report):
+    """
+    Totals per engine and depth. MCTS counts playouts rather than nodes,
+    so it gets a playouts column and no nodes/s.
+    """
+    totals = {}
+    for r in report['results']:
+        t = totals.setdefault((r['engine'], r['depth']), {'nodes': None, 'playouts': None, 'time': 0.0, 'peak': 0})
+        for unit in ('nodes', 'playouts'):
+            if r.get(unit) is not None:
+                t[unit] = (t[unit] or 0) + r[unit]
+        t['time'] += r['wall_time']
+        t['peak'] = max(t['peak'], r['peak_memory_bytes'] or 0)
+
+    def column(value, spec):
+        """A column of width 10, '-' for a unit the engine does not count"""
+        return format(value, spec) if value is not None else f"{'-':>10}"
+
+    print("\n" + "=" * 101)
+    print(f"{'Engine':<36} {'Depth':>5} {'Nodes':>10} {'Playouts':>10} {'Time (s)':>10} {'Nodes/s':>10} {'Peak MB':>9}")
+    print("=" * 101)
+    for (engine, depth), t in totals.items():
+        nps = t['nodes'] / t['time'] if t['nodes'] is not None and t['time'] > 0 else None
+        print(f"{engine:<36} {depth:>5} {column(t['nodes'], '>10')} {column(t['playouts'], '>10')} "
+              f"{t['time']:>10.3f} {column(nps, '>10.0f')} {t['peak'] / (1024 * 1024):>9.2f}")
+    print("=" * 101)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Connect 4 engines on a fixed position corpus")
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), help="engines to run (default: all)")
+    parser.add_argument('--depths', nargs='+', type=int, default=list(DEFAULT_DEPTHS))
+    parser.add_argument('--phases', nargs='+', choices=['opening', 'midgame', 'endgame'])
+    parser.add_argument('--repeat', type=int, default=1, help="timing runs per search, fastest is kept")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run")
+    parser.add_argument('--no-depth-limits', action='store_true', help="run every engine at every depth")
+    parser.add_argument('--profile', action='store_true', help="record per-function call counts and times")
+    parser.add_argument('--positions', default=POSITIONS_FILE)
+    parser.add_argument('--output', default='benchmark_results.json')
+    args = parser.parse_args(argv)
+
+    report = benchmark(args.engines, args.depths, args.phases, args.repeat,
+                       not args.no_memory, args.positions,
+                       depth_limits=None if args.no_depth_limits else DEPTH_LIMITS,
+                       profile=args.profile)
+    print_report(report)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import json
+import queue
+import threading
 from Connect4 import Connect4
 from Connect4AI import Connect4AI_TreeSaver
 from Connect4AI_NoPruning import Connect4AI_NoPruning_TreeSaver
 from Connect4AI_Expectiminimax import Connect4AI_Expectiminimax
+from Connect4AI_MCTS import Connect4AI_MCTS, MCTSTree
+from search_worker import SearchWorker
+from analysis_cache import AnalysisCache
+from ponder import Ponderer, expected_reply
+from transposition import TranspositionTable
+from tree_view import VirtualTreeView, save_tree_svg
 
 
 class Connect4GUI:
@@ -22,6 +30,29 @@ class Connect4GUI:
         self.ai_depth = 4
         self.zoom_level = 1.0
 
+        # Background search state
+        self.search_worker = None
+        self.search_position = None
+        self.search_progress = None
+        self.search_key = None
+
+        # Finished searches, reused when the same position is searched again
+        self.analysis_cache = AnalysisCache()
+        self.cache_lock = threading.Lock()  # the ponderer fills the cache from its thread
+
+        # Searches the replies to the AI's move while the human thinks
+        self.ponderer = None
+
+        # One transposition table per algorithm, kept from move to move
+        self.transposition_tables = {}
+        # MCTS keeps its search tree from move to move the same way
+        self.mcts_tree = MCTSTree()
+
+        # Board cells are drawn once and recoloured when they change
+        self.cell_items = {}
+        self.cell_colors = {}
+        self.drop_animation = None
+
         # Colors - improved contrast
         self.colors = {
             'bg': '#f0f0f0',
@@ -87,6 +118,7 @@ class Connect4GUI:
         self.canvas = tk.Canvas(left_frame, width=490, height=420,
                                 bg=self.colors['board'], highlightthickness=0)
         self.canvas.pack(pady=10)
+        self.create_board_cells()
 
         # Control buttons
         control_frame = tk.Frame(left_frame, bg='white')
@@ -100,6 +132,14 @@ class Connect4GUI:
                   bg="#8b5cf6", fg='white', font=("Arial", 12, "bold"),
                   padx=10, pady=5).grid(row=0, column=1, padx=5)
 
+        tk.Button(control_frame, text="Cancel", command=self.cancel_search,
+                  bg="#ef4444", fg='white', font=("Arial", 12, "bold"),
+                  padx=10, pady=5).grid(row=1, column=0, padx=5, pady=(5, 0))
+
+        tk.Button(control_frame, text="Move Now", command=self.move_now,
+                  bg="#f59e0b", fg='white', font=("Arial", 12, "bold"),
+                  padx=10, pady=5).grid(row=1, column=1, padx=5, pady=(5, 0))
+
         # AI Settings
         settings_frame = tk.LabelFrame(left_frame, text="AI Settings",
                                        bg='white', font=("Arial", 12, "bold"))
@@ -111,7 +151,8 @@ class Connect4GUI:
         algos = [
             ("Minimax + Pruning", "minimax_pruning"),
             ("Minimax No Pruning", "minimax_no_pruning"),
-            ("Expectiminimax", "expectiminimax")
+            ("Expectiminimax", "expectiminimax"),
+            ("Monte Carlo (MCTS)", "mcts")
         ]
 
         for i, (text, value) in enumerate(algos):
@@ -119,18 +160,28 @@ class Connect4GUI:
                            value=value, bg='white',
                            command=self.update_algorithm).grid(row=i + 1, column=0, sticky='w', padx=20)
 
-        tk.Label(settings_frame, text="Search Depth:", bg='white').grid(row=4, column=0, sticky='w', padx=5, pady=5)
+        tk.Label(settings_frame, text="Search Depth:", bg='white').grid(row=5, column=0, sticky='w', padx=5, pady=5)
 
         self.depth_var = tk.IntVar(value=4)
         depth_spinner = tk.Spinbox(settings_frame, from_=1, to=6, textvariable=self.depth_var,
                                    width=10, command=self.update_depth)
-        depth_spinner.grid(row=4, column=1, padx=5, pady=5)
+        depth_spinner.grid(row=5, column=1, padx=5, pady=5)
 
         # Auto-generate tree option
         self.auto_tree_var = tk.BooleanVar(value=True)
         tk.Checkbutton(settings_frame, text="Auto-generate tree after each move",
                        variable=self.auto_tree_var, bg='white',
-                       font=("Arial", 9)).grid(row=5, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+                       font=("Arial", 9)).grid(row=6, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+
+        self.animate_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(settings_frame, text="Animate dropping pieces",
+                       variable=self.animate_var, bg='white',
+                       font=("Arial", 9)).grid(row=7, column=0, columnspan=2, sticky='w', padx=5, pady=5)
+
+        self.ponder_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(settings_frame, text="Think on your time (ponder)",
+                       variable=self.ponder_var, bg='white', command=self.update_ponder,
+                       font=("Arial", 9)).grid(row=8, column=0, columnspan=2, sticky='w', padx=5, pady=5)
 
         # Right panel - Tree visualization
         right_frame = tk.Frame(main_frame, bg='white', relief=tk.RAISED, bd=2)
@@ -152,6 +203,10 @@ class Connect4GUI:
                   bg="#6366f1", fg='white', font=("Arial", 11, "bold"),
                   padx=10, pady=5).pack(side=tk.LEFT, padx=5)
 
+        tk.Button(tree_control_frame, text="Export SVG", command=self.export_tree_svg,
+                  bg="#0ea5e9", fg='white', font=("Arial", 11, "bold"),
+                  padx=10, pady=5).pack(side=tk.LEFT, padx=5)
+
         tk.Button(tree_control_frame, text="Clear Tree", command=self.clear_tree,
                   bg="#ef4444", fg='white', font=("Arial", 11, "bold"),
                   padx=10, pady=5).pack(side=tk.LEFT, padx=5)
@@ -172,6 +227,14 @@ class Connect4GUI:
                   bg="#059669", fg='white', font=("Arial", 10, "bold"),
                   padx=8, pady=3).pack(side=tk.LEFT, padx=3)
 
+        tk.Button(zoom_frame, text="Expand All", command=lambda: self.tree_view.expand_all(),
+                  bg="#7c3aed", fg='white', font=("Arial", 10, "bold"),
+                  padx=8, pady=3).pack(side=tk.LEFT, padx=3)
+
+        tk.Button(zoom_frame, text="Collapse All", command=lambda: self.tree_view.collapse_all(),
+                  bg="#7c3aed", fg='white', font=("Arial", 10, "bold"),
+                  padx=8, pady=3).pack(side=tk.LEFT, padx=3)
+
         # Tree stats
         self.tree_stats_label = tk.Label(right_frame, text="No tree generated",
                                          font=("Arial", 10), bg='white', fg='#666')
@@ -206,21 +269,24 @@ class Connect4GUI:
                                      xscrollcommand=tree_scroll_x.set)
         self.tree_canvas.pack(fill=tk.BOTH, expand=True)
 
-        tree_scroll_y.config(command=self.tree_canvas.yview)
-        tree_scroll_x.config(command=self.tree_canvas.xview)
+        # Only the visible part of the tree is drawn
+        self.tree_view = VirtualTreeView(self.tree_canvas, self.colors)
+
+        tree_scroll_y.config(command=self.on_tree_yview)
+        tree_scroll_x.config(command=self.on_tree_xview)
 
         # Bind mouse wheel and drag
         self.tree_canvas.bind("<MouseWheel>",
-                              lambda e: self.tree_canvas.yview_scroll(int(-1 * (e.delta / 120)), "units"))
+                              lambda e: self.on_tree_yview("scroll", int(-1 * (e.delta / 120)), "units"))
         self.tree_canvas.bind("<Shift-MouseWheel>",
-                              lambda e: self.tree_canvas.xscrollcommand(int(-1 * (e.delta / 120)), "units"))
+                              lambda e: self.on_tree_xview("scroll", int(-1 * (e.delta / 120)), "units"))
+        self.tree_canvas.bind("<Configure>", self.tree_view.schedule_refresh)
 
         # Enable click and drag panning
         self.tree_canvas.bind("<ButtonPress-1>", self.on_canvas_click)
         self.tree_canvas.bind("<B1-Motion>", self.on_canvas_drag)
+        self.tree_canvas.bind("<ButtonRelease-1>", self.on_canvas_release)
 
-        # Node positions cache
-        self.node_positions = {}
         self.drag_start_x = 0
         self.drag_start_y = 0
 
@@ -233,42 +299,88 @@ class Connect4GUI:
     def on_canvas_drag(self, event):
         """Handle canvas dragging"""
         self.tree_canvas.scan_dragto(event.x, event.y, gain=1)
+        self.tree_view.schedule_refresh()
+
+    def on_canvas_release(self, event):
+        """A click without dragging expands or collapses the node under the mouse"""
+        if abs(event.x - self.drag_start_x) > 3 or abs(event.y - self.drag_start_y) > 3:
+            return
+
+        i = self.tree_view.node_at(self.tree_canvas.canvasx(event.x),
+                                   self.tree_canvas.canvasy(event.y))
+        if i is not None:
+            self.tree_view.toggle(i)
+
+    def on_tree_xview(self, *args):
+        self.tree_canvas.xview(*args)
+        self.tree_view.schedule_refresh()
+
+    def on_tree_yview(self, *args):
+        self.tree_canvas.yview(*args)
+        self.tree_view.schedule_refresh()
 
     def zoom_in(self):
         """Increase zoom level"""
-        self.zoom_level = min(2.0, self.zoom_level + 0.2)
-        self.display_tree()
+        self.zoom_level = min(2.0, self.zoom_level * 1.25)
+        self.tree_view.set_zoom(self.zoom_level)
 
     def zoom_out(self):
-        """Decrease zoom level"""
-        self.zoom_level = max(0.5, self.zoom_level - 0.2)
-        self.display_tree()
+        """Decrease zoom level; far out the tree turns into heat strips"""
+        self.zoom_level = max(0.01, self.zoom_level / 1.25)
+        self.tree_view.set_zoom(self.zoom_level)
 
     def reset_zoom(self):
         """Reset zoom to 100%"""
         self.zoom_level = 1.0
-        self.display_tree()
+        self.tree_view.set_zoom(self.zoom_level)
 
-    def update_board(self):
-        self.canvas.delete("all")
-
-        # Draw board
+    # ------------------------------
+    # Board drawing
+    # ------------------------------
+    def create_board_cells(self):
+        """Create one oval per cell; update_board only recolours them"""
         for row in range(6):
             for col in range(7):
                 x = col * 70 + 35
                 y = (5 - row) * 70 + 35
+                self.cell_items[(col, row)] = self.canvas.create_oval(
+                    x - 25, y - 25, x + 25, y + 25,
+                    fill=self.colors['empty'], outline='#1e40af', width=2)
+                self.cell_colors[(col, row)] = self.colors['empty']
+
+    def cell_color(self, col, row):
+        cell_value = self.game.board[col][row]
+        if cell_value == 0:
+            return self.colors['empty']
+        elif cell_value == 1:
+            return self.colors['player1']
+        return self.colors['player2']
+
+    def set_cell_color(self, col, row, color):
+        self.canvas.itemconfigure(self.cell_items[(col, row)], fill=color)
+        self.cell_colors[(col, row)] = color
+
+    def update_board(self, animate=False):
+        """
+        Recolour the cells that changed since the last update.
+        With animate=True a single new piece falls into place; the
+        animation runs on after() callbacks so input is never blocked.
+        """
+        self.finish_drop_animation()
+
+        changed = []
+        for row in range(6):
+            for col in range(7):
+                color = self.cell_color(col, row)
+                if self.cell_colors[(col, row)] != color:
+                    changed.append((col, row, color))
 
-                # Draw cell
-                cell_value = self.game.board[col][row]
-                if cell_value == 0:
-                    color = self.colors['empty']
-                elif cell_value == 1:
-                    color = self.colors['player1']
-                else:
-                    color = self.colors['player2']
-
-                self.canvas.create_oval(x - 25, y - 25, x + 25, y + 25,
-                                        fill=color, outline='#1e40af', width=2)
+        if (animate and self.animate_var.get() and len(changed) == 1
+                and changed[0][2] != self.colors['empty']):
+            self.start_drop_animation(*changed[0])
+        else:
+            for col, row, color in changed:
+                self.set_cell_color(col, row, color)
 
         # Update info
         if self.game.turn == 1:
@@ -278,159 +390,278 @@ class Connect4GUI:
 
         self.score_label.config(text=f"Score - P1: {self.game.score_1} | P2: {self.game.score_2}")
 
+    def start_drop_animation(self, col, row, color):
+        x = col * 70 + 35
+        target_y = (5 - row) * 70 + 35
+        item = self.canvas.create_oval(x - 25, -60, x + 25, -10,
+                                       fill=color, outline='#1e40af', width=2)
+        self.drop_animation = {'item': item, 'cell': (col, row), 'color': color,
+                               'y': -35, 'target_y': target_y, 'speed': 8, 'after_id': None}
+        self.step_drop_animation()
+
+    def step_drop_animation(self):
+        anim = self.drop_animation
+        if anim is None:
+            return
+
+        step = min(anim['speed'], anim['target_y'] - anim['y'])
+        self.canvas.move(anim['item'], 0, step)
+        anim['y'] += step
+        anim['speed'] += 4
+
+        if anim['y'] >= anim['target_y']:
+            self.finish_drop_animation()
+        else:
+            anim['after_id'] = self.root.after(15, self.step_drop_animation)
+
+    def finish_drop_animation(self):
+        """Land the falling piece immediately"""
+        anim = self.drop_animation
+        if anim is None:
+            return
+
+        self.drop_animation = None
+        if anim['after_id'] is not None:
+            self.root.after_cancel(anim['after_id'])
+        self.canvas.delete(anim['item'])
+        self.set_cell_color(*anim['cell'], anim['color'])
+
     def drop_piece(self, col):
         result = self.game.play(col)
         if result == 1:
             messagebox.showwarning("Invalid Move", "Column is full!")
             return
 
-        self.update_board()
+        self.update_board(animate=True)
 
         # Always auto-generate tree after player move
         self.root.after(100, self.generate_tree_silently)
 
         self.check_winner()
 
-    def ai_move(self):
-        try:
-            self.info_label.config(text="AI is thinking...", fg='#8b5cf6')
-            self.root.update()
+    def copy_game(self):
+        """Create a fresh game instance with copied state"""
+        temp_game = Connect4()
+        temp_game.board = [[self.game.board[c][r] for r in range(self.game.length)]
+                           for c in range(self.game.width)]
+        temp_game.turn = self.game.turn
+        temp_game.score_1 = self.game.score_1
+        temp_game.score_2 = self.game.score_2
+        return temp_game
+
+    def create_ai(self, game):
+        """Create AI based on selected algorithm"""
+        if self.selected_algorithm == "minimax_pruning":
+            return Connect4AI_TreeSaver(game, max_depth=self.search_depth(),
+                                        tt=self.transposition_table())
+        elif self.selected_algorithm == "minimax_no_pruning":
+            return Connect4AI_NoPruning_TreeSaver(game, max_depth=self.search_depth())
+        elif self.selected_algorithm == "mcts":
+            # Depth scales the playouts (2000 per level)
+            return Connect4AI_MCTS(game, max_depth=self.search_depth(), tree=self.mcts_tree)
+        else:  # expectiminimax
+            return Connect4AI_Expectiminimax(game, max_depth=self.search_depth(),
+                                             tt=self.transposition_table())
+
+    def transposition_table(self):
+        return self.transposition_tables.setdefault(self.selected_algorithm, TranspositionTable())
+
+    def search_depth(self):
+        if self.selected_algorithm == "expectiminimax":
+            return min(self.ai_depth, 3)
+        return self.ai_depth
+
+    def position_key(self):
+        return tuple(tuple(col) for col in self.game.board), self.game.turn
+
+    def analysis_key(self):
+        return AnalysisCache.make_key(self.game.board, self.game.turn,
+                                      self.selected_algorithm, self.search_depth())
+
+    def tree_stats_text(self, stats):
+        text = f"Nodes: {stats['total']} | "
+        if 'pruned' in stats:
+            text += f"Pruned: {stats['pruned']} | "
+        if 'chance_nodes' in stats:
+            text += f"Chance: {stats['chance_nodes']} | "
+        text += f"Time: {self.tree_data['metadata']['computation_time']:.3f}s"
+        return text
 
-            # Create a fresh game instance with copied state
-            temp_game = Connect4()
-            temp_game.board = [[self.game.board[c][r] for r in range(self.game.length)]
-                               for c in range(self.game.width)]
-            temp_game.turn = self.game.turn
-            temp_game.score_1 = self.game.score_1
-            temp_game.score_2 = self.game.score_2
+    def ai_move(self):
+        self.info_label.config(text="AI is thinking...", fg='#8b5cf6')
+        self.start_search('ai_move')
 
-            # Create AI based on selected algorithm
-            if self.selected_algorithm == "minimax_pruning":
-                ai = Connect4AI_TreeSaver(temp_game, max_depth=self.ai_depth)
-            elif self.selected_algorithm == "minimax_no_pruning":
-                ai = Connect4AI_NoPruning_TreeSaver(temp_game, max_depth=self.ai_depth)
-            else:  # expectiminimax
-                ai = Connect4AI_Expectiminimax(temp_game, max_depth=min(self.ai_depth, 3))
+    def generate_tree_silently(self):
+        """Generate tree without showing success message"""
+        self.start_search('analysis')
 
-            col = ai.best_move()
+    def generate_tree(self):
+        self.info_label.config(text="Generating tree...", fg='#8b5cf6')
+        self.start_search('generate')
+
+    def start_search(self, purpose):
+        """
+        Run the selected AI on a copy of the game in a background worker.
+        purpose: 'ai_move', 'analysis' or 'generate'
+        """
+        key = self.analysis_key()
+
+        # The position was being pondered: let that search finish, then
+        # come back and take its result from the cache
+        if self.ponderer is not None and self.ponderer.focus(key):
+            self.tree_stats_label.config(text="Finishing pondered search...", fg='#8b5cf6')
+            self.root.after(50, self.start_search, purpose)
+            return
+        self.stop_pondering()
 
-            # Save tree data from AI move
-            self.tree_data = ai.tree_data
+        # The same search is already running, just take over its result
+        if self.search_worker is not None and self.search_key == key:
+            self.search_worker.purpose = purpose
+            return
 
-            self.game.play(col)
+        self.stop_search(discard=True)
+        self.search_position = self.position_key()
+        self.search_key = key
 
-            self.update_board()
+        # Reuse a finished search of this position
+        with self.cache_lock:
+            cached = self.analysis_cache.get(key)
+        if cached is not None:
+            self.finish_search(purpose, cached, from_cache=True)
+            return
 
-            # Always display tree after AI move
-            self.display_tree()
-            stats = ai.get_tree_stats()
-            stats_text = f"AI Move (Col {col}) | Nodes: {stats['total']} | "
-            if 'pruned' in stats:
-                stats_text += f"Pruned: {stats['pruned']} | "
-            if 'chance_nodes' in stats:
-                stats_text += f"Chance: {stats['chance_nodes']} | "
-            stats_text += f"Time: {self.tree_data['metadata']['computation_time']:.3f}s"
-            self.tree_stats_label.config(text=stats_text, fg='#059669')
+        try:
+            ai = self.create_ai(self.copy_game())
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to start search: {str(e)}")
+            return
 
-            self.check_winner()
+        worker = SearchWorker(ai, self.search_depth(), purpose)
+        self.search_worker = worker
+        self.search_progress = None
+        self.tree_stats_label.config(text="Generating tree...", fg='#8b5cf6')
+
+        worker.start()
+        self.root.after(50, self.poll_search, worker)
+
+    def stop_search(self, discard=False):
+        """
+        Stop the running search.
+        discard=False keeps the best move found so far ("Move Now"),
+        discard=True throws the search away ("Cancel") and waits for the
+        worker to end, so the next search never runs beside it on the same
+        transposition table or MCTS tree.
+        """
+        worker = self.search_worker
+        if worker is None:
+            return
 
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            messagebox.showerror("Error", f"AI move failed: {str(e)}")
+        worker.stop()
+        if discard:
+            self.search_worker = None
+            worker.join()  # it stops at its next node
 
-    def generate_tree_silently(self):
-        """Generate tree without showing success message"""
-        try:
-            # Create fresh AI with current game state
-            temp_game = Connect4()
-            temp_game.board = [[self.game.board[c][r] for r in range(self.game.length)]
-                               for c in range(self.game.width)]
-            temp_game.turn = self.game.turn
-            temp_game.score_1 = self.game.score_1
-            temp_game.score_2 = self.game.score_2
-
-            self.tree_stats_label.config(text="Generating tree...", fg='#8b5cf6')
-            self.root.update()
-
-            if self.selected_algorithm == "minimax_pruning":
-                ai = Connect4AI_TreeSaver(temp_game, max_depth=self.ai_depth)
-            elif self.selected_algorithm == "minimax_no_pruning":
-                ai = Connect4AI_NoPruning_TreeSaver(temp_game, max_depth=self.ai_depth)
-            else:  # expectiminimax
-                ai = Connect4AI_Expectiminimax(temp_game, max_depth=min(self.ai_depth, 3))
-
-            ai.best_move()
-            self.tree_data = ai.tree_data
+    def cancel_search(self):
+        if self.search_worker is None:
+            return
+        self.stop_search(discard=True)
+        self.update_board()
+        self.tree_stats_label.config(text="Search cancelled", fg='#666')
 
-            self.display_tree()
+    def move_now(self):
+        self.stop_search(discard=False)
 
-            # Show stats
-            stats = ai.get_tree_stats()
-            player_turn = "Player 1" if temp_game.turn == 1 else "Player 2"
-            stats_text = f"{player_turn}'s Turn | Nodes: {stats['total']} | "
-            if 'pruned' in stats:
-                stats_text += f"Pruned: {stats['pruned']} | "
-            if 'chance_nodes' in stats:
-                stats_text += f"Chance: {stats['chance_nodes']} | "
-            stats_text += f"Time: {self.tree_data['metadata']['computation_time']:.3f}s"
-            self.tree_stats_label.config(text=stats_text, fg='#059669')
+    def poll_search(self, worker):
+        """Drain worker messages on the Tk thread"""
+        if worker is not self.search_worker:
+            return  # cancelled or replaced by a newer search
 
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            self.tree_stats_label.config(text=f"Tree generation failed: {str(e)}", fg='#ef4444')
+        progress = None
+        try:
+            while True:
+                kind, data = worker.messages.get_nowait()
+                if kind == 'progress':
+                    progress = data
+                elif kind == 'done':
+                    self.search_worker = None
+                    if data['tree_data'] is not None:
+                        data['stats'] = worker.engine.get_tree_stats()
+                        if not data['stopped']:
+                            with self.cache_lock:
+                                self.analysis_cache.put(self.search_key, data)
+                    self.finish_search(worker.purpose, data)
+                    return
+                else:
+                    self.search_worker = None
+                    # data is the worker's traceback; its last line names the exception
+                    reason = data.strip().splitlines()[-1] if data.strip() else "unknown error"
+                    self.update_board()
+                    self.tree_stats_label.config(text=f"Tree generation failed: {reason}", fg='#ef4444')
+                    if worker.purpose != 'analysis':
+                        messagebox.showerror("Error", f"Search failed: {reason}", detail=data)
+                    return
+        except queue.Empty:
+            pass
+
+        if progress is not None:
+            self.search_progress = progress
+
+        text = f"Searching... Nodes: {worker.control.nodes} | {worker.elapsed():.1f}s"
+        if self.search_progress is not None:
+            text = (f"Searching... Depth {self.search_progress['depth']}/{worker.max_depth} done | "
+                    f"Best: Col {self.search_progress['best_move']} | "
+                    f"Nodes: {worker.control.nodes} | {worker.elapsed():.1f}s")
+        self.tree_stats_label.config(text=text, fg='#8b5cf6')
+
+        self.root.after(50, self.poll_search, worker)
+
+    def finish_search(self, purpose, result, from_cache=False):
+        self.search_progress = None
+
+        # The game moved on while we were searching
+        if self.position_key() != self.search_position:
+            return
 
-    def generate_tree(self):
         try:
-            # Create fresh AI with current game state
-            temp_game = Connect4()
-            temp_game.board = [[self.game.board[c][r] for r in range(self.game.length)]
-                               for c in range(self.game.width)]
-            temp_game.turn = self.game.turn
-            temp_game.score_1 = self.game.score_1
-            temp_game.score_2 = self.game.score_2
-
-            self.info_label.config(text="Generating tree...", fg='#8b5cf6')
-            self.root.update()
-
-            if self.selected_algorithm == "minimax_pruning":
-                ai = Connect4AI_TreeSaver(temp_game, max_depth=self.ai_depth)
-            elif self.selected_algorithm == "minimax_no_pruning":
-                ai = Connect4AI_NoPruning_TreeSaver(temp_game, max_depth=self.ai_depth)
-            else:  # expectiminimax
-                ai = Connect4AI_Expectiminimax(temp_game, max_depth=min(self.ai_depth, 3))
-
-            ai.best_move()
-            self.tree_data = ai.tree_data
+            col = result['best_move']
+            self.tree_data = result['tree_data']
 
-            self.display_tree()
-            self.update_board()
+            if purpose == 'ai_move':
+                self.game.play(col)
 
-            # Show stats
-            stats = ai.get_tree_stats()
-            stats_text = f"Nodes: {stats['total']} | "
-            if 'pruned' in stats:
-                stats_text += f"Pruned: {stats['pruned']} | "
-            if 'chance_nodes' in stats:
-                stats_text += f"Chance: {stats['chance_nodes']} | "
-            stats_text += f"Time: {self.tree_data['metadata']['computation_time']:.3f}s"
-            self.tree_stats_label.config(text=stats_text, fg='#059669')
+            self.update_board(animate=purpose == 'ai_move')
 
-            messagebox.showinfo("Success", "Tree generated successfully!")
+            # Always display tree after a search
+            self.display_tree()
+            stats_text = self.tree_stats_text(result['stats'])
+            if result['stopped']:
+                stats_text += f" | Depth {result['depth']}/{result['max_depth']} (stopped)"
+            if from_cache:
+                stats_text += " | Pondered" if result.get('pondered') else " | Cached"
+
+            if purpose == 'ai_move':
+                self.tree_stats_label.config(text=f"AI Move (Col {col}) | {stats_text}", fg='#059669')
+                self.start_pondering(col)
+                self.check_winner()
+            elif purpose == 'analysis':
+                player_turn = "Player 1" if self.game.turn == 1 else "Player 2"
+                self.tree_stats_label.config(text=f"{player_turn}'s Turn | {stats_text}", fg='#059669')
+            else:
+                self.tree_stats_label.config(text=stats_text, fg='#059669')
+                messagebox.showinfo("Success", "Tree generated successfully!")
 
         except Exception as e:
             import traceback
             traceback.print_exc()
-            messagebox.showerror("Error", f"Failed to generate tree: {str(e)}")
+            messagebox.showerror("Error", f"Search failed: {str(e)}")
 
     def display_tree(self):
-        self.tree_canvas.delete("all")
-        self.node_positions = {}
+        self.tree_canvas.delete("header")
 
         if self.tree_data is None:
+            self.tree_view.set_tree(None)
             self.tree_canvas.create_text(400, 300, text="No tree data available",
-                                         font=("Arial", 14), fill='#666')
+                                         font=("Arial", 14), fill='#666', tags='header')
             return
 
         # Display metadata with better formatting
@@ -440,253 +671,32 @@ class Connect4GUI:
         # Algorithm info
         algo_text = f"Algorithm: {meta['algorithm'].upper()} | Depth: {meta['max_depth']}"
         self.tree_canvas.create_text(15, header_y, text=algo_text, anchor='nw',
-                                     font=("Arial", 11, "bold"), fill='#1e40af')
+                                     font=("Arial", 11, "bold"), fill='#1e40af', tags='header')
 
         # Stats info
         stats_text = f"Total Nodes: {meta['total_nodes']}"
         if 'pruned_nodes' in meta:
             stats_text += f" | Pruned: {meta['pruned_nodes']}"
+        search_stats = meta.get('search_stats') or {}
+        if search_stats.get('cutoffs'):
+            stats_text += (f" | Cutoffs: {search_stats['cutoffs']} "
+                           f"({search_stats['first_move_cutoff_rate']:.0%} on first move)")
+        if meta.get('transposition'):
+            stats_text += (f" | TT: {meta['transposition']['entries']} entries, "
+                           f"{search_stats.get('tt_hits', 0)} hits")
         self.tree_canvas.create_text(15, header_y + 20, text=stats_text, anchor='nw',
-                                     font=("Arial", 10), fill='#059669')
+                                     font=("Arial", 10), fill='#059669', tags='header')
 
         # Best move info
         if 'best_move' in meta:
             best_text = f"Best Move: Column {meta['best_move']} | "
             best_text += f"Value: {meta.get('best_value', meta.get('expected_value', 0)):.2f}"
             self.tree_canvas.create_text(15, header_y + 40, text=best_text, anchor='nw',
-                                         font=("Arial", 10, "bold"), fill='#dc2626')
-
-        # Calculate tree layout with zoom
-        self.calculate_tree_layout(self.tree_data['root'])
-
-        # Draw edges first
-        self.draw_edges(self.tree_data['root'])
-
-        # Draw nodes on top
-        self.draw_nodes(self.tree_data['root'])
-
-        # Update scroll region
-        bbox = self.tree_canvas.bbox("all")
-        if bbox:
-            # Add padding around the tree
-            padding = 50
-            self.tree_canvas.configure(scrollregion=(
-                bbox[0] - padding,
-                bbox[1] - padding,
-                bbox[2] + padding,
-                bbox[3] + padding
-            ))
-
-    def calculate_tree_layout(self, node, depth=0, x_offset=0):
-        """Calculate positions for all nodes with improved spacing"""
-        # Scale with zoom
-        node_width = int(120 * self.zoom_level)
-        horizontal_spacing = int(140 * self.zoom_level)
-        vertical_spacing = int(110 * self.zoom_level)
-
-        node_id = node.get('id', 0)
-
-        # Get children
-        children = []
-        if node.get('node_type') == 'CHANCE' and 'outcomes' in node:
-            for outcome in node.get('outcomes', []):
-                if 'child_node' in outcome:
-                    children.append(outcome['child_node'])
-        else:
-            children = node.get('children', [])
-
-        # Filter out pruned children
-        children = [c for c in children if not c.get('pruned', False)]
-
-        if not children:
-            # Leaf node
-            x = x_offset
-            y = 80 + depth * vertical_spacing
-            self.node_positions[node_id] = (x, y, node)
-            return x, 1
-
-        # Recursively calculate positions for children
-        child_x_start = x_offset
-        total_width = 0
-
-        for i, child in enumerate(children):
-            child_x, child_width = self.calculate_tree_layout(child, depth + 1, child_x_start)
-            child_x_start += child_width * horizontal_spacing
-            total_width += child_width
-
-        # Center parent over children
-        first_child_id = children[0].get('id', 0)
-        last_child_id = children[-1].get('id', 0)
-
-        if first_child_id in self.node_positions and last_child_id in self.node_positions:
-            first_x = self.node_positions[first_child_id][0]
-            last_x = self.node_positions[last_child_id][0]
-            x = (first_x + last_x) / 2
-        else:
-            x = x_offset + (total_width * horizontal_spacing) / 2
+                                         font=("Arial", 10, "bold"), fill='#dc2626', tags='header')
 
-        y = 80 + depth * vertical_spacing
-        self.node_positions[node_id] = (x, y, node)
-
-        return x, total_width
-
-    def draw_edges(self, node):
-        """Draw edges with better visibility"""
-        node_id = node.get('id', 0)
-        if node_id not in self.node_positions:
-            return
-
-        x1, y1, _ = self.node_positions[node_id]
-        box_height = int(60 * self.zoom_level)
-
-        # Get children
-        children = []
-        if node.get('node_type') == 'CHANCE' and 'outcomes' in node:
-            for outcome in node.get('outcomes', []):
-                if 'child_node' in outcome:
-                    children.append((outcome['child_node'], outcome.get('probability', 0)))
-        else:
-            children = [(c, None) for c in node.get('children', [])]
-
-        for child, prob in children:
-            if child.get('pruned', False):
-                continue
-
-            child_id = child.get('id', 0)
-            if child_id in self.node_positions:
-                x2, y2, _ = self.node_positions[child_id]
-
-                # Draw edge
-                line_width = max(1, int(2 * self.zoom_level))
-                if prob is not None:
-                    # Dashed line for chance nodes
-                    self.tree_canvas.create_line(x1, y1 + box_height / 2, x2, y2 - box_height / 2,
-                                                 fill=self.colors['chance_edge'],
-                                                 width=line_width, dash=(6, 3))
-                    # Draw probability label
-                    mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
-                    font_size = max(8, int(9 * self.zoom_level))
-                    # Background for better readability
-                    prob_text = f"{prob:.0%}"
-                    text_id = self.tree_canvas.create_text(mid_x, mid_y, text=prob_text,
-                                                           font=("Arial", font_size, "bold"),
-                                                           fill='#f59e0b')
-                    bbox = self.tree_canvas.bbox(text_id)
-                    if bbox:
-                        self.tree_canvas.create_rectangle(bbox[0] - 2, bbox[1] - 1,
-                                                          bbox[2] + 2, bbox[3] + 1,
-                                                          fill='white', outline='#f59e0b')
-                        self.tree_canvas.tag_raise(text_id)
-                else:
-                    # Solid line for regular nodes
-                    self.tree_canvas.create_line(x1, y1 + box_height / 2, x2, y2 - box_height / 2,
-                                                 fill=self.colors['edge'], width=line_width,
-                                                 arrow=tk.LAST, arrowshape=(8, 10, 3))
-
-                # Recursively draw edges for children
-                self.draw_edges(child)
-
-    def draw_nodes(self, node):
-        """Draw nodes with improved styling and readability"""
-        node_id = node.get('id', 0)
-        if node_id not in self.node_positions:
-            return
-
-        x, y, _ = self.node_positions[node_id]
-
-        # Node colors based on type
-        node_type = node.get('node_type', 'UNKNOWN')
-        if node_type == 'MAX':
-            fill_color = self.colors['max_node']
-            outline_color = self.colors['max_border']
-            symbol = '▲'
-        elif node_type == 'MIN':
-            fill_color = self.colors['min_node']
-            outline_color = self.colors['min_border']
-            symbol = '▼'
-        elif node_type == 'CHANCE':
-            fill_color = self.colors['chance_node']
-            outline_color = self.colors['chance_border']
-            symbol = '◆'
-        else:
-            fill_color = self.colors['leaf_node']
-            outline_color = self.colors['leaf_border']
-            symbol = '●'
-
-        # Scale box with zoom
-        box_width = int(110 * self.zoom_level)
-        box_height = int(60 * self.zoom_level)
-
-        # Draw shadow for depth effect
-        shadow_offset = max(2, int(3 * self.zoom_level))
-        self.tree_canvas.create_rectangle(
-            x - box_width / 2 + shadow_offset,
-            y - box_height / 2 + shadow_offset,
-            x + box_width / 2 + shadow_offset,
-            y + box_height / 2 + shadow_offset,
-            fill='#d1d5db', outline='')
-
-        # Draw node box with rounded corners effect
-        self.tree_canvas.create_rectangle(
-            x - box_width / 2, y - box_height / 2,
-            x + box_width / 2, y + box_height / 2,
-            fill=fill_color, outline=outline_color, width=max(2, int(3 * self.zoom_level)))
-
-        # Scale fonts with zoom
-        title_font_size = max(9, int(10 * self.zoom_level))
-        value_font_size = max(10, int(12 * self.zoom_level))
-        label_font_size = max(7, int(8 * self.zoom_level))
-
-        # Draw node info with better layout
-        move_str = f"Col {node.get('move')}" if node.get('move') is not None else "ROOT"
-        value = node.get('value', node.get('expected_value', 0))
-
-        # Symbol and move on top
-        self.tree_canvas.create_text(
-            x, y - box_height / 2 + 15 * self.zoom_level,
-            text=f"{symbol} {move_str}",
-            font=("Arial", title_font_size, "bold"),
-            fill=outline_color)
-
-        # Value in center - larger and bold
-        value_text = f"{value:+.2f}" if abs(value) < 100 else f"{value:+.0f}"
-        self.tree_canvas.create_text(
-            x, y + 3 * self.zoom_level,
-            text=value_text,
-            font=("Arial", value_font_size, "bold"),
-            fill='#059669')
-
-        # Terminal/depth indicator at bottom
-        bottom_y = y + box_height / 2 - 10 * self.zoom_level
-        if node.get('terminal', False):
-            term_type = node.get('terminal_type', 'T')
-            term_label = {'W': 'WIN', 'L': 'LOSE', 'D': 'DRAW', 'T': 'TERM'}.get(term_type, term_type)
-            self.tree_canvas.create_text(
-                x, bottom_y,
-                text=f"[{term_label}]",
-                font=("Arial", label_font_size, "bold"),
-                fill='#6b7280')
-        else:
-            # Show depth for non-terminal nodes
-            depth = node.get('depth', '?')
-            self.tree_canvas.create_text(
-                x, bottom_y,
-                text=f"d:{depth}",
-                font=("Arial", label_font_size),
-                fill='#9ca3af')
-
-        # Draw children
-        children = []
-        if node.get('node_type') == 'CHANCE' and 'outcomes' in node:
-            for outcome in node.get('outcomes', []):
-                if 'child_node' in outcome:
-                    children.append(outcome['child_node'])
-        else:
-            children = node.get('children', [])
-
-        for child in children:
-            if not child.get('pruned', False):
-                self.draw_nodes(child)
+        # Start collapsed below the root; subtrees are laid out when expanded
+        self.tree_view.zoom = self.zoom_level
+        self.tree_view.set_tree(self.tree_data['root'])
 
     def load_tree(self):
         filename = filedialog.askopenfilename(
@@ -704,16 +714,38 @@ class Connect4GUI:
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load tree: {str(e)}")
 
+    def export_tree_svg(self):
+        """Save the expanded part of the displayed tree as an SVG image"""
+        if self.tree_view.layout is None:
+            messagebox.showwarning("No Tree", "Generate or load a tree first.")
+            return
+
+        filename = filedialog.asksaveasfilename(
+            title="Export Tree as SVG",
+            defaultextension=".svg",
+            filetypes=[("SVG files", "*.svg"), ("All files", "*.*")]
+        )
+
+        if filename:
+            if save_tree_svg(self.tree_view.layout, filename, self.colors):
+                messagebox.showinfo("Success", "Tree exported successfully!")
+            else:
+                messagebox.showerror("Error", "Failed to export tree")
+
     def clear_tree(self):
+        self.tree_view.set_tree(None)
         self.tree_canvas.delete("all")
         self.tree_data = None
-        self.node_positions = {}
         self.tree_stats_label.config(text="Tree cleared", fg='#666')
 
     def reset_game(self):
+        self.stop_pondering()
+        self.stop_search(discard=True)
         self.game = Connect4()
         self.ai = None
         self.tree_data = None
+        self.transposition_tables.clear()
+        self.mcts_tree.clear()
         self.update_board()
         self.clear_tree()
         messagebox.showinfo("Reset", "Game reset!")
@@ -721,10 +753,34 @@ class Connect4GUI:
     def update_algorithm(self):
         self.selected_algorithm = self.algo_var.get()
         self.ai = None  # Reset AI
+        self.stop_pondering()
 
     def update_depth(self):
         self.ai_depth = self.depth_var.get()
         self.ai = None  # Reset AI
+        self.stop_pondering()
+
+    def update_ponder(self):
+        if not self.ponder_var.get():
+            self.stop_pondering()
+
+    # ------------------------------
+    # Pondering
+    # ------------------------------
+    def start_pondering(self, ai_col):
+        """Search the human's replies to the AI's move, expected reply first"""
+        self.stop_pondering()
+        if not self.ponder_var.get():
+            return
+
+        self.ponderer = Ponderer(self.create_ai, self.search_depth(), self.selected_algorithm,
+                                 self.analysis_cache, self.cache_lock)
+        self.ponderer.start(self.copy_game(), expected_reply(self.tree_data, ai_col))
+
+    def stop_pondering(self):
+        if self.ponderer is not None:
+            self.ponderer.stop()
+            self.ponderer = None
 
     def check_winner(self):
         # Check if board is full
@@ -0,0 +1,362 @@
+import argparse
+import contextlib
+import io
+import os
+import socketserver
+import sys
+import threading
+import time
+
+from analysis_cache import AnalysisCache
+from persistent_cache import PersistentCacheSet
+from batch_analysis import game_from_board_string
+from Connect4 import Connect4
+from engines import ENGINES, create_engine
+from search_worker import SearchWorker
+from transposition import TranspositionTable
+from tree_capture import CapturePolicy
+
+DEFAULT_ENGINE = 'Connect4AI'
+DEFAULT_DEPTH = 4
+# Depth used when only a time limit is given; the deadline ends the search
+MAX_DEPTH = 42
+
+HELP = """Commands:
+  isready                         -> readyok
+  engine <name>                   select the engine (kept alive between searches)
+  newgame                         reset the position, keep engines and caches
+  position startpos [moves 3323]  set the position from the empty board
+  position board <rows>           rows of board_to_string() joined with '/'
+  go [depth N] [movetime MS]      search; prints info lines and bestmove
+                                  ("info string cached" when answered from the cache)
+  go infinite | ponder            search until stop
+  stop                            stop the search, bestmove is the best so far
+  quit"""
+
+
+class EngineRegistry:
+    def __init__(self, persistent=None):
+        """
+        Engines shared by all sessions of a server, one per engine name.
+
+        persistent: optional PersistentCacheSet behind the engines'
+                    transposition tables; each engine gets its own file
+
+        Engine objects are created once and reused for every search of
+        every session, so anything they keep survives between moves and
+        connections; that includes a transposition table for the engines
+        that take one. An engine runs one search at a time: checkout()
+        returns None while another session is searching with it.
+        """
+        self.persistent = persistent
+        self.lock = threading.Lock()
+        self.engines = {}
+        self.busy = set()
+
+    def create(self, engine_name):
+        """A new engine, with a transposition table if it takes one"""
+        engine = create_engine(engine_name, Connect4(), DEFAULT_DEPTH)
+        if hasattr(engine, 'tt'):
+            engine.tt = TranspositionTable(persistent=self.persistent.get(engine_name)
+                                           if self.persistent is not None else None)
+        return engine
+
+    def checkout(self, engine_name):
+        """The shared engine for one search, or None if it is busy; hand it back with checkin()"""
+        with self.lock:
+            if engine_name in self.busy:
+                return None
+            engine = self.engines.get(engine_name)
+            if engine is None:
+                engine = self.engines[engine_name] = self.create(engine_name)
+            self.busy.add(engine_name)
+            return engine
+
+    def checkin(self, engine_name):
+        with self.lock:
+            self.busy.discard(engine_name)
+
+
+class EngineSession:
+    def __init__(self, write, cache=None, cache_lock=None, engine=DEFAULT_ENGINE, engines=None):
+        """
+        One client of the engine server.
+
+        write: called with every output line
+        cache: AnalysisCache shared between sessions; finished searches are
+               answered from it when the same position is asked again
+        cache_lock: lock guarding a shared cache
+        engines: EngineRegistry shared between sessions
+
+        Searches use the registry's engine for the selected name. When
+        another session is searching with it, the session falls back to
+        an engine of its own, kept for its later searches.
+        """
+        self.write = write
+        self.cache = cache if cache is not None else AnalysisCache()
+        self.cache_lock = cache_lock or threading.Lock()
+        self.engine_name = engine
+        self.engines = engines if engines is not None else EngineRegistry()
+        self.private_engines = {}
+        self.game = Connect4()
+        self.worker = None
+        self.reporter = None
+
+    # ------------------------------
+    # Command dispatch
+    # ------------------------------
+    def handle(self, line):
+        """Handle one command line; returns False once the session should end"""
+        parts = line.split()
+        if not parts:
+            return True
+
+        command, args = parts[0].lower(), parts[1:]
+        try:
+            if command == 'quit':
+                self.stop()
+                return False
+            elif command == 'isready':
+                self.write("readyok")
+            elif command == 'help':
+                for help_line in HELP.split('\n'):
+                    self.write(help_line)
+            elif command == 'engine':
+                self.set_engine(args)
+            elif command == 'newgame':
+                self.stop()
+                self.game = Connect4()
+            elif command == 'position':
+                self.set_position(args)
+            elif command == 'go':
+                self.go(args)
+            elif command == 'ponder':
+                self.go(['infinite'])
+            elif command == 'stop':
+                self.stop()
+            else:
+                self.write(f"error unknown command '{command}'")
+        except (ValueError, IndexError) as e:
+            self.write(f"error {e}")
+        return True
+
+    def set_engine(self, args):
+        if not args or args[0] not in ENGINES:
+            raise ValueError(f"engine must be one of: {' '.join(ENGINES)}")
+        self.stop()
+        self.engine_name = args[0]
+
+    def set_position(self, args):
+        self.stop()
+        game = Connect4()
+
+        if args[0] == 'startpos':
+            moves = args[2:] if len(args) > 1 and args[1] == 'moves' else []
+            for col in ''.join(moves):
+                if not col.isdigit() or int(col) >= game.width:
+                    raise ValueError(f"bad move '{col}'")
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if game.play(int(col)) == 1:
+                        raise ValueError(f"column {col} is full")
+        elif args[0] == 'board':
+            game = game_from_board_string(args[1])
+        else:
+            raise ValueError("position must be 'startpos' or 'board'")
+
+        self.game = game
+
+    # ------------------------------
+    # Searching
+    # ------------------------------
+    def engine(self):
+        """
+        An engine for the selected name pointed at the position, and the
+        release function to call when its search is over
+        """
+        engine = self.engines.checkout(self.engine_name)
+        if engine is not None:
+            name = self.engine_name
+            release = lambda: self.engines.checkin(name)
+        else:
+            engine = self.private_engines.get(self.engine_name)
+            if engine is None:
+                engine = self.private_engines[self.engine_name] = self.engines.create(self.engine_name)
+            release = lambda: None
+
+        game = Connect4()
+        game.board = [col[:] for col in self.game.board]
+        game.turn = self.game.turn
+        game.score_1 = self.game.score_1
+        game.score_2 = self.game.score_2
+        engine.game = game
+        return engine, release
+
+    def go(self, args):
+        depth = None
+        movetime = None
+        infinite = False
+
+        i = 0
+        while i < len(args):
+            if args[i] == 'depth':
+                depth = int(args[i + 1])
+                i += 2
+            elif args[i] == 'movetime':
+                movetime = int(args[i + 1]) / 1000
+                i += 2
+            elif args[i] in ('infinite', 'ponder'):
+                infinite = True
+                i += 1
+            else:
+                raise ValueError(f"unknown go option '{args[i]}'")
+
+        if depth is None:
+            depth = MAX_DEPTH if movetime is not None or infinite else DEFAULT_DEPTH
+
+        self.stop()
+
+        key = AnalysisCache.make_key(self.game.board, self.game.turn, self.engine_name, depth)
+        with self.cache_lock:
+            cached = self.cache.get(key)
+        if cached is not None:
+            self.write(f"info depth {cached['depth']} nodes 0 time 0 move {cached['best_move']}")
+            self.write("info string cached")
+            self.write(f"bestmove {cached['best_move']}")
+            return
+
+        engine, release = self.engine()
+        # Only the root is needed; skip building the full tree
+        capture = CapturePolicy(max_plies=0) if hasattr(engine, 'capture') else None
+        worker = SearchWorker(engine, depth, capture=capture)
+        if movetime is not None:
+            worker.control.deadline = time.time() + movetime
+
+        self.worker = worker
+        self.reporter = threading.Thread(target=self.report, args=(worker, key, release), daemon=True)
+        worker.start()
+        self.reporter.start()
+
+    def report(self, worker, key, release):
+        """Turn worker messages into info/bestmove lines; release the engine when the search ends"""
+        while True:
+            kind, data = worker.messages.get()
+            if kind != 'progress':
+                release()
+            if kind == 'progress':
+                self.write(f"info depth {data['depth']} nodes {data['nodes']} "
+                           f"time {int(data['elapsed'] * 1000)} move {data['best_move']}")
+            elif kind == 'done':
+                if not data['stopped'] and data['best_move'] is not None:
+                    result = {'best_move': data['best_move'], 'depth': data['depth']}
+                    with self.cache_lock:
+                        self.cache.put(key, result)
+                self.write(f"bestmove {data['best_move']}")
+                break
+            else:
+                self.write("error search failed")
+                for error_line in data.rstrip().split('\n'):
+                    self.write(f"error {error_line}")
+                break
+
+    def stop(self):
+        """Stop the running search and wait for its bestmove line"""
+        worker, reporter = self.worker, self.reporter
+        self.worker = self.reporter = None
+        if worker is None:
+            return
+        worker.stop()
+        worker.join()
+        reporter.join()
+
+
+# ------------------------------
+# Transports
+# ------------------------------
+def line_writer(send):
+    """Serialise output lines from the session and its reporter threads"""
+    lock = threading.Lock()
+
+    def write(line):
+        with lock:
+            send(line + "\n")
+    return write
+
+
+def serve_stdio(out, engine=DEFAULT_ENGINE, cache_size=64, persistent=None):
+    """Speak the protocol on stdin and the given output stream"""
+    def send(text):
+        out.write(text)
+        out.flush()
+
+    session = EngineSession(line_writer(send), AnalysisCache(max_entries=cache_size), engine=engine,
+                            engines=EngineRegistry(persistent))
+    for line in sys.stdin:
+        if not session.handle(line):
+            break
+    session.stop()
+
+
+class SessionHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        def send(text):
+            self.wfile.write(text.encode())
+            self.wfile.flush()
+
+        session = EngineSession(line_writer(send), self.server.cache, self.server.cache_lock,
+                                engine=self.server.engine_name, engines=self.server.engines)
+        try:
+            for raw in self.rfile:
+                if not session.handle(raw.decode(errors='replace')):
+                    break
+        except OSError:
+            pass  # client went away
+        finally:
+            session.stop()
+
+
+class EngineTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, engine=DEFAULT_ENGINE, cache_size=64, persistent=None):
+        """One session per connection; all sessions share the engines and one analysis cache"""
+        super().__init__(address, SessionHandler)
+        self.engine_name = engine
+        self.engines = EngineRegistry(persistent)
+        self.cache = AnalysisCache(max_entries=cache_size)
+        self.cache_lock = threading.Lock()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Long-lived Connect 4 engine speaking a line protocol")
+    parser.add_argument('--engine', choices=list(ENGINES), default=DEFAULT_ENGINE)
+    parser.add_argument('--port', type=int, default=None, help="serve on 127.0.0.1:PORT instead of stdin/stdout")
+    parser.add_argument('--cache-size', type=int, default=64, help="finished searches kept for repeated positions")
+    parser.add_argument('--persistent-cache', default=None,
+                        help="sqlite file name keeping searched positions across restarts; "
+                             "each engine uses <name>.<engine>")
+    args = parser.parse_args(argv)
+
+    persistent = PersistentCacheSet(args.persistent_cache) if args.persistent_cache else None
+
+    # The engines print their progress; protocol lines get the real stdout
+    protocol_out = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+
+    try:
+        if args.port is None:
+            serve_stdio(protocol_out, args.engine, args.cache_size, persistent)
+        else:
+            with EngineTCPServer(('127.0.0.1', args.port), args.engine, args.cache_size, persistent) as server:
+                print(f"Engine server listening on 127.0.0.1:{args.port}", file=sys.stderr)
+                server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = protocol_out
+        if persistent is not None:
+            persistent.close()
+
+
+if __name__ == "__main__":
+    main()
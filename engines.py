@@ -0,0 +1,25 @@
+from minimax_pruning import Connect4AI
+from Connect4AI import Connect4AI_TreeSaver
+from Connect4AI_NoPruning import Connect4AI_NoPruning_TreeSaver
+from Connect4AI_Expectiminimax import Connect4AI_Expectiminimax
+from expect_minimax import Connect4AI_Expectiminimax_TreeSaver
+from Connect4AI_MCTS import Connect4AI_MCTS
+
+# Every engine that can be driven through best_move(), by class name.
+# minimax_no_pruning.py plays a game when imported, so it is not listed;
+# Connect4AI_NoPruning_TreeSaver runs the same search.
+ENGINES = {
+    'Connect4AI': Connect4AI,
+    'Connect4AI_TreeSaver': Connect4AI_TreeSaver,
+    'Connect4AI_NoPruning_TreeSaver': Connect4AI_NoPruning_TreeSaver,
+    'Connect4AI_Expectiminimax': Connect4AI_Expectiminimax,
+    'Connect4AI_Expectiminimax_TreeSaver': Connect4AI_Expectiminimax_TreeSaver,
+    'Connect4AI_MCTS': Connect4AI_MCTS,
+}
+
+
+def create_engine(name, game, max_depth=4):
+    """Create the engine registered under name for the given game"""
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}', expected one of: {', '.join(ENGINES)}")
+    return ENGINES[name](game, max_depth=max_depth)
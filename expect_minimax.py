@@ -3,6 +3,9 @@ import copy
 import time
 import json
 from Connect4 import Connect4
+from tree_capture import CapturePolicy, KEEP_SUBTREE, KEEP_NONE, research_pv
+from search_stats import SearchStats
+from search_control import best_move_async, memory_checked
 
 
 class Connect4AI_Expectiminimax_TreeSaver:
@@ -11,6 +14,9 @@ class Connect4AI_Expectiminimax_TreeSaver:
         self.max_depth = max_depth
         self.tree_data = None
         self.node_id_counter = 0
+        self.capture = CapturePolicy()
+        self.stats = SearchStats(chance=True)
+        self.control = None  # optional SearchControl for cancellation
 
     def get_valid_moves(self, board):
         valid = []
@@ -50,13 +56,16 @@ class Connect4AI_Expectiminimax_TreeSaver:
             result.append(''.join(row))
         return '\n'.join(result)
 
-    def expectation_value(self, board, chosen_col, depth, maximizing, parent_move=None, parent_id=None):
+    def expectation_value(self, board, chosen_col, depth, maximizing, parent_move=None, parent_id=None,
+                          keep=KEEP_SUBTREE):
         """
-        Chance node: disc may fall left or right with given probabilities
+        Chance node: disc may fall left or right with given probabilities;
+        keep: what the capture keeps of this node
         """
         # Create chance node
         chance_node_id = self.node_id_counter
         self.node_id_counter += 1
+        self.stats.node(depth, 'CHANCE')
         
         player = 1 if maximizing else 2
         valid = self.get_valid_moves(board)
@@ -77,127 +86,171 @@ class Connect4AI_Expectiminimax_TreeSaver:
                 total += p
 
         # Create chance node structure
-        chance_node = {
-            'id': chance_node_id,
-            'parent_id': parent_id,
-            'depth': depth,
-            'move': parent_move,
-            'node_type': 'CHANCE',
-            'chosen_col': chosen_col,
-            'board_state': self.board_to_string(board),
-            'probability_distribution': {},
-            'outcomes': [],
-            'expected_value': 0,
-            'valid_moves': valid
-        }
+        chance_node = None
+        recorded_start = self.capture.recorded_nodes
+        if self.capture.should_record(self.max_depth - depth, keep):
+            chance_node = {
+                'id': chance_node_id,
+                'parent_id': parent_id,
+                'depth': depth,
+                'move': parent_move,
+                'node_type': 'CHANCE',
+                'chosen_col': chosen_col,
+                'board_state': self.board_to_string(board),
+                'probability_distribution': {},
+                'outcomes': [],
+                'expected_value': 0,
+                'valid_moves': valid
+            }
+            self.capture.record(chance_node)
 
         # Redistribute probability if needed
         if total == 0:
             tmp = copy.deepcopy(self.game)
             tmp.board = board
             value = tmp.advanced_dynamic_heuristic()
-            chance_node['expected_value'] = value
-            chance_node['note'] = 'No valid outcomes'
+            self.stats.leaf_evals += 1
+            if chance_node is not None:
+                chance_node['expected_value'] = value
+                chance_node['note'] = 'No valid outcomes'
             return chance_node, value
 
         for c in normalized:
             normalized[c] /= total
 
-        chance_node['probability_distribution'] = {str(k): v for k, v in normalized.items()}
+        if chance_node is not None:
+            chance_node['probability_distribution'] = {str(k): v for k, v in normalized.items()}
 
         expected_value = 0
 
         for move, prob in normalized.items():
             new_board = self.simulate(board, move, player)
-            child_node, value = self.expectiminimax(new_board, depth - 1, not maximizing, move, chance_node_id)
-            
-            outcome = {
-                'actual_column': move,
-                'probability': prob,
-                'value': value,
-                'contribution': prob * value,
-                'child_node': child_node
-            }
+            child_node, value = self.expectiminimax(
+                new_board, depth - 1, not maximizing, move, chance_node_id,
+                self.capture.keep_child(keep if chance_node is not None else KEEP_NONE, True))
             
-            chance_node['outcomes'].append(outcome)
+            if chance_node is not None:
+                outcome = {
+                    'actual_column': move,
+                    'probability': prob,
+                    'value': value,
+                    'contribution': prob * value
+                }
+                if child_node is not None:
+                    outcome['child_node'] = child_node
+
+                chance_node['outcomes'].append(outcome)
             expected_value += prob * value
 
-        chance_node['expected_value'] = expected_value
+        if chance_node is not None:
+            chance_node['expected_value'] = expected_value
+            chance_node['searched_subtree'] = self.node_id_counter - chance_node_id
+            chance_node['recorded_subtree'] = self.capture.recorded_nodes - recorded_start
 
         return chance_node, expected_value
 
-    def expectiminimax(self, board, depth, maximizing, move=None, parent_id=None):
+    def expectiminimax(self, board, depth, maximizing, move=None, parent_id=None, keep=KEEP_SUBTREE):
         """
-        Expectiminimax core with tree structure capture
+        Expectiminimax core with tree structure capture;
+        keep: what the capture keeps of this node
         """
+        if self.control is not None:
+            self.control.check()
+        self.stats.node(depth, 'MAX' if maximizing else 'MIN')
+
         # Create node
         node_id = self.node_id_counter
         self.node_id_counter += 1
         
         valid = self.get_valid_moves(board)
 
-        node = {
-            'id': node_id,
-            'parent_id': parent_id,
-            'depth': depth,
-            'move': move,
-            'node_type': 'MAX' if maximizing else 'MIN',
-            'board_state': self.board_to_string(board),
-            'children': [],
-            'value': None,
-            'best_move': None,
-            'terminal': False,
-            'valid_moves': valid
-        }
+        node = None
+        recorded_start = self.capture.recorded_nodes
+        if self.capture.should_record(self.max_depth - depth, keep):
+            node = {
+                'id': node_id,
+                'parent_id': parent_id,
+                'depth': depth,
+                'move': move,
+                'node_type': 'MAX' if maximizing else 'MIN',
+                'board_state': self.board_to_string(board),
+                'children': [],
+                'value': None,
+                'best_move': None,
+                'terminal': False,
+                'valid_moves': valid
+            }
+            self.capture.record(node)
 
         if depth == 0 or self.is_terminal(board):
             tmp = copy.deepcopy(self.game)
             tmp.board = board
             value = tmp.advanced_dynamic_heuristic()
-            
-            node['terminal'] = True
-            node['terminal_type'] = 'LEAF' if depth == 0 else 'TERMINAL'
-            node['value'] = value
+            if depth == 0:
+                self.stats.leaf_evals += 1
+            else:
+                self.stats.terminal_hits += 1
+
+            if node is not None:
+                node['terminal'] = True
+                node['terminal_type'] = 'LEAF' if depth == 0 else 'TERMINAL'
+                node['value'] = value
             return node, value
 
         if maximizing:
             best_value = -math.inf
             best_move = None
 
-            for child_move in valid:
-                chance_node, value = self.expectation_value(board, child_move, depth, True, child_move, node_id)
+            for i, child_move in enumerate(valid):
+                chance_node, value = self.expectation_value(
+                    board, child_move, depth, True, child_move, node_id,
+                    self.capture.keep_child(keep if node is not None else KEEP_NONE, i == 0))
                 
-                node['children'].append(chance_node)
+                if node is not None and chance_node is not None:
+                    node['children'].append(chance_node)
                 
                 if value > best_value:
                     best_value = value
                     best_move = child_move
 
-            node['value'] = best_value
-            node['best_move'] = best_move
-            return node, best_value
-
         else:
             # Minimizing player (opponent)
             best_value = math.inf
             best_move = None
 
-            for child_move in valid:
-                chance_node, value = self.expectation_value(board, child_move, depth, False, child_move, node_id)
+            for i, child_move in enumerate(valid):
+                chance_node, value = self.expectation_value(
+                    board, child_move, depth, False, child_move, node_id,
+                    self.capture.keep_child(keep if node is not None else KEEP_NONE, i == 0))
                 
-                node['children'].append(chance_node)
+                if node is not None and chance_node is not None:
+                    node['children'].append(chance_node)
                 
                 if value < best_value:
                     best_value = value
                     best_move = child_move
 
+        if node is not None:
             node['value'] = best_value
             node['best_move'] = best_move
-            return node, best_value
+            if self.capture.research_best(node, keep):
+                research_pv(self, node, lambda: self.expectation_value(
+                    board, best_move, depth, maximizing, best_move, node_id)[0])
+            node['searched_subtree'] = self.node_id_counter - node_id
+            self.capture.finish_node(node)
+            node['recorded_subtree'] = self.capture.recorded_nodes - recorded_start
+        return node, best_value
+
+    def best_move(self, capture=None):
+        """
+        Get the best move and save the tree
 
-    def best_move(self):
-        """Get the best move and save the tree"""
+        capture: optional CapturePolicy limiting which nodes are recorded
+        """
         self.node_id_counter = 0
+        self.capture = capture if capture is not None else CapturePolicy()
+        self.capture.reset()
+        self.stats.reset()
         
         print("\n" + "="*70)
         print("Running Expectiminimax and saving tree...")
@@ -205,13 +258,18 @@ class Connect4AI_Expectiminimax_TreeSaver:
         
         start_time = time.time()
         
-        tree_root, value = self.expectiminimax(
-            self.game.board,
-            self.max_depth,
-            maximizing=(self.game.turn == 1),
-            move=None,
-            parent_id=None
-        )
+        self.capture.begin_search()
+        try:
+            with memory_checked(self):
+                tree_root, value = self.expectiminimax(
+                    self.game.board,
+                    self.max_depth,
+                    maximizing=(self.game.turn == 1),
+                    move=None,
+                    parent_id=None
+                )
+        finally:
+            self.capture.end_search()
         
         elapsed = time.time() - start_time
         
@@ -228,7 +286,10 @@ class Connect4AI_Expectiminimax_TreeSaver:
                 'current_turn': self.game.turn,
                 'board_width': self.game.width,
                 'board_height': self.game.length,
-                'note': 'Includes CHANCE nodes for probabilistic outcomes'
+                'note': 'Includes CHANCE nodes for probabilistic outcomes',
+                'capture': self.capture.summary(),
+                'peak_memory': self.capture.peak_memory(),
+                'search_stats': self.stats.summary()
             }
         }
         
@@ -245,6 +306,10 @@ class Connect4AI_Expectiminimax_TreeSaver:
 
         return tree_root['best_move']
 
+    async def best_move_async(self, deadline=None, executor=None, **kwargs):
+        """Search off the event loop; returns the best move so far at the deadline or on cancel"""
+        return await best_move_async(self, deadline, executor, **kwargs)
+
     def save_tree_to_json(self, filename='expectiminimax_tree.json'):
         """Save the tree to a JSON file"""
         if self.tree_data is None:
@@ -278,44 +343,10 @@ class Connect4AI_Expectiminimax_TreeSaver:
             return False
 
     def get_tree_stats(self):
-        """Get statistics about the tree"""
+        """Get statistics about the last search, counted while searching"""
         if self.tree_data is None:
             return None
-        
-        def count_nodes(node, stats):
-            stats['total'] += 1
-            
-            node_type = node.get('node_type', 'UNKNOWN')
-            
-            if node_type == 'MAX':
-                stats['max_nodes'] += 1
-            elif node_type == 'MIN':
-                stats['min_nodes'] += 1
-            elif node_type == 'CHANCE':
-                stats['chance_nodes'] += 1
-            
-            if node.get('terminal', False):
-                stats['terminal'] += 1
-            
-            # For chance nodes, count outcomes
-            for outcome in node.get('outcomes', []):
-                count_nodes(outcome['child_node'], stats)
-            
-            # For regular nodes, count children
-            for child in node.get('children', []):
-                count_nodes(child, stats)
-        
-        stats = {
-            'total': 0,
-            'max_nodes': 0,
-            'min_nodes': 0,
-            'chance_nodes': 0,
-            'terminal': 0
-        }
-        
-        count_nodes(self.tree_data['root'], stats)
-        
-        return stats
+        return dict(self.tree_data['metadata']['search_stats'])
 
 
 if __name__ == "__main__":
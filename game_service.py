@@ -0,0 +1,574 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_analysis import game_from_moves
+from Connect4 import Connect4
+from engines import ENGINES, create_engine
+from search_control import SearchControl, iterative_deepening
+from transposition import TranspositionTable
+from tree_capture import CapturePolicy
+
+DEFAULT_ENGINE = 'Connect4AI'
+DEFAULT_DEPTH = 5
+DEFAULT_TIME_LIMIT = 2.0
+# Extra seconds a worker gets past the time limit before the request fails
+GRACE_SECONDS = 5.0
+# Requests one connection may have running before we stop reading from it
+MAX_PIPELINE = 8
+
+
+# ------------------------------
+# Searching (runs in the worker processes)
+# ------------------------------
+# One transposition table per engine in each worker process
+worker_tables = {}
+
+
+def search_move(moves, engine_name, depth, deadline):
+    """
+    Iterative deepening until depth or the deadline (a time.time() value),
+    whichever comes first. Depth 1 always finishes, so there is a move
+    even when the request waited in the queue past its deadline.
+    """
+    start_time = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = game_from_moves(moves)
+        engine = create_engine(engine_name, game, max_depth=depth)
+        kwargs = {}
+        if hasattr(engine, 'capture'):
+            kwargs['capture'] = CapturePolicy(max_plies=0)
+        if hasattr(engine, 'tt'):
+            engine.tt = worker_tables.setdefault(engine_name, TranspositionTable())
+
+        control = SearchControl(deadline=deadline)
+        move, _, completed = iterative_deepening(engine, depth, control, **kwargs)
+
+    return {
+        'best_move': move,
+        'depth': completed,
+        'nodes': control.nodes,
+        'time': time.time() - start_time,
+        'started_at': start_time,
+        'pid': os.getpid()
+    }
+
+
+# ------------------------------
+# Sessions
+# ------------------------------
+class Session:
+    def __init__(self, session_id, engine=DEFAULT_ENGINE, depth=DEFAULT_DEPTH):
+        self.id = session_id
+        self.game = Connect4()
+        self.moves = ''
+        self.engine = engine
+        self.depth = depth
+        self.busy = False  # an AI move is being searched
+        self.last_used = time.time()
+
+    def board_full(self):
+        return all(self.game.board[col][self.game.length - 1] != 0 for col in range(self.game.width))
+
+    def play(self, col):
+        if not isinstance(col, int) or not 0 <= col < self.game.width:
+            raise ValueError(f"column must be 0-{self.game.width - 1}")
+        if self.board_full():
+            raise ValueError("game is over")
+        with contextlib.redirect_stdout(io.StringIO()):
+            if self.game.play(col) == 1:
+                raise ValueError(f"column {col} is full")
+        self.moves += str(col)
+
+    def state(self):
+        finished = self.board_full()
+        winner = None
+        if finished:
+            winner = 1 if self.game.score_1 > self.game.score_2 else 2 if self.game.score_2 > self.game.score_1 else 0
+        return {
+            'session': self.id,
+            'moves': self.moves,
+            'turn': self.game.turn,
+            'score_1': self.game.score_1,
+            'score_2': self.game.score_2,
+            'finished': finished,
+            'winner': winner,
+            'engine': self.engine,
+            'depth': self.depth
+        }
+
+
+class ServiceError(Exception):
+    """Error reported to the client as {"ok": false, "error": ...}"""
+
+    def __init__(self, message, retry=False):
+        super().__init__(message)
+        self.retry = retry
+
+
+# ------------------------------
+# Service
+# ------------------------------
+class GameService:
+    def __init__(self, workers=None, max_queue=16, max_sessions=1000, max_time_limit=10.0, max_idle=600.0):
+        """
+        Hosts many games at once and answers JSON lines over TCP.
+
+        workers: processes searching AI moves
+        max_queue: AI moves allowed to wait for a free worker; beyond that
+                   requests are refused with "busy" and retry=true
+        max_sessions: games held at once
+        max_time_limit: cap on the time_limit a request may ask for
+        max_idle: seconds a session may go without requests before it is
+                  dropped, so clients that go away without closing their
+                  sessions do not use up max_sessions
+
+        Requests are {"id": ..., "op": ..., ...}; every response echoes the
+        id and has "ok". Ops:
+
+            new_game  [engine] [depth]      -> state of a new session
+            play      session col           -> state after a human move
+            ai_move   session [time_limit]  -> move, search info and state
+            state     session               -> state
+            close     session
+            stats                           -> service counters
+
+        A connection may send several requests without waiting; responses
+        come back as they finish, so match them by id.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_sessions = max_sessions
+        self.max_time_limit = max_time_limit
+        self.max_idle = max_idle
+        self.pool = None
+        self.server = None
+        self.sweeper = None
+        self.connections = {}  # handler task -> writer
+        self.sessions = {}
+        self.session_ids = itertools.count(1)
+        self.in_flight = 0
+        self.counters = {'requests': 0, 'ai_moves': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0,
+                         'expired': 0}
+
+    async def start(self, host='127.0.0.1', port=0):
+        """Start listening; port 0 picks a free port (see self.port)"""
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.sweeper = asyncio.create_task(self.sweep())
+        return self
+
+    async def close(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.sweeper
+        if self.server is not None:
+            self.server.close()
+            # Closing the transports ends every handler at its next read
+            for writer in self.connections.values():
+                writer.close()
+            if self.connections:
+                await asyncio.wait(list(self.connections))
+            await self.server.wait_closed()
+        if self.pool is not None:
+            # Waits for the running searches; keep the loop serving meanwhile
+            await asyncio.to_thread(self.pool.shutdown, wait=True, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    # ------------------------------
+    # Connections
+    # ------------------------------
+    async def handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        handler = asyncio.current_task()
+        self.connections[handler] = writer
+
+        async def respond(message):
+            async with write_lock:
+                writer.write((json.dumps(message) + "\n").encode())
+                await writer.drain()  # a slow reader holds up its own responses
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # Stop reading while too many requests run; TCP pushes back on the client
+                while len(tasks) >= MAX_PIPELINE:
+                    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+                task = asyncio.create_task(self.handle_line(line, respond))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.wait(tasks)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # client went away
+        finally:
+            del self.connections[handler]
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def handle_line(self, line, respond):
+        self.counters['requests'] += 1
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                raise ServiceError(f"bad JSON: {e}")
+            if not isinstance(request, dict):
+                raise ServiceError("request must be a JSON object")
+            request_id = request.get('id')
+            response = await self.handle(request)
+            response.update({'id': request_id, 'ok': True})
+        except ServiceError as e:
+            response = {'id': request_id, 'ok': False, 'error': str(e)}
+            if e.retry:
+                response['retry'] = True
+        except ValueError as e:
+            response = {'id': request_id, 'ok': False, 'error': str(e)}
+        except Exception as e:
+            self.counters['errors'] += 1
+            response = {'id': request_id, 'ok': False, 'error': f"internal error: {e}"}
+
+        with contextlib.suppress(ConnectionError):
+            await respond(response)
+
+    # ------------------------------
+    # Operations
+    # ------------------------------
+    async def handle(self, request):
+        op = request.get('op')
+        if op not in ('new_game', 'stats', 'play', 'ai_move', 'state', 'close'):
+            raise ServiceError(f"unknown op '{op}'")
+        if op == 'new_game':
+            return self.new_game(request.get('engine', DEFAULT_ENGINE), request.get('depth', DEFAULT_DEPTH))
+        if op == 'stats':
+            return self.stats()
+
+        session = self.session(request.get('session'))
+        if op == 'play':
+            if session.busy:
+                raise ServiceError("AI move in progress")
+            session.play(request.get('col'))
+            return session.state()
+        if op == 'ai_move':
+            return await self.ai_move(session, request.get('time_limit', DEFAULT_TIME_LIMIT))
+        if op == 'close':
+            del self.sessions[session.id]
+            return {'session': session.id}
+        return session.state()
+
+    def session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise ServiceError(f"no session {session_id}")
+        session.last_used = time.time()
+        return session
+
+    def expire_sessions(self):
+        """Drop sessions idle for more than max_idle seconds; a session searching an AI move stays"""
+        cutoff = time.time() - self.max_idle
+        for session in [s for s in self.sessions.values() if not s.busy and s.last_used < cutoff]:
+            del self.sessions[session.id]
+            self.counters['expired'] += 1
+
+    async def sweep(self):
+        while True:
+            await asyncio.sleep(min(self.max_idle, 60.0))
+            self.expire_sessions()
+
+    def new_game(self, engine, depth):
+        if engine not in ENGINES:
+            raise ServiceError(f"engine must be one of: {', '.join(ENGINES)}")
+        if not isinstance(depth, int) or not 1 <= depth <= 42:
+            raise ServiceError("depth must be 1-42")
+        if len(self.sessions) >= self.max_sessions:
+            self.expire_sessions()
+        if len(self.sessions) >= self.max_sessions:
+            raise ServiceError("too many sessions", retry=True)
+
+        session = Session(next(self.session_ids), engine, depth)
+        self.sessions[session.id] = session
+        return session.state()
+
+    async def ai_move(self, session, time_limit):
+        if session.busy:
+            raise ServiceError("AI move in progress")
+        if session.board_full():
+            raise ServiceError("game is over")
+        if not isinstance(time_limit, (int, float)) or time_limit <= 0:
+            raise ServiceError("time_limit must be a positive number of seconds")
+        time_limit = min(time_limit, self.max_time_limit)
+
+        # Backpressure: refuse instead of queueing without bound
+        if self.in_flight >= self.workers + self.max_queue:
+            self.counters['rejected'] += 1
+            raise ServiceError("busy", retry=True)
+
+        session.busy = True
+        self.in_flight += 1
+        queued_at = time.time()
+        loop = asyncio.get_running_loop()
+        # The time limit starts now, so time spent queued is taken from the search
+        job = self.pool.submit(search_move, session.moves, session.engine, session.depth,
+                               queued_at + time_limit)
+        # A running search cannot be cancelled: it holds its in_flight slot
+        # until the worker is really done, even after the request gave up
+        job.add_done_callback(lambda _: self.job_finished(loop))
+        try:
+            # The worker stops itself at the deadline; this only catches a stuck or
+            # hopelessly queued request (a request still queued is cancelled)
+            try:
+                result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job)),
+                                                time_limit + GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                job.cancel()
+                self.counters['timeouts'] += 1
+                raise ServiceError("search timed out", retry=True)
+
+            session.play(result['best_move'])
+            self.counters['ai_moves'] += 1
+        finally:
+            session.busy = False
+            session.last_used = time.time()
+
+        result['queued'] = max(0.0, result.pop('started_at') - queued_at)
+        result['state'] = session.state()
+        return result
+
+    def job_finished(self, loop):
+        """Done callback of a search job; runs on a pool thread"""
+        def release():
+            self.in_flight -= 1
+        with contextlib.suppress(RuntimeError):  # the loop is already closed
+            loop.call_soon_threadsafe(release)
+
+    def stats(self):
+        return dict(self.counters, sessions=len(self.sessions), in_flight=self.in_flight,
+                    workers=self.workers, max_queue=self.max_queue)
+
+
+# ------------------------------
+# Client
+# ------------------------------
+class GameClient:
+    def __init__(self, host='127.0.0.1', port=None):
+        """
+        Asyncio client for GameService. Requests may be sent concurrently
+        from several tasks; responses are matched to them by id.
+
+            async with GameClient(port=port) as client:
+                state = await client.new_game(depth=4)
+                await client.play(state['session'], 3)
+                reply = await client.ai_move(state['session'], time_limit=1.0)
+        """
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.waiting = {}
+        self.ids = itertools.count(1)
+        self.listener = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.listener = asyncio.create_task(self.listen())
+        return self
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            with contextlib.suppress(ConnectionError):
+                await self.writer.wait_closed()
+        if self.listener is not None:
+            self.listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.listener
+
+    async def __aenter__(self):
+        return await self.connect()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+        return False
+
+    async def listen(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.waiting.pop(response.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("connection closed"))
+            self.waiting.clear()
+
+    async def request(self, op, **params):
+        """Send one request and wait for its response; raises on errors"""
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[request_id] = future
+
+        self.writer.write((json.dumps(dict(params, id=request_id, op=op)) + "\n").encode())
+        await self.writer.drain()
+
+        response = await future
+        if not response['ok']:
+            raise ServiceError(response['error'], retry=response.get('retry', False))
+        return response
+
+    async def new_game(self, engine=DEFAULT_ENGINE, depth=DEFAULT_DEPTH):
+        return await self.request('new_game', engine=engine, depth=depth)
+
+    async def play(self, session, col):
+        return await self.request('play', session=session, col=col)
+
+    async def ai_move(self, session, time_limit=DEFAULT_TIME_LIMIT):
+        return await self.request('ai_move', session=session, time_limit=time_limit)
+
+    async def state(self, session):
+        return await self.request('state', session=session)
+
+    async def close_session(self, session):
+        return await self.request('close', session=session)
+
+    async def stats(self):
+        return await self.request('stats')
+
+
+# ------------------------------
+# Demo: many concurrent players
+# ------------------------------
+async def play_random_game(client, seed, depth, time_limit, max_plies):
+    """A random human against the AI; returns the AI think times"""
+    rng = random.Random(seed)
+    state = await client.new_game(depth=depth)
+    session = state['session']
+    think_times = []
+
+    for _ in range(max_plies):
+        if state['finished']:
+            break
+        if state['turn'] == 1:
+            col = rng.choice([c for c in range(7) if state['moves'].count(str(c)) < 6])
+            state = await client.play(session, col)
+        else:
+            while True:
+                try:
+                    reply = await client.ai_move(session, time_limit)
+                    break
+                except ServiceError as e:
+                    if not e.retry:
+                        raise
+                    await asyncio.sleep(0.1)  # service is busy, back off
+            think_times.append(reply['time'] + reply['queued'])
+            state = reply['state']
+
+    await client.close_session(session)
+    return think_times
+
+
+async def demo(players=8, workers=None, depth=4, time_limit=1.0, max_plies=12):
+    async with GameService(workers=workers) as service:
+        await service.start()
+        print(f"Service on 127.0.0.1:{service.port} with {service.workers} worker(s), {players} players")
+
+        start_time = time.time()
+        async with GameClient(port=service.port) as client:
+            results = await asyncio.gather(*(play_random_game(client, seed, depth, time_limit, max_plies)
+                                             for seed in range(players)))
+            stats = await client.stats()
+            del stats['id'], stats['ok']
+
+        times = [t for game in results for t in game]
+        print(f"✓ {len(times)} AI moves in {time.time() - start_time:.1f} seconds, "
+              f"mean latency {sum(times) / len(times):.2f}s, max {max(times):.2f}s")
+        print(f"Counters: {stats}")
+
+    await check_idle_expiry()
+
+
+async def check_idle_expiry():
+    """Sessions left behind by a dropped connection must not block new games for long"""
+    async with GameService(workers=1, max_sessions=2, max_idle=0.5) as service:
+        await service.start()
+        async with GameClient(port=service.port) as client:
+            for _ in range(2):
+                await client.new_game(depth=1)  # never closed
+
+        async with GameClient(port=service.port) as client:
+            try:
+                await client.new_game(depth=1)
+                print("✗ a third session was allowed past max_sessions")
+                return
+            except ServiceError:
+                pass
+
+            await asyncio.sleep(0.6)
+            state = await client.new_game(depth=1)
+            if len(service.sessions) == 1 and service.counters['expired'] == 2:
+                print(f"✓ idle sessions expired, new game {state['session']} started")
+            else:
+                print(f"✗ expected the two idle sessions to expire, have {len(service.sessions)} sessions")
+
+
+async def serve(port, workers, max_queue, max_sessions, max_time_limit, max_idle):
+    service = GameService(workers, max_queue, max_sessions, max_time_limit, max_idle)
+    await service.start('127.0.0.1', port)
+    print(f"Game service listening on 127.0.0.1:{service.port}")
+    try:
+        await service.server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Asyncio Connect 4 service hosting many games")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--queue', type=int, default=16, help="AI moves allowed to wait for a worker")
+    parser.add_argument('--max-sessions', type=int, default=1000)
+    parser.add_argument('--max-time-limit', type=float, default=10.0)
+    parser.add_argument('--max-idle', type=float, default=600.0,
+                        help="seconds without requests after which a session is dropped")
+    parser.add_argument('--demo', type=int, default=None, metavar='PLAYERS',
+                        help="start a service on a free port and play PLAYERS concurrent games against it")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.demo:
+            asyncio.run(demo(args.demo, args.workers))
+        else:
+            asyncio.run(serve(args.port, args.workers, args.queue, args.max_sessions, args.max_time_limit,
+                              args.max_idle))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -3,16 +3,24 @@ import math
 import time
 
 from Connect4 import Connect4
+from search_stats import SearchStats
+from transposition import BEST_MOVE, TERMINAL_DEPTH, EXACT, bound_type
+from search_control import best_move_async
 
 
 class Connect4AI:
-    def __init__(self, game, max_depth=4):
+    def __init__(self, game, max_depth=4, tt=None):
         """
         game: instance of Connect4 class
         max_depth: how deep minimax will search
+        tt: optional TranspositionTable kept between moves
         """
         self.game = game
         self.max_depth = max_depth
+        self.tt = tt
+        self.control = None  # optional SearchControl for cancellation
+        self.stats = SearchStats(pruning=True)
+        self.best_value = None  # value of the root after best_move()
 
     # ------------------------------
     # Generate valid moves
@@ -71,16 +79,38 @@ class Connect4AI:
     # Minimax + Alpha Beta
     # ------------------------------
     def minimax(self, board, depth, alpha, beta, maximizing):
+        if self.control is not None:
+            self.control.check()
+        self.stats.node(depth, 'MAX' if maximizing else 'MIN')
+
+        # stored result from an earlier search (the root always searches)
+        tt_key = None
+        tt_move = None
+        if self.tt is not None:
+            tt_key = self.tt.key(board, maximizing)
+            entry = self.tt.probe(tt_key, depth)
+            if entry is not None:
+                tt_move = entry[BEST_MOVE]
+                v = self.tt.cutoff(entry, depth, alpha, beta)
+                if v is not None and depth < self.max_depth:
+                    self.stats.tt_hits += 1
+                    return tt_move, v
+        alpha_start, beta_start = alpha, beta
+
         terminal, winner = self.is_terminal(board)
 
         # terminal outcome
         if terminal:
+            self.stats.terminal_hits += 1
             if winner == 1:
-                return None, 10**9   # huge positive
+                v = 10**9    # huge positive
             elif winner == 2:
-                return None, -10**9  # huge negative
+                v = -10**9   # huge negative
             else:
-                return None, 0       # draw
+                v = 0        # draw
+            if tt_key is not None:
+                self.tt.store(tt_key, TERMINAL_DEPTH, v, EXACT)
+            return None, v
 
         if depth == 0:
             # evaluate using game’s heuristic
@@ -88,15 +118,22 @@ class Connect4AI:
             self.game.board = board
             v = self.game.advanced_dynamic_heuristic()
             self.game.board = old_board
+            self.stats.leaf_evals += 1
+            if tt_key is not None:
+                self.tt.store(tt_key, 0, v, EXACT)
             return None, v
 
         valid_moves = self.get_valid_moves(board)
+        # try the stored best move first
+        if tt_move in valid_moves:
+            valid_moves.remove(tt_move)
+            valid_moves.insert(0, tt_move)
 
         if maximizing:
             best_val = -math.inf
             best_move = None
 
-            for move in valid_moves:
+            for i, move in enumerate(valid_moves):
                 new_b = self.simulate_move(board, move, 1)
                 _, eval = self.minimax(new_b, depth - 1, alpha, beta, False)
 
@@ -106,15 +143,14 @@ class Connect4AI:
 
                 alpha = max(alpha, best_val)
                 if beta <= alpha:
+                    self.stats.cutoff(i, len(valid_moves) - i - 1)
                     break
 
-            return best_move, best_val
-
         else:
             best_val = math.inf
             best_move = None
 
-            for move in valid_moves:
+            for i, move in enumerate(valid_moves):
                 new_b = self.simulate_move(board, move, 2)
                 _, eval = self.minimax(new_b, depth - 1, alpha, beta, True)
 
@@ -124,15 +160,21 @@ class Connect4AI:
 
                 beta = min(beta, best_val)
                 if beta <= alpha:
+                    self.stats.cutoff(i, len(valid_moves) - i - 1)
                     break
 
-            return best_move, best_val
+        if tt_key is not None:
+            self.tt.store(tt_key, depth, best_val, bound_type(best_val, alpha_start, beta_start), best_move)
+        return best_move, best_val
 
     # ------------------------------
     # Public method to get best move
     # ------------------------------
     def best_move(self):
-        move, _ = self.minimax(
+        self.stats.reset()
+        if self.tt is not None:
+            self.tt.new_search(self.game.board)
+        move, self.best_value = self.minimax(
             board=self.game.board,
             depth=self.max_depth,
             alpha=-math.inf,
@@ -149,24 +191,39 @@ class Connect4AI:
 
         return move
 
+    async def best_move_async(self, deadline=None, executor=None, **kwargs):
+        """Search off the event loop; returns the best move so far at the deadline or on cancel"""
+        return await best_move_async(self, deadline, executor, **kwargs)
+
 
 if __name__ == "__main__":
 
+    from ponder import Ponderer
+
     x = Connect4()
     ai = Connect4AI(x, max_depth=6)
 
+    # Search the replies to the AI's move while Player 1 thinks
+    ponderer = Ponderer(lambda game: Connect4AI(game, max_depth=6), 6)
+
     while True:
         print(x)
 
         if x.turn == 1:
+            ponderer.start(x)
             col = int(input("Player 1 column: "))
         else:
 
             print("AI thinking...")
             st_time = time.time()
-            col = ai.best_move()
+            pondered = ponderer.take(x)
+            if pondered is not None:
+                col = pondered['best_move']
+            else:
+                col = ai.best_move()
 
-            print("AI thinking took {} seconds".format(time.time() - st_time))
+            print("AI thinking took {} seconds{}".format(time.time() - st_time,
+                                                       " (pondered)" if pondered is not None else ""))
 
 
         x.play(col)
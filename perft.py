@@ -0,0 +1,132 @@
+import argparse
+import time
+
+from Connect4 import Connect4
+from benchmark import make_game
+from minimax_pruning import Connect4AI
+
+# Known-good leaf counts: position (moves from the empty board) -> {depth: leaves}.
+# Produced with the list board of minimax_pruning.Connect4AI. Every move is
+# generated until a column is full; four in a row does not end the count.
+PERFT_TABLE = {
+    '': {1: 7, 2: 49, 3: 343, 4: 2401, 5: 16807, 6: 117649, 7: 823536},
+    '332': {1: 7, 2: 49, 3: 343, 4: 2401, 5: 16806, 6: 117611},
+    '1441243550406324': {1: 7, 2: 48, 3: 324, 4: 2160, 5: 14251, 6: 93126},
+    '425265655046150102415606101421': {1: 5, 2: 23, 3: 97, 4: 371, 5: 1271, 6: 3865},
+    '6460362001543652260231540163404425': {1: 4, 2: 15, 3: 52, 4: 162, 5: 440, 6: 990},
+}
+
+
+# ------------------------------
+# Backends
+# ------------------------------
+class EngineBackend:
+    def __init__(self, engine):
+        """
+        Move generation of an existing engine on the list board.
+
+        Any other backend only needs the same three methods:
+            from_game(game) -> board in the backend's representation
+            get_valid_moves(board) -> list of columns
+            simulate_move(board, col, player) -> board after the move
+        """
+        self.engine = engine
+        # The expectiminimax engines call it simulate()
+        self.simulate = getattr(engine, 'simulate_move', None) or engine.simulate
+
+    def from_game(self, game):
+        return game.board
+
+    def get_valid_moves(self, board):
+        return self.engine.get_valid_moves(board)
+
+    def simulate_move(self, board, col, player):
+        return self.simulate(board, col, player)
+
+
+def list_board_backend():
+    return EngineBackend(Connect4AI(Connect4()))
+
+
+# ------------------------------
+# Counting
+# ------------------------------
+def perft(backend, board, depth, player):
+    """Number of leaf positions depth plies below board"""
+    if depth == 0:
+        return 1
+
+    moves = backend.get_valid_moves(board)
+    if depth == 1:
+        return len(moves)
+
+    other = 3 - player
+    return sum(perft(backend, backend.simulate_move(board, col, player), depth - 1, other)
+               for col in moves)
+
+
+def divide(backend, game, depth):
+    """Leaf counts split per root move: {column: leaves}"""
+    board = backend.from_game(game)
+    counts = {}
+    for col in backend.get_valid_moves(board):
+        child = backend.simulate_move(board, col, game.turn)
+        counts[col] = perft(backend, child, depth - 1, 3 - game.turn)
+    return counts
+
+
+def verify(backend=None, max_depth=5, table=PERFT_TABLE):
+    """
+    Check a backend against the known-good table up to max_depth.
+    Returns a list of (moves, depth, expected, got) mismatches.
+    """
+    backend = backend or list_board_backend()
+    mismatches = []
+
+    for moves, counts in table.items():
+        game = make_game(moves)
+        board = backend.from_game(game)
+        for depth, expected in sorted(counts.items()):
+            if max_depth is not None and depth > max_depth:
+                continue
+            got = perft(backend, board, depth, game.turn)
+            status = "✓" if got == expected else "✗"
+            print(f"  {status} '{moves}' depth {depth}: {got} (expected {expected})")
+            if got != expected:
+                mismatches.append((moves, depth, expected, got))
+
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Perft leaf counts for Connect 4 move generation")
+    parser.add_argument('moves', nargs='?', default='', help="columns played from the empty board, e.g. 332")
+    parser.add_argument('depth', nargs='?', type=int, default=4)
+    parser.add_argument('--verify', action='store_true', help="check against the known-good table")
+    parser.add_argument('--max-depth', type=int, default=5, help="deepest table entry checked by --verify")
+    args = parser.parse_args(argv)
+
+    backend = list_board_backend()
+
+    if args.verify:
+        mismatches = verify(backend, args.max_depth)
+        print("All counts match" if not mismatches else f"{len(mismatches)} mismatches")
+        return 1 if mismatches else 0
+
+    start_time = time.time()
+    counts = divide(backend, make_game(args.moves), args.depth)
+    elapsed = time.time() - start_time
+
+    for col, leaves in counts.items():
+        print(f"  Col {col}: {leaves}")
+    total = sum(counts.values())
+    print(f"Total: {total} leaves at depth {args.depth} ({elapsed:.3f} seconds)")
+
+    expected = PERFT_TABLE.get(args.moves, {}).get(args.depth)
+    if expected is not None:
+        print("✓ Matches table" if total == expected else f"✗ Table says {expected}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,264 @@
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    key BLOB PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    value REAL NOT NULL,
+    bound TEXT NOT NULL,
+    best_move INTEGER,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS positions_last_used ON positions (last_used);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def engine_cache_path(path, engine_name):
+    """File holding one engine's positions: <path>.<engine_name>"""
+    return f"{path}.{engine_name}"
+
+
+class PersistentCache:
+    def __init__(self, path, max_entries=1000000, read_only=False, batch_size=500, namespace=None):
+        """
+        On-disk store of searched positions that survives restarts.
+
+        path: sqlite3 database file, created if missing (unless read_only)
+        max_entries: rows kept; the least recently used rows are deleted
+                     once a flush goes over the cap
+        read_only: only look positions up; put() is ignored. Any number
+                   of processes can open the same file read-only, also
+                   while one process writes to it
+        batch_size: writes are buffered and committed this many at a time
+        namespace: engine (and heuristic) the values belong to. It is
+                   written into a new file, and opening a file written for
+                   another namespace raises ValueError
+
+        Rows are (key, depth, value, bound, best_move) as in
+        TranspositionTable; the key is only the board, so a file must hold
+        one engine and heuristic, since the values depend on both (an
+        expected value is no minimax bound). PersistentCacheSet keeps one
+        file per engine. Positions are read one at a time when they are
+        looked up, nothing is loaded up front.
+        """
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.read_only = read_only
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.touched = set()
+        self.reads = 0
+        self.hits = 0
+        self.writes = 0
+        self.evictions = 0
+
+        if read_only:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No cache file '{path}'")
+            self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")  # readers never block the writer
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.executescript(SCHEMA)
+            self.db.commit()
+
+        self.count = self.db.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        if namespace is not None:
+            self.check_namespace(namespace)
+
+    def check_namespace(self, namespace):
+        try:
+            row = self.db.execute("SELECT value FROM meta WHERE name = 'namespace'").fetchone()
+        except sqlite3.OperationalError:
+            row = None  # written before namespaces, no meta table
+
+        if row is None and self.count == 0 and not self.read_only:
+            with self.db:
+                self.db.execute("INSERT INTO meta VALUES ('namespace', ?)", (namespace,))
+        elif row is None:
+            self.db.close()
+            raise ValueError(f"'{self.path}' has positions of an unknown engine, not '{namespace}'")
+        elif row[0] != namespace:
+            self.db.close()
+            raise ValueError(f"'{self.path}' holds positions of '{row[0]}', not '{namespace}'")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # ------------------------------
+    # Lookups and writes
+    # ------------------------------
+    def get(self, key):
+        """(depth, value, bound, best_move) stored for key, or None"""
+        with self.lock:
+            self.reads += 1
+            row = self.pending.get(key)
+            if row is None:
+                row = self.db.execute("SELECT depth, value, bound, best_move FROM positions WHERE key = ?",
+                                      (key,)).fetchone()
+                if row is not None and not self.read_only:
+                    self.touched.add(key)
+            if row is not None:
+                self.hits += 1
+            return tuple(row[:4]) if row is not None else None
+
+    def put(self, key, depth, value, bound, best_move=None):
+        """Buffer a position; a stored deeper result is never replaced by a shallower one"""
+        if self.read_only:
+            return
+        with self.lock:
+            old = self.pending.get(key)
+            if old is not None and old[0] > depth:
+                return
+            self.pending[key] = (depth, value, bound, best_move)
+            if len(self.pending) >= self.batch_size:
+                self.flush_locked()
+
+    def flush(self):
+        """Write buffered positions and recency updates in one transaction"""
+        if self.read_only:
+            return
+        with self.lock:
+            self.flush_locked()
+
+    def flush_locked(self):
+        if not self.pending and not self.touched:
+            return
+
+        now = time.time()
+        rows = [(key, depth, value, bound, best_move, now)
+                for key, (depth, value, bound, best_move) in self.pending.items()]
+
+        with self.db:
+            inserted = self.db.executemany(
+                "INSERT OR IGNORE INTO positions VALUES (?, ?, ?, ?, ?, ?)", rows).rowcount
+            self.db.executemany(
+                "UPDATE positions SET depth = ?, value = ?, bound = ?, best_move = ?, last_used = ? "
+                "WHERE key = ? AND depth <= ?",
+                [(depth, value, bound, best_move, now, key, depth)
+                 for key, depth, value, bound, best_move, now in rows])
+            self.db.executemany("UPDATE positions SET last_used = ? WHERE key = ?",
+                                [(now, key) for key in self.touched - self.pending.keys()])
+
+            self.count += max(inserted, 0)
+            if self.count > self.max_entries:
+                self.evict_locked()
+
+        self.writes += len(rows)
+        self.pending.clear()
+        self.touched.clear()
+
+    def evict_locked(self):
+        """Delete the least recently used rows down to 90% of max_entries"""
+        excess = self.count - self.max_entries * 9 // 10
+        self.db.execute("DELETE FROM positions WHERE key IN "
+                        "(SELECT key FROM positions ORDER BY last_used LIMIT ?)", (excess,))
+        self.count = self.db.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+        self.evictions += excess
+
+    def close(self):
+        if self.db is None:
+            return
+        self.flush()
+        self.db.close()
+        self.db = None
+
+    def summary(self):
+        return {
+            'path': self.path,
+            'namespace': self.namespace,
+            'entries': self.count,  # committed rows
+            'pending': len(self.pending),
+            'max_entries': self.max_entries,
+            'read_only': self.read_only,
+            'reads': self.reads,
+            'hits': self.hits,
+            'writes': self.writes,
+            'evictions': self.evictions
+        }
+
+    def __len__(self):
+        return self.count
+
+
+class PersistentCacheSet:
+    def __init__(self, path, read_only=False, **options):
+        """
+        One PersistentCache per engine, opened on first use.
+
+        path: base name; engine_name's positions go to <path>.<engine_name>
+        read_only, options: passed on to every PersistentCache
+
+        Safe to share between threads.
+        """
+        self.path = path
+        self.read_only = read_only
+        self.options = options
+        self.caches = {}
+        self.lock = threading.Lock()
+
+    def get(self, engine_name):
+        """The cache of engine_name, opened with engine_name as its namespace"""
+        with self.lock:
+            if engine_name not in self.caches:
+                self.caches[engine_name] = PersistentCache(engine_cache_path(self.path, engine_name),
+                                                           read_only=self.read_only, namespace=engine_name,
+                                                           **self.options)
+            return self.caches[engine_name]
+
+    def close(self):
+        with self.lock:
+            for cache in self.caches.values():
+                cache.close()
+            self.caches.clear()
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+
+    from Connect4 import Connect4
+    from minimax_pruning import Connect4AI
+    from Connect4AI_Expectiminimax import Connect4AI_Expectiminimax
+    from transposition import TranspositionTable
+
+    filename = 'connect4_cache.sqlite'
+
+    x = Connect4()
+    x.play(3)
+    x.play(3)
+
+    for run in ("cold", "warm"):
+        caches = PersistentCacheSet(filename)
+        try:
+            for ai in (Connect4AI(x, max_depth=6), Connect4AI_Expectiminimax(x, max_depth=3)):
+                name = type(ai).__name__
+                ai.tt = TranspositionTable(persistent=caches.get(name))
+                start_time = time.time()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    col = ai.best_move()
+                print(f"{run} {name}: Column {col} in {time.time() - start_time:.3f} seconds "
+                      f"({ai.stats.summary()['total']} nodes, {len(caches.get(name))} positions on disk)")
+        finally:
+            caches.close()
+
+    # Minimax must never be served expected values
+    try:
+        PersistentCache(engine_cache_path(filename, 'Connect4AI_Expectiminimax'), namespace='Connect4AI')
+        print("✗ Minimax could open the expectiminimax positions")
+    except ValueError as e:
+        print(f"✓ {e}")
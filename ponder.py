@@ -0,0 +1,207 @@
+import threading
+
+from analysis_cache import AnalysisCache
+from Connect4 import Connect4
+from search_worker import SearchWorker
+
+# Reply order when no reply is expected: centre columns first
+CENTRE_ORDER = (3, 2, 4, 1, 5, 0, 6)
+
+
+def copy_game(game):
+    new_game = Connect4()
+    new_game.board = [col[:] for col in game.board]
+    new_game.turn = game.turn
+    new_game.score_1 = game.score_1
+    new_game.score_2 = game.score_2
+    return new_game
+
+
+def expected_reply(tree_data, move):
+    """The reply the engine expects to the move it just chose, from its tree"""
+    if not tree_data or not tree_data.get('root'):
+        return None
+    for child in tree_data['root'].get('children', []):
+        if child.get('move') == move and not child.get('pruned'):
+            return child.get('best_move')
+    return None
+
+
+class Ponderer:
+    def __init__(self, make_engine, max_depth, algorithm=None, cache=None, cache_lock=None, capture=None):
+        """
+        Searches the opponent's possible replies while the opponent thinks.
+
+        make_engine: function(game) -> engine searching that game
+        max_depth: depth of every pondered search
+        algorithm: name used in the cache keys (defaults to the engine class name)
+        cache: AnalysisCache the finished searches are put into
+        cache_lock: lock guarding a cache that other threads also use
+        capture: optional CapturePolicy for every pondered search
+
+        Replies are searched one after another on a background thread,
+        the expected reply first. Results use the SearchWorker 'done'
+        format plus 'stats' and 'pondered', under the key
+        AnalysisCache.make_key(board, turn, algorithm, max_depth) of the
+        position after the reply, so a later search of that position
+        can take the answer straight from the cache.
+        """
+        self.make_engine = make_engine
+        self.max_depth = max_depth
+        self.algorithm = algorithm
+        self.cache = cache if cache is not None else AnalysisCache()
+        self.cache_lock = cache_lock or threading.Lock()
+        self.capture = capture
+
+        self.lock = threading.Lock()
+        self.thread = None
+        self.worker = None
+        self.current_key = None
+        self.focus_key = None
+        self.cancelled = threading.Event()
+
+    def key(self, game):
+        algorithm = self.algorithm or type(self.make_engine(copy_game(game))).__name__
+        return AnalysisCache.make_key(game.board, game.turn, algorithm, self.max_depth)
+
+    def replies(self, game, expected=None):
+        """Reply columns in search order: the expected reply, then centre first"""
+        valid = [col for col in CENTRE_ORDER if game.board[col][game.length - 1] == 0]
+        if expected in valid:
+            valid.remove(expected)
+            valid.insert(0, expected)
+        return valid
+
+    # ------------------------------
+    # Starting and stopping
+    # ------------------------------
+    def start(self, game, expected=None):
+        """Start pondering the replies to the position in game (copied)"""
+        self.stop()
+        if self.algorithm is None:
+            self.algorithm = type(self.make_engine(copy_game(game))).__name__
+
+        positions = []
+        for col in self.replies(game, expected):
+            reply = copy_game(game)
+            reply.play(col)
+            positions.append(reply)
+
+        self.cancelled = threading.Event()
+        self.focus_key = None
+        self.thread = threading.Thread(target=self.run, args=(positions, self.cancelled), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Abandon pondering; the search in progress is thrown away"""
+        thread = self.thread
+        if thread is None:
+            return
+
+        with self.lock:
+            self.cancelled.set()
+            if self.worker is not None:
+                self.worker.stop()
+        thread.join()
+        self.thread = None
+
+    def is_pondering(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def searching(self, key):
+        """True while the search of key is still running"""
+        with self.lock:
+            return self.is_pondering() and self.current_key == key
+
+    def focus(self, key):
+        """
+        The opponent has replied and key is the position to answer.
+        A search of key that is already running is allowed to finish, then
+        pondering ends; any other search is stopped at once.
+        Returns True if the search of key is still running.
+        """
+        with self.lock:
+            self.focus_key = key
+            running = self.is_pondering() and self.current_key == key
+            if not running:
+                self.cancelled.set()
+                if self.worker is not None:
+                    self.worker.stop()
+        if not running:
+            self.stop()
+        return running
+
+    def take(self, game):
+        """
+        Answer for the position in game: waits for its search if it is the
+        one being pondered, stops pondering and returns the cached result,
+        or None if the position was not pondered.
+        """
+        key = self.key(game)
+        if self.focus(key):
+            self.thread.join()
+            self.thread = None
+        with self.cache_lock:
+            return self.cache.get(key)
+
+    # ------------------------------
+    # Background thread
+    # ------------------------------
+    def run(self, positions, cancelled):
+        for game in positions:
+            key = AnalysisCache.make_key(game.board, game.turn, self.algorithm, self.max_depth)
+            with self.cache_lock:
+                if key in self.cache:
+                    continue
+
+            engine = self.make_engine(game)
+            worker = SearchWorker(engine, self.max_depth, purpose='ponder', capture=self.capture)
+            with self.lock:
+                if cancelled.is_set() or (self.focus_key is not None and self.focus_key != key):
+                    return
+                self.worker = worker
+                self.current_key = key
+
+            worker.run()  # on this thread
+
+            with self.lock:
+                self.worker = None
+                self.current_key = None
+
+            kind, data = worker.messages.get()
+            while kind == 'progress':
+                kind, data = worker.messages.get()
+            if kind != 'done' or data['stopped']:
+                return
+
+            data['pondered'] = True
+            if data['tree_data'] is not None and hasattr(engine, 'get_tree_stats'):
+                data['stats'] = engine.get_tree_stats()
+            with self.cache_lock:
+                self.cache.put(key, data)
+
+            if self.focus_key is not None:
+                return  # the focused search is done
+
+
+if __name__ == "__main__":
+    import time
+
+    from minimax_pruning import Connect4AI
+
+    x = Connect4()
+    x.play(3)
+
+    ponderer = Ponderer(lambda game: Connect4AI(game, max_depth=5), 5)
+    ponderer.start(x)
+
+    time.sleep(1)  # the opponent thinks, then plays the first reply pondered
+    x.play(3)
+
+    start_time = time.time()
+    result = ponderer.take(x)
+    if result is not None:
+        print(f"✓ Pondered answer: Column {result['best_move']} in {time.time() - start_time:.3f} seconds")
+    else:
+        print("✗ Reply was not pondered")
+    print(f"Positions cached: {len(ponderer.cache)}")
@@ -0,0 +1,156 @@
+import time
+
+from Connect4 import Connect4
+
+# Functions timed by default. The expectiminimax engines call their
+# move function simulate() instead of simulate_move().
+HOT_PATHS = (
+    'is_terminal',
+    'simulate_move',
+    'simulate',
+    'get_valid_moves',
+    'advanced_dynamic_heuristic',
+    'calculate_score',
+    'board_to_string',
+)
+
+
+class Profiler:
+    def __init__(self, engine=None, functions=HOT_PATHS):
+        """
+        Counts and times calls to the engine's hot functions.
+
+        engine: engine whose methods are timed; functions the engine does
+                not have are looked up on the Connect4 class instead
+        functions: names of the functions to time
+
+        Use as a context manager around one or more searches:
+
+            with Profiler(ai) as prof:
+                ai.best_move()
+            prof.print_table()
+
+        Nothing is patched outside the with block, so there is no overhead
+        when profiling is off. Connect4 methods are patched on the class,
+        because the engines evaluate deep copies of the game; while a
+        profiler is active it also counts calls made by other engines.
+        """
+        self.engine = engine
+        self.functions = functions
+        self.counters = {}
+        self.patched = []
+        self.wall_time = 0.0
+        self.start_time = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def start(self):
+        if self.patched:
+            return  # already running
+
+        for name in self.functions:
+            if self.engine is not None and hasattr(self.engine, name):
+                self.wrap(self.engine, name)
+            elif hasattr(Connect4, name):
+                self.wrap(Connect4, name)
+
+        self.start_time = time.perf_counter()
+
+    def stop(self):
+        if self.start_time is not None:
+            self.wall_time += time.perf_counter() - self.start_time
+            self.start_time = None
+
+        # Undo in reverse order in case a name was patched twice
+        for target, name, original, own in reversed(self.patched):
+            if own:
+                setattr(target, name, original)
+            else:
+                delattr(target, name)  # fall back to the class attribute
+        self.patched = []
+
+    def wrap(self, target, name):
+        own = name in vars(target)
+        original = vars(target)[name] if own else getattr(target, name)
+        call = getattr(target, name)
+        counter = self.counters.setdefault(name, [0, 0.0])
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                counter[0] += 1
+                counter[1] += perf_counter() - start
+
+        setattr(target, name, timed)
+        self.patched.append((target, name, original, own))
+
+    def reset(self):
+        self.counters = {name: [0, 0.0] for name in self.counters}
+        self.wall_time = 0.0
+
+    def results(self):
+        """
+        {'wall_time': seconds inside the profiler,
+         'functions': {name: {'calls', 'total_time', 'mean_time', 'share'}}}
+
+        Times are inclusive and share is the fraction of wall_time spent in
+        the function. Functions that were never called are left out.
+        """
+        wall_time = self.wall_time
+        if self.start_time is not None:
+            wall_time += time.perf_counter() - self.start_time
+
+        functions = {}
+        for name, (calls, total) in sorted(self.counters.items(), key=lambda item: -item[1][1]):
+            if calls == 0:
+                continue
+            functions[name] = {
+                'calls': calls,
+                'total_time': total,
+                'mean_time': total / calls,
+                'share': total / wall_time if wall_time > 0 else 0.0
+            }
+
+        return {'wall_time': wall_time, 'functions': functions}
+
+    def print_table(self):
+        results = self.results()
+
+        print("\n" + "=" * 78)
+        print(f"{'Function':<30} {'Calls':>10} {'Total (s)':>11} {'Mean (us)':>11} {'Share':>10}")
+        print("=" * 78)
+        for name, r in results['functions'].items():
+            print(f"{name:<30} {r['calls']:>10} {r['total_time']:>11.4f} "
+                  f"{r['mean_time'] * 1e6:>11.1f} {r['share']:>10.1%}")
+        print("=" * 78)
+        print(f"Wall time: {results['wall_time']:.3f} seconds")
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+
+    from Connect4AI import Connect4AI_TreeSaver
+
+    x = Connect4()
+    x.play(3)
+    x.play(3)
+    x.play(2)
+
+    ai = Connect4AI_TreeSaver(x, max_depth=4)
+
+    with Profiler(ai) as prof:
+        with contextlib.redirect_stdout(io.StringIO()):
+            col = ai.best_move()
+
+    print(f"Best move: Column {col}")
+    prof.print_table()
@@ -0,0 +1,184 @@
+import asyncio
+import contextlib
+import functools
+import threading
+import time
+
+
+class SearchCancelled(Exception):
+    """Raised inside a search once its SearchControl has been stopped"""
+
+
+class SearchControl:
+    def __init__(self, deadline=None):
+        """
+        Shared stop flag for a running search.
+
+        deadline: optional time.time() value after which the search stops
+        """
+        self.stop_event = threading.Event()
+        self.deadline = deadline
+        self.nodes = 0
+        self.capture = None  # CapturePolicy whose memory ceiling is checked per node
+
+    def stop(self):
+        """Ask the search to stop at the next node"""
+        self.stop_event.set()
+
+    def is_stopped(self):
+        if self.stop_event.is_set():
+            return True
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.stop_event.set()
+            return True
+        return False
+
+    def check(self):
+        """Called by the engines once per node; raises SearchCancelled when stopped"""
+        self.nodes += 1
+        if self.capture is not None:
+            self.capture.check_memory()
+        if self.is_stopped():
+            raise SearchCancelled()
+
+
+class CountingControl(SearchControl):
+    def __init__(self, control):
+        """
+        Counts nodes into control but never stops the search; the first
+        depth of iterative deepening runs with it so it always finishes
+        and its nodes still show up in control.nodes.
+        """
+        self.control = control
+        self.deadline = None
+        self.capture = None
+
+    @property
+    def nodes(self):
+        return self.control.nodes
+
+    @nodes.setter
+    def nodes(self, value):
+        self.control.nodes = value
+
+    def stop(self):
+        pass
+
+    def is_stopped(self):
+        return False
+
+
+@contextlib.contextmanager
+def memory_checked(engine):
+    """
+    Check the memory ceiling of engine.capture from engine.control.check()
+    while the block runs. Engines searching without a control get one
+    for the duration; it never stops the search.
+    """
+    capture = engine.capture
+    if capture.max_memory is None:
+        yield
+        return
+
+    control = engine.control
+    if control is None:
+        engine.control = SearchControl()
+    engine.control.capture = capture
+    try:
+        yield
+    finally:
+        engine.control.capture = None
+        engine.control = control
+
+
+def iterative_deepening(engine, max_depth, control=None, on_depth=None, **kwargs):
+    """
+    Run engine.best_move() at depth 1, 2, ... max_depth.
+
+    Returns (best_move, tree_data, depth_completed) for the deepest depth
+    that finished. Depth 1 always runs to completion so there is always a
+    move to return; after that the search stops as soon as control is
+    stopped and the previous depth's result is kept.
+
+    on_depth(depth, move, tree_data) is called after each finished depth.
+    Extra keyword arguments are passed on to best_move(). Each depth is
+    traced as a span when the engine has a tracer (see tracing.py).
+
+    When the capture policy measures memory, the peak of every finished
+    depth is added to the final metadata as 'peak_memory_by_depth'.
+    """
+    saved_depth = engine.max_depth
+    best = None
+    tree_data = None
+    completed = 0
+    tracer = getattr(engine, 'tracer', None)
+    peak_memory_by_depth = {}
+
+    try:
+        for depth in range(1, max_depth + 1):
+            engine.max_depth = depth
+            # Never cancel the first depth, but count its nodes
+            engine.control = control if depth > 1 or control is None else CountingControl(control)
+
+            span = tracer.span(f"depth {depth}", cat='iterative_deepening', depth=depth) \
+                if tracer is not None else contextlib.nullcontext({})
+            try:
+                with span as span_args:
+                    move = engine.best_move(**kwargs)
+                    span_args['best_move'] = move
+            except SearchCancelled:
+                break
+
+            best = move
+            tree_data = getattr(engine, 'tree_data', None)
+            completed = depth
+
+            peak_memory = tree_data['metadata'].get('peak_memory') if tree_data else None
+            if peak_memory is not None:
+                peak_memory_by_depth[depth] = peak_memory
+                tree_data['metadata']['peak_memory_by_depth'] = dict(peak_memory_by_depth)
+
+            if on_depth is not None:
+                on_depth(depth, move, tree_data)
+
+            if control is not None and control.is_stopped():
+                break
+    finally:
+        engine.max_depth = saved_depth
+        engine.control = None
+
+    return best, tree_data, completed
+
+
+async def best_move_async(engine, deadline=None, executor=None, **kwargs):
+    """
+    Search off the event loop and return the best move.
+
+    Runs iterative_deepening() up to engine.max_depth on a thread of
+    executor (the loop's default thread pool when None), so the loop
+    keeps serving other tasks.
+
+    deadline: optional time.time() value; the search stops there
+    executor: concurrent.futures executor running the search; it must be
+              a thread pool, the stop flag is shared memory
+
+    Never raises because of time: at the deadline, or when the awaiting
+    task is cancelled, the search is stopped and the best move of the
+    deepest finished depth is returned. Depth 1 always finishes. Extra
+    keyword arguments go to best_move(), e.g. capture=CapturePolicy(...).
+    One engine object must not run two searches at once.
+    """
+    control = SearchControl(deadline=deadline)
+    search = functools.partial(iterative_deepening, engine, engine.max_depth, control, **kwargs)
+    future = asyncio.get_running_loop().run_in_executor(executor, search)
+
+    try:
+        # Shielded, so a cancellation stops the search instead of dropping its result
+        move, _, _ = await asyncio.shield(future)
+    except asyncio.CancelledError:
+        control.stop()
+        move, _, _ = await future
+        task = asyncio.current_task()
+        if task is not None and hasattr(task, 'uncancel'):
+            task.uncancel()  # the cancellation has been handled
+    return move
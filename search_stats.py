@@ -0,0 +1,73 @@
+class SearchStats:
+    def __init__(self, pruning=False, chance=False):
+        """
+        Counters kept by an engine while it searches.
+
+        pruning: the engine does alpha-beta cutoffs (adds 'pruned' and the
+                 cutoff counters to the summary)
+        chance: the engine has CHANCE nodes (adds 'chance_nodes')
+
+        Nodes are counted whether or not the CapturePolicy records them.
+        """
+        self.pruning = pruning
+        self.chance = chance
+        self.reset()
+
+    def reset(self):
+        """Clear the counters before a new search"""
+        self.nodes_by_depth = {}
+        self.max_nodes = 0
+        self.min_nodes = 0
+        self.chance_nodes = 0
+        self.terminal_hits = 0
+        self.leaf_evals = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.pruned = 0
+        self.tt_hits = 0
+
+    def node(self, depth, node_type):
+        """Count a MAX, MIN or CHANCE node at this remaining depth"""
+        self.nodes_by_depth[depth] = self.nodes_by_depth.get(depth, 0) + 1
+        if node_type == 'MAX':
+            self.max_nodes += 1
+        elif node_type == 'MIN':
+            self.min_nodes += 1
+        else:
+            self.chance_nodes += 1
+
+    def cutoff(self, index, skipped):
+        """A beta/alpha cutoff after the child at index, skipping the rest"""
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        self.pruned += skipped
+
+    def summary(self):
+        """
+        Counters for the tree metadata. 'total' and 'terminal' mean the
+        same as in get_tree_stats(): 'terminal' counts every node that
+        ended the search, depth-limit leaves included.
+        """
+        stats = {
+            'total': self.max_nodes + self.min_nodes + self.chance_nodes,
+            'max_nodes': self.max_nodes,
+            'min_nodes': self.min_nodes,
+            'terminal': self.terminal_hits + self.leaf_evals,
+            'terminal_hits': self.terminal_hits,
+            'leaf_evals': self.leaf_evals,
+            'tt_hits': self.tt_hits,
+            'nodes_by_depth': dict(sorted(self.nodes_by_depth.items(), reverse=True))
+        }
+
+        if self.chance:
+            stats['chance_nodes'] = self.chance_nodes
+
+        if self.pruning:
+            stats['pruned'] = self.pruned
+            stats['cutoffs'] = self.cutoffs
+            stats['first_move_cutoffs'] = self.first_move_cutoffs
+            stats['first_move_cutoff_rate'] = (self.first_move_cutoffs / self.cutoffs
+                                               if self.cutoffs else None)
+
+        return stats
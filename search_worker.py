@@ -0,0 +1,70 @@
+import queue
+import threading
+import time
+import traceback
+
+from search_control import SearchControl, iterative_deepening
+
+
+class SearchWorker(threading.Thread):
+    def __init__(self, engine, max_depth, purpose=None, capture=None):
+        """
+        Runs an iterative deepening search off the GUI thread.
+
+        engine: any engine with best_move() and a 'control' attribute
+        max_depth: deepest iteration to run
+        purpose: free-form tag handed back with the result
+        capture: optional CapturePolicy used for every depth
+
+        Messages are put on self.messages as (kind, data) tuples:
+            ('progress', {...})  after every finished depth
+            ('done', {...})      once the search has finished or been stopped
+            ('error', str)       if the search raised
+        """
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.max_depth = max_depth
+        self.purpose = purpose
+        self.capture = capture
+        self.control = SearchControl()
+        self.messages = queue.Queue()
+        self.start_time = None
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return time.time() - self.start_time
+
+    def run(self):
+        self.start_time = time.time()
+
+        def on_depth(depth, move, tree_data):
+            self.messages.put(('progress', {
+                'depth': depth,
+                'max_depth': self.max_depth,
+                'best_move': move,
+                'nodes': self.control.nodes,
+                'elapsed': self.elapsed()
+            }))
+
+        kwargs = {'capture': self.capture} if self.capture is not None else {}
+
+        try:
+            move, tree_data, depth = iterative_deepening(
+                self.engine, self.max_depth, self.control, on_depth, **kwargs)
+
+            self.messages.put(('done', {
+                'best_move': move,
+                'tree_data': tree_data,
+                'depth': depth,
+                'max_depth': self.max_depth,
+                'nodes': self.control.nodes,
+                'elapsed': self.elapsed(),
+                'stopped': self.control.is_stopped()
+            }))
+        except Exception:
+            self.messages.put(('error', traceback.format_exc()))
+
+    def stop(self):
+        """Stop the search; the best move of the last finished depth is kept"""
+        self.control.stop()
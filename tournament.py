@@ -0,0 +1,334 @@
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from Connect4 import Connect4
+from engines import ENGINES, create_engine
+from search_control import SearchControl, iterative_deepening
+from tree_capture import CapturePolicy
+
+
+# ------------------------------
+# Heuristic variants
+# ------------------------------
+def score_difference(game):
+    """Baseline heuristic: connected fours so far, nothing else"""
+    saved = game.score_1, game.score_2
+    game.calculate_score()
+    value = (game.score_1 - game.score_2) * 1000
+    game.score_1, game.score_2 = saved
+    return value
+
+
+# Name -> function(game) used in place of advanced_dynamic_heuristic
+HEURISTICS = {
+    'advanced': Connect4.advanced_dynamic_heuristic,
+    'score': score_difference,
+}
+
+
+def make_game(heuristic='advanced'):
+    """A Connect4 game whose engines evaluate leaves with the given heuristic"""
+    if heuristic == 'advanced':
+        return Connect4()
+    game_class = type(f"Connect4_{heuristic}", (Connect4,),
+                      {'advanced_dynamic_heuristic': HEURISTICS[heuristic]})
+    return game_class()
+
+
+# ------------------------------
+# Player configurations
+# ------------------------------
+def parse_player(spec):
+    """
+    ENGINE:DEPTH[:TIME_LIMIT[:HEURISTIC]], e.g. Connect4AI:5:0.5:score
+    A time limit of 0 means no limit.
+    """
+    parts = spec.split(':')
+    if parts[0] not in ENGINES:
+        raise ValueError(f"Unknown engine '{parts[0]}'")
+
+    parts += [''] * (4 - len(parts))
+    config = {
+        'engine': parts[0],
+        'depth': int(parts[1] or 4),
+        'time_limit': float(parts[2]) if parts[2] and float(parts[2]) > 0 else None,
+        'heuristic': parts[3] or 'advanced'
+    }
+    if config['heuristic'] not in HEURISTICS:
+        raise ValueError(f"Unknown heuristic '{config['heuristic']}'")
+
+    config['name'] = spec
+    return config
+
+
+def choose_move(config, game):
+    """Search a copy of the game with one player's settings"""
+    board_game = make_game(config['heuristic'])
+    board_game.board = [col[:] for col in game.board]
+    board_game.turn = game.turn
+    board_game.score_1 = game.score_1
+    board_game.score_2 = game.score_2
+
+    engine = create_engine(config['engine'], board_game, max_depth=config['depth'])
+    kwargs = {}
+    if hasattr(engine, 'capture'):
+        kwargs['capture'] = CapturePolicy(max_plies=0)  # only the root is needed
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if config['time_limit'] is None:
+            return engine.best_move(**kwargs)
+
+        control = SearchControl(deadline=time.time() + config['time_limit'])
+        move, _, _ = iterative_deepening(engine, config['depth'], control, **kwargs)
+        return move
+
+
+# ------------------------------
+# Playing one game (runs in a worker process)
+# ------------------------------
+def play_game(task):
+    """
+    Play one game from the task's opening until the first connected four.
+
+    The player who completes the first four wins; a full board without
+    one is a draw. The GUI plays on to a full board and counts fours, but
+    the minimax engines treat a four as the end of the game and only play
+    a fallback move after it, so games past the first four would measure
+    that fallback rather than the engines. A move into a full column
+    forfeits the game.
+    """
+    players = {1: task['player1'], 2: task['player2']}
+    game = Connect4()
+    for col in task['opening']:
+        game.play(col)
+
+    moves = list(task['opening'])
+    think_time = {1: 0.0, 2: 0.0}
+    forfeit = None
+
+    while (game.score_1 == 0 and game.score_2 == 0
+           and any(game.board[col][game.length - 1] == 0 for col in range(game.width))):
+        player = game.turn
+        start_time = time.time()
+        col = choose_move(players[player], game)
+        think_time[player] += time.time() - start_time
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            illegal = game.play(col)
+        if illegal == 1:
+            forfeit = player
+            break
+        moves.append(col)
+
+    if forfeit is not None:
+        winner = 3 - forfeit
+    elif game.score_1 > game.score_2:
+        winner = 1
+    elif game.score_2 > game.score_1:
+        winner = 2
+    else:
+        winner = 0
+
+    return {
+        'game_id': task['game_id'],
+        'player1': players[1]['name'],
+        'player2': players[2]['name'],
+        'opening': task['opening'],
+        'moves': ''.join(str(m) for m in moves),
+        'score_1': game.score_1,
+        'score_2': game.score_2,
+        'winner': winner,
+        'forfeit': forfeit,
+        'think_time_1': think_time[1],
+        'think_time_2': think_time[2],
+        'pid': os.getpid()
+    }
+
+
+def random_opening(rng, plies):
+    game = Connect4()
+    opening = []
+    for _ in range(plies):
+        col = rng.choice([c for c in range(game.width) if game.board[c][game.length - 1] == 0])
+        game.play(col)
+        opening.append(col)
+    return opening
+
+
+def make_tasks(players, games_per_pair, opening_plies=2, seed=0):
+    """
+    Round robin: every pair plays games_per_pair games. Each random
+    opening is played twice with the colours swapped, so deterministic
+    engines do not replay the same game.
+    """
+    rng = random.Random(seed)
+    tasks = []
+    for a, b in itertools.combinations(players, 2):
+        for i in range(games_per_pair):
+            if i % 2 == 0:
+                opening = random_opening(rng, opening_plies)
+            first, second = (a, b) if i % 2 == 0 else (b, a)
+            tasks.append({'game_id': len(tasks), 'player1': first, 'player2': second,
+                          'opening': opening})
+    return tasks
+
+
+# ------------------------------
+# Statistics
+# ------------------------------
+def wilson_interval(score, n, z=1.96):
+    """Wilson score interval for a win rate (draws count as half a win)"""
+    if n == 0:
+        return 0.0, 1.0
+    centre = (score + z * z / (2 * n)) / (1 + z * z / n)
+    margin = z * math.sqrt(score * (1 - score) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def elo_difference(score):
+    """Elo difference implied by a score; infinite scores are clamped"""
+    score = min(max(score, 1e-3), 1 - 1e-3)
+    return -400 * math.log10(1 / score - 1)
+
+
+def pair_results(results):
+    """Win/draw/loss of the first-named player of every pair"""
+    pairs = {}
+    for r in results:
+        a, b = sorted((r['player1'], r['player2']))
+        p = pairs.setdefault((a, b), {'wins': 0, 'draws': 0, 'losses': 0})
+        if r['winner'] == 0:
+            p['draws'] += 1
+        elif (r['player1'] if r['winner'] == 1 else r['player2']) == a:
+            p['wins'] += 1
+        else:
+            p['losses'] += 1
+
+    for p in pairs.values():
+        n = p['wins'] + p['draws'] + p['losses']
+        p['games'] = n
+        p['score'] = (p['wins'] + 0.5 * p['draws']) / n if n else 0.0
+        p['score_interval'] = wilson_interval(p['score'], n)
+        p['elo'] = elo_difference(p['score'])
+        p['elo_interval'] = tuple(elo_difference(s) for s in p['score_interval'])
+    return pairs
+
+
+def elo_ratings(results, iterations=100, anchor=1500):
+    """
+    Fit one Elo rating per player to all games (mean rating = anchor).
+    Every player also gets one virtual draw against the anchor, so an
+    unbeaten player gets a finite rating.
+    """
+    players = sorted({r['player1'] for r in results} | {r['player2'] for r in results})
+    ratings = {p: 0.0 for p in players}
+
+    def expected(a, b):
+        return 1 / (1 + 10 ** ((b - a) / 400))
+
+    for _ in range(iterations):
+        gradient = {p: 0.5 - expected(ratings[p], 0.0) for p in players}
+        curvature = {p: expected(ratings[p], 0.0) * (1 - expected(ratings[p], 0.0)) for p in players}
+
+        for r in results:
+            a, b = r['player1'], r['player2']
+            e = expected(ratings[a], ratings[b])
+            actual = 1.0 if r['winner'] == 1 else 0.0 if r['winner'] == 2 else 0.5
+            gradient[a] += actual - e
+            gradient[b] -= actual - e
+            curvature[a] += e * (1 - e)
+            curvature[b] += e * (1 - e)
+
+        # Newton step per player, in Elo points
+        for p in players:
+            step = 400 / math.log(10) * gradient[p] / curvature[p]
+            ratings[p] += max(-100.0, min(100.0, step))
+
+    mean = sum(ratings.values()) / len(ratings) if ratings else 0.0
+    return {p: anchor + r - mean for p, r in ratings.items()}
+
+
+# ------------------------------
+# Running a tournament
+# ------------------------------
+def run_tournament(players, games_per_pair=10, workers=None, output='tournament_results.jsonl',
+                   opening_plies=2, seed=0, max_in_flight=None):
+    """
+    Play the round robin on a process pool and stream one JSON line per
+    finished game to output. Returns the list of game results.
+    """
+    tasks = make_tasks(players, games_per_pair, opening_plies, seed)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    results = []
+
+    print(f"Playing {len(tasks)} games on {workers} worker(s)...")
+    start_time = time.time()
+
+    with open(output, 'w') as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        task_iter = iter(tasks)
+
+        while True:
+            # Keep a bounded number of games queued
+            for task in itertools.islice(task_iter, max_in_flight - len(pending)):
+                pending.add(pool.submit(play_game, task))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                print(f"  Game {result['game_id']:>4}: {result['player1']} vs {result['player2']} -> "
+                      f"{result['score_1']}:{result['score_2']} "
+                      f"({'draw' if result['winner'] == 0 else 'P' + str(result['winner'])})")
+
+    print(f"Finished in {time.time() - start_time:.1f} seconds, results in {output}")
+    return results
+
+
+def print_summary(results):
+    print("\n" + "=" * 90)
+    print(f"{'Pairing':<50} {'W-D-L':>11} {'Score':>7} {'95% CI':>15} {'Elo':>6}")
+    print("=" * 90)
+    for (a, b), p in pair_results(results).items():
+        low, high = p['score_interval']
+        print(f"{a + ' vs ' + b:<50} {p['wins']:>3}-{p['draws']}-{p['losses']:<3} "
+              f"{p['score']:>7.1%} {low:>7.1%}-{high:<7.1%} {p['elo']:>+6.0f}")
+
+    print("-" * 90)
+    for name, rating in sorted(elo_ratings(results).items(), key=lambda item: -item[1]):
+        print(f"  {name:<48} Elo {rating:.0f}")
+    print("=" * 90)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Self-play tournament between engine configurations")
+    parser.add_argument('players', nargs='+',
+                        help="ENGINE:DEPTH[:TIME_LIMIT[:HEURISTIC]], e.g. Connect4AI:4 Connect4AI:2::score")
+    parser.add_argument('--games', type=int, default=10, help="games per pairing")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--opening-plies', type=int, default=2, help="random moves before the engines take over")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='tournament_results.jsonl')
+    args = parser.parse_args(argv)
+
+    players = [parse_player(spec) for spec in args.players]
+    results = run_tournament(players, args.games, args.workers, args.output,
+                             args.opening_plies, args.seed)
+    print_summary(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+def now_us():
+    """Wall clock in microseconds, comparable between processes"""
+    return time.time() * 1e6
+
+
+class Tracer:
+    def __init__(self, process_name=None):
+        """
+        Collects spans in Chrome Trace Event format.
+
+        Every event carries the process id and thread id, so traces from
+        several worker processes can be merged into one file and show up as
+        one track per worker. Open the saved file in chrome://tracing or
+        https://ui.perfetto.dev.
+        """
+        self.pid = os.getpid()
+        self.events = []
+        self.name_process(process_name or f"Connect4 search {self.pid}")
+
+    def name_process(self, name):
+        self.events.append({'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+                            'args': {'name': name}})
+
+    @contextlib.contextmanager
+    def span(self, name, cat='search', **args):
+        """
+        Record a complete ('X') event around the with block.
+        Yields the args dict, so results can be added before the span ends.
+        """
+        start = now_us()
+        try:
+            yield args
+        finally:
+            self.events.append({
+                'name': name,
+                'cat': cat,
+                'ph': 'X',
+                'ts': start,
+                'dur': now_us() - start,
+                'pid': self.pid,
+                'tid': threading.get_ident(),
+                'args': args
+            })
+
+    def instant(self, name, cat='search', **args):
+        self.events.append({'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': now_us(),
+                            'pid': self.pid, 'tid': threading.get_ident(), 'args': args})
+
+    def to_dict(self):
+        return {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+
+    def save(self, filename='search_trace.json'):
+        try:
+            with open(filename, 'w') as f:
+                json.dump(self.to_dict(), f)
+            print(f"✓ Trace saved to {filename}")
+            return True
+        except Exception as e:
+            print(f"✗ Error saving trace: {e}")
+            return False
+
+
+def merge_traces(traces, filename=None):
+    """
+    Merge traces from several processes into one.
+
+    traces: Tracer objects, trace dicts or trace file names
+    filename: optional file to save the merged trace to
+    """
+    events = []
+    for trace in traces:
+        if isinstance(trace, Tracer):
+            trace = trace.to_dict()
+        elif isinstance(trace, str):
+            with open(trace, 'r') as f:
+                trace = json.load(f)
+        events.extend(trace['traceEvents'])
+
+    merged = {'traceEvents': events, 'displayTimeUnit': 'ms'}
+    if filename is not None:
+        with open(filename, 'w') as f:
+            json.dump(merged, f)
+    return merged
+
+
+class TraceWriter:
+    def __init__(self, filename):
+        """
+        Writes a trace file as events arrive, so a long run does not keep
+        them all in memory. close() finishes the JSON.
+        """
+        self.file = open(filename, 'w')
+        self.file.write('{"displayTimeUnit": "ms", "traceEvents": [\n')
+        self.count = 0
+
+    def write(self, events):
+        for event in events:
+            if self.count:
+                self.file.write(',\n')
+            self.file.write(json.dumps(event))
+            self.count += 1
+
+    def close(self):
+        self.file.write('\n]}\n')
+        self.file.close()
+
+
+# ------------------------------
+# Engine instrumentation
+# ------------------------------
+def dropped_column(before, after):
+    """Column whose height differs between two boards"""
+    for col, (a, b) in enumerate(zip(before, after)):
+        if a != b:
+            return col
+    return None
+
+
+@contextlib.contextmanager
+def trace_engine(engine, tracer):
+    """
+    Emit spans for an engine while the with block runs:
+
+        best_move        every call, with the depth and chosen move
+        root move        the search below each move at the root
+        depth N          each iterative deepening depth (search_control)
+
+    Methods are wrapped on the engine instance only and restored on exit,
+    so an engine that is not being traced pays nothing.
+    """
+    patched = []
+
+    def wrap(name, wrapper):
+        original = getattr(engine, name)
+        setattr(engine, name, wrapper(original))
+        patched.append(name)
+
+    def trace_best_move(best_move):
+        def traced(*args, **kwargs):
+            with tracer.span('best_move', engine=type(engine).__name__,
+                             depth=engine.max_depth) as span_args:
+                move = best_move(*args, **kwargs)
+                span_args['best_move'] = move
+            return move
+        return traced
+
+    def trace_root_minimax(minimax):
+        def traced(*args, **kwargs):
+            depth = kwargs['depth'] if 'depth' in kwargs else args[1]
+            if depth != engine.max_depth - 1:
+                return minimax(*args, **kwargs)
+            board = kwargs['board'] if 'board' in kwargs else args[0]
+            col = dropped_column(engine.game.board, board)
+            with tracer.span(f"root move {col}", move=col):
+                return minimax(*args, **kwargs)
+        return traced
+
+    def trace_root_chance(expectation_value):
+        def traced(board, chosen_col, depth, *args, **kwargs):
+            if depth != engine.max_depth:
+                return expectation_value(board, chosen_col, depth, *args, **kwargs)
+            with tracer.span(f"root move {chosen_col}", move=chosen_col):
+                return expectation_value(board, chosen_col, depth, *args, **kwargs)
+        return traced
+
+    wrap('best_move', trace_best_move)
+    if hasattr(engine, 'expectation_value'):
+        wrap('expectation_value', trace_root_chance)
+    elif hasattr(engine, 'minimax'):
+        wrap('minimax', trace_root_minimax)
+    engine.tracer = tracer
+
+    try:
+        yield tracer
+    finally:
+        for name in patched:
+            delattr(engine, name)
+        engine.tracer = None
+
+
+if __name__ == "__main__":
+    from contextlib import redirect_stdout
+    from io import StringIO
+
+    from Connect4 import Connect4
+    from Connect4AI import Connect4AI_TreeSaver
+    from search_control import iterative_deepening
+
+    x = Connect4()
+    x.play(3)
+    x.play(3)
+    x.play(2)
+
+    ai = Connect4AI_TreeSaver(x, max_depth=5)
+    tracer = Tracer("Connect4AI_TreeSaver")
+
+    with trace_engine(ai, tracer), redirect_stdout(StringIO()):
+        move, _, depth = iterative_deepening(ai, ai.max_depth)
+
+    print(f"Best move: Column {move} (depth {depth})")
+    tracer.save('search_trace.json')
@@ -0,0 +1,178 @@
+from itertools import chain
+
+# Kind of value stored for a position
+EXACT = 'EXACT'   # the minimax value
+LOWER = 'LOWER'   # a beta cutoff happened: the value is at least this
+UPPER = 'UPPER'   # no move reached alpha: the value is at most this
+
+# Depth stored for won/drawn positions, good for any search depth
+TERMINAL_DEPTH = 1000
+
+# Entry fields
+DEPTH, VALUE, BOUND, BEST_MOVE, GENERATION = range(5)
+
+
+def bound_type(value, alpha, beta):
+    """Bound of a value found with the window (alpha, beta) given to the node"""
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+
+class TranspositionTable:
+    def __init__(self, max_entries=200000, persistent=None, persist_depth=2):
+        """
+        Values of searched positions, shared by consecutive searches.
+
+        max_entries: size the table is cut back from; see evict()
+        persistent: optional PersistentCache behind the table. Misses are
+                    looked up there and results are written through to it
+        persist_depth: only positions searched at least this deep go to
+                       the persistent cache, and only probes at least this
+                       deep look there, so leaves never touch the disk
+
+        Keep one table per engine (and heuristic) and pass it to every
+        search of the game. Each search calls new_search() with its root,
+        which starts a new generation. The positions below the previous
+        root that can still occur stay in the table, so the next search
+        starts warm; everything else is aged out when the table fills.
+        """
+        self.max_entries = max_entries
+        self.persistent = persistent
+        self.persist_depth = persist_depth
+        self.entries = {}
+        self.generation = 0
+        self.root = None
+        self.height = None
+        self.probes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(board, maximizing):
+        """Compact key: one byte per cell, column by column, plus the side to move"""
+        return bytes(chain.from_iterable(board)) + (b'+' if maximizing else b'-')
+
+    def new_search(self, board):
+        self.generation += 1
+        self.root = self.key(board, True)[:-1]
+        self.height = len(board[0])
+
+    # ------------------------------
+    # Lookups
+    # ------------------------------
+    def probe(self, key, depth=None):
+        """
+        The entry for key as (depth, value, bound, best_move, generation),
+        or None. depth is the remaining depth of the probing node; it
+        decides whether a miss is worth a persistent cache lookup.
+        """
+        self.probes += 1
+        entry = self.entries.get(key)
+
+        if entry is None and self.persistent is not None and (depth is None or depth >= self.persist_depth):
+            row = self.persistent.get(key)
+            if row is not None:
+                entry = row + (self.generation,)
+                self.entries[key] = entry
+                self.disk_hits += 1
+
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    @staticmethod
+    def cutoff(entry, depth, alpha=None, beta=None):
+        """
+        Value that ends the search of a node with this remaining depth and
+        window, or None if the entry is too shallow or its bound does not
+        decide the node. Without a window only EXACT values are used.
+        """
+        if entry is None or entry[DEPTH] < depth:
+            return None
+        value, bound = entry[VALUE], entry[BOUND]
+        if bound == EXACT:
+            return value
+        if bound == LOWER and beta is not None and value >= beta:
+            return value
+        if bound == UPPER and alpha is not None and value <= alpha:
+            return value
+        return None
+
+    def store(self, key, depth, value, bound=EXACT, best_move=None):
+        """
+        Save a searched position. An entry from the current search is
+        only replaced by a search at least as deep; older entries are
+        always replaced.
+        """
+        old = self.entries.get(key)
+        if old is not None and old[GENERATION] == self.generation and old[DEPTH] > depth:
+            return
+
+        self.entries[key] = (depth, value, bound, best_move, self.generation)
+        self.stores += 1
+        if self.persistent is not None and depth >= self.persist_depth:
+            self.persistent.put(key, depth, value, bound, best_move)
+        if len(self.entries) > self.max_entries:
+            self.evict()
+
+    # ------------------------------
+    # Aging
+    # ------------------------------
+    def reachable(self, key):
+        """
+        Can the position still occur below the current root? Discs never
+        move, so every column must start with the root's column.
+        """
+        root, height = self.root, self.height
+        if root is None:
+            return True
+        for start in range(0, len(root), height):
+            column = root[start:start + height]
+            filled = height - column.count(0)
+            if key[start:start + filled] != column[:filled]:
+                return False
+        return True
+
+    def evict(self):
+        """
+        Cut the table back to three quarters of max_entries: positions that
+        can no longer occur go first, then the oldest generations.
+        """
+        before = len(self.entries)
+        self.entries = {key: entry for key, entry in self.entries.items() if self.reachable(key)}
+
+        target = self.max_entries * 3 // 4
+        if len(self.entries) > target:
+            by_age = sorted(self.entries.items(), key=lambda item: item[1][GENERATION])
+            self.entries = dict(by_age[len(self.entries) - target:])
+
+        self.evictions += before - len(self.entries)
+
+    def clear(self):
+        self.entries.clear()
+        self.root = None
+
+    def summary(self):
+        """Table counters for the tree metadata"""
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'generation': self.generation,
+            'probes': self.probes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'hit_rate': self.hits / self.probes if self.probes else None,
+            'stores': self.stores,
+            'evictions': self.evictions,
+            # keys are about 75 bytes and entries 80, plus the dict slot
+            'approx_bytes': len(self.entries) * 200,
+            'persistent': self.persistent.summary() if self.persistent is not None else None
+        }
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,303 @@
+import copy
+import sys
+import tracemalloc
+
+# Searched nodes between two checks of the traced memory
+MEMORY_CHECK_INTERVAL = 256
+
+# How much of a node is kept, decided by its parent and passed down the search
+KEEP_SUBTREE = 2  # the node, and its children as keep_child() decides
+KEEP_NODE = 1     # the node only: a sibling of the principal variation
+KEEP_NONE = 0
+
+
+def node_bytes(node):
+    return sys.getsizeof(node) + sys.getsizeof(node.get('board_state', ''))
+
+
+def best_child(node):
+    for child in node.get('children', []):
+        if child.get('move') == node.get('best_move'):
+            return child
+    return None
+
+
+def has_subtree(node):
+    return bool(node.get('children')) or any('child_node' in outcome for outcome in node.get('outcomes', []))
+
+
+def research_pv(engine, node, search):
+    """
+    Search the best move of a principal variation node again to record its
+    line (see CapturePolicy.research_best) and put it in place of the
+    sibling-only node.
+
+    engine: the TreeSaver engine searching node
+    node: the recorded node whose best move is searched again
+    search: runs the engine's search of that move and returns the
+            recorded child
+
+    Capturing the principal variation this way costs one extra search
+    per PV node whose best move was not searched first. The re-search
+    leaves the transposition table out, it would answer at once, and puts
+    back the statistics, the node counter and the control's node count,
+    so total_nodes, searched_subtree and search_stats describe the real
+    search only. The re-searched nodes are numbered -1, -2, ... so their
+    ids never clash with the ones the real search goes on to use.
+    """
+    stats, tt = copy.deepcopy(engine.stats), getattr(engine, 'tt', None)
+    node_id_counter = engine.node_id_counter
+    control = engine.control
+    control_nodes = control.nodes if control is not None else 0
+    if tt is not None:
+        engine.tt = None
+    try:
+        child_node = search()
+    finally:
+        engine.stats = stats
+        engine.node_id_counter = node_id_counter
+        if control is not None:
+            control.nodes = control_nodes
+        if tt is not None:
+            engine.tt = tt
+
+    if child_node is not None:
+        engine.capture.renumber(child_node)
+    engine.capture.replace_child(node, child_node)
+
+
+class CapturePolicy:
+    def __init__(self, max_plies=None, principal_variation=False, max_nodes=None, max_bytes=None,
+                 max_memory=None, track_memory=False):
+        """
+        Decides which nodes a TreeSaver engine keeps in tree_data.
+
+        max_plies: only record nodes at most this many plies below the root
+        principal_variation: keep full detail along the principal variation
+                             only; its siblings are kept without subtrees.
+                             The search records the line it expects (the
+                             first child searched at each node, the TT move
+                             if any); where a later move turns out best,
+                             the engine searches that move again to record
+                             its line, one extra search per such node
+                             (see research_pv)
+        max_nodes: stop recording once this many nodes have been recorded
+        max_bytes: stop recording once the recorded nodes take roughly
+                   this many bytes
+        max_memory: hard ceiling on the memory allocated by the search,
+                    measured with tracemalloc and checked every
+                    MEMORY_CHECK_INTERVAL searched nodes; recording stops
+                    once it is reached
+        track_memory: measure the search with tracemalloc and report it in
+                      the summary (implied by max_memory)
+
+        The search itself is never cut short. Nodes that are not recorded
+        are still explored and counted in 'total_nodes'.
+        """
+        if max_plies is not None and max_plies < 0:
+            raise ValueError("max_plies must be 0 or more, the root is always recorded")
+        self.max_plies = max_plies
+        self.principal_variation = principal_variation
+        self.max_nodes = max_nodes
+        self.max_bytes = max_bytes
+        self.max_memory = max_memory
+        self.track_memory = track_memory or max_memory is not None
+        self.tracing = False
+        self.reset()
+
+    def reset(self):
+        """Clear the counters before a new search"""
+        self.recorded_nodes = 0
+        self.recorded_bytes = 0
+        self.budget_exhausted = False
+        self.memory_ceiling_hit = False
+        self.memory = None
+        self.memory_baseline = 0
+        self.unchecked_nodes = 0
+        self.research_ids = 0
+
+    def begin_search(self):
+        """Start measuring memory; engines call this right before searching"""
+        if not self.track_memory:
+            return
+
+        self.tracing = not tracemalloc.is_tracing()
+        if self.tracing:
+            tracemalloc.start()
+        self.memory_baseline = tracemalloc.get_traced_memory()[0]
+
+    def end_search(self):
+        """
+        Stop measuring memory; engines call this in a finally block.
+        If tracemalloc was already running, it is left running and the peak
+        may include allocations from before the search.
+        """
+        if not self.track_memory or not tracemalloc.is_tracing():
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self.tracing:
+            tracemalloc.stop()
+            self.tracing = False
+
+        retained = max(0, current - self.memory_baseline)
+        self.memory = {
+            'retained_bytes': retained,
+            'peak_bytes': max(0, peak - self.memory_baseline),
+            'bytes_per_node': retained / self.recorded_nodes if self.recorded_nodes else None
+        }
+
+    def peak_memory(self):
+        """Peak bytes allocated by the last search, None unless memory was measured"""
+        return self.memory['peak_bytes'] if self.memory is not None else None
+
+    def should_record(self, ply, keep=KEEP_SUBTREE):
+        """
+        Whether a node this many plies below the root should be recorded.
+        keep is what its parent passed down (see keep_child). The root is
+        always recorded: it comes first, before any budget runs out.
+        """
+        if keep == KEEP_NONE or self.budget_exhausted:
+            return False
+        if self.max_plies is not None and ply > self.max_plies:
+            return False
+        return True
+
+    def over_budget(self):
+        if self.max_nodes is not None and self.recorded_nodes >= self.max_nodes:
+            return True
+        return self.max_bytes is not None and self.recorded_bytes >= self.max_bytes
+
+    def keep_child(self, keep, expected_best):
+        """
+        What a child keeps, given what its parent keeps. expected_best: the
+        child is searched first, or is the best one when that is known.
+        Only a node on the principal variation gets its children recorded.
+        """
+        if keep != KEEP_SUBTREE:
+            return KEEP_NONE
+        if not self.principal_variation or expected_best:
+            return KEEP_SUBTREE
+        return KEEP_NODE
+
+    def record(self, node):
+        """Account for a recorded node and stop recording once over budget"""
+        self.recorded_nodes += 1
+        self.recorded_bytes += node_bytes(node)
+
+        if self.over_budget():
+            self.budget_exhausted = True
+
+    def check_memory(self):
+        """
+        Called once per searched node, recorded or not, through
+        SearchControl.check(); every MEMORY_CHECK_INTERVAL nodes the traced
+        memory is compared with max_memory and recording stops once it is
+        reached.
+        """
+        if self.max_memory is None or self.memory_ceiling_hit:
+            return
+        self.unchecked_nodes += 1
+        if self.unchecked_nodes < MEMORY_CHECK_INTERVAL or not tracemalloc.is_tracing():
+            return
+
+        self.unchecked_nodes = 0
+        if tracemalloc.get_traced_memory()[0] - self.memory_baseline >= self.max_memory:
+            self.budget_exhausted = True
+            self.memory_ceiling_hit = True
+
+    def research_best(self, node, keep):
+        """
+        Whether the engine must search the best move of a recorded node
+        again: in principal variation mode, when the best move was not the
+        one searched first, only its own node was recorded. The engine
+        searches it again with research_pv().
+        """
+        if not self.principal_variation or keep != KEEP_SUBTREE or node is None:
+            return False
+        best = best_child(node)
+        return best is not None and not best.get('terminal') and not has_subtree(best)
+
+    def renumber(self, node):
+        """Give a re-searched subtree ids of its own, counting down from -1"""
+        ids = {}
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self.research_ids += 1
+            ids[current['id']] = current['id'] = -self.research_ids
+            if current is not node:
+                current['parent_id'] = ids[current['parent_id']]
+            stack.extend(current.get('children', []))
+            stack.extend(outcome['child_node'] for outcome in current.get('outcomes', [])
+                         if 'child_node' in outcome)
+
+    def replace_child(self, node, child_node):
+        """Put a searched-again child in place of its sibling-only node"""
+        if child_node is None:
+            return  # over budget: the sibling-only node stays, marked 'trimmed'
+        for i, child in enumerate(node['children']):
+            if child.get('move') == child_node.get('move'):
+                self.forget(child)
+                node['children'][i] = child_node
+                return
+
+    def finish_node(self, node):
+        """
+        Called once a recorded MAX/MIN node knows its best move.
+        In principal variation mode this only matters when the best move
+        was not the one searched first: that child's subtree is dropped
+        and no longer counts against the budgets. Engines store the
+        node's 'recorded_subtree' after this call.
+        """
+        if not self.principal_variation:
+            return
+
+        for child in node.get('children', []):
+            if child is best_child(node):
+                if not has_subtree(child) and not child.get('terminal'):
+                    child['trimmed'] = True  # recording stopped before it
+                continue
+
+            for grandchild in child.get('children', []):
+                self.forget(grandchild)
+            if child.get('children'):
+                child['children'] = []
+                child['trimmed'] = True
+
+            for outcome in child.get('outcomes', []):
+                grandchild = outcome.pop('child_node', None)
+                if grandchild is not None:
+                    self.forget(grandchild)
+                    child['trimmed'] = True
+            if child.get('trimmed') and 'recorded_subtree' in child:
+                child['recorded_subtree'] = 1
+
+    def forget(self, node):
+        """Take a dropped subtree off the recorded counters"""
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            self.recorded_nodes -= 1
+            self.recorded_bytes -= node_bytes(current)
+            stack.extend(current.get('children', []))
+            stack.extend(outcome['child_node'] for outcome in current.get('outcomes', [])
+                         if 'child_node' in outcome)
+
+        if self.budget_exhausted and not self.memory_ceiling_hit:
+            self.budget_exhausted = self.over_budget()
+
+    def summary(self):
+        """Capture settings and counters for the tree metadata"""
+        return {
+            'max_plies': self.max_plies,
+            'principal_variation': self.principal_variation,
+            'max_nodes': self.max_nodes,
+            'max_bytes': self.max_bytes,
+            'recorded_nodes': self.recorded_nodes,
+            'recorded_bytes': self.recorded_bytes,
+            'budget_exhausted': self.budget_exhausted,
+            'max_memory': self.max_memory,
+            'memory_ceiling_hit': self.memory_ceiling_hit,
+            'memory': self.memory
+        }
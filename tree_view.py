@@ -0,0 +1,874 @@
+import bisect
+import time
+import tkinter as tk
+
+
+# Layout units before zoom is applied
+SLOT_WIDTH = 140
+LEVEL_HEIGHT = 110
+BOX_WIDTH = 110
+BOX_HEIGHT = 60
+HEADER_HEIGHT = 80
+
+# Below this zoom level rows are drawn as heat strips instead of node boxes
+LOD_ZOOM = 0.5
+# Width of one heat strip cell in screen pixels
+LOD_BUCKET = 6
+# Time spent drawing before handing control back to Tk
+BATCH_SECONDS = 0.012
+
+
+def visible_children(node):
+    """Children of a saved tree node as (child, probability) pairs, pruned ones left out"""
+    if node.get('node_type') == 'CHANCE' and 'outcomes' in node:
+        children = [(outcome['child_node'], outcome.get('probability', 0))
+                    for outcome in node.get('outcomes', []) if 'child_node' in outcome]
+    else:
+        children = [(child, None) for child in node.get('children', [])]
+    return [(child, prob) for child, prob in children if not child.get('pruned', False)]
+
+
+def recorded_subtree(node):
+    """
+    Number of recorded nodes in a subtree, including the node itself.
+
+    Engines store it as 'recorded_subtree' while capturing, next to
+    'searched_subtree', the nodes they searched including the ones the
+    capture policy did not record. Trees loaded from older JSON files
+    lack the field and are counted once.
+    """
+    if 'recorded_subtree' in node:
+        return node['recorded_subtree']
+
+    count = 0
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        count += 1
+        stack.extend(current.get('children', []))
+        stack.extend(outcome['child_node'] for outcome in current.get('outcomes', [])
+                     if 'child_node' in outcome)
+
+    node['recorded_subtree'] = count
+    return count
+
+
+class TreeLayout:
+    def __init__(self, root, expanded=None):
+        """
+        Node positions of a saved search tree, computed once into flat lists.
+
+        Every node gets an index; xs/ys hold its centre in layout units
+        (multiply by the zoom level for canvas coordinates). rows[d] lists
+        the indices at depth d from left to right, with row_xs[d] holding
+        their x positions so visible nodes can be found with bisect.
+        index maps node ids to indices, so renderers and exporters can
+        look positions up by id.
+
+        expanded: ids of the nodes whose children are laid out, or None to
+                  lay out the whole tree. collapsed[i] is True for nodes
+                  whose children were left out.
+        """
+        self.expanded = expanded
+        self.nodes = []
+        self.xs = []
+        self.ys = []
+        self.parents = []
+        self.probs = []
+        self.children = []
+        self.levels = []
+        self.collapsed = []
+        self.index = {}
+        self.rows = []
+        self.row_xs = []
+
+        self.leaf_count = 0
+        self.place(root)
+
+        for row in self.rows:
+            self.row_xs.append([self.xs[i] for i in row])
+
+        self.width = max(1, self.leaf_count) * SLOT_WIDTH
+        self.height = max(1, len(self.rows)) * LEVEL_HEIGHT
+
+    def place(self, root):
+        """
+        Two linear passes without recursion. A pre-order walk numbers the
+        nodes, fills the rows from left to right and puts the leaves in
+        order; walking the indices backwards then visits every child
+        before its parent, which is centred over its first and last child.
+        """
+        nodes_append = self.nodes.append
+        xs = self.xs
+        xs_append = xs.append
+        ys_append = self.ys.append
+        parents_append = self.parents.append
+        probs_append = self.probs.append
+        children = self.children
+        children_append = children.append
+        levels_append = self.levels.append
+        collapsed_append = self.collapsed.append
+        index = self.index
+        rows = self.rows
+        expanded = self.expanded
+        half_level = LEVEL_HEIGHT / 2
+        half_slot = SLOT_WIDTH / 2
+
+        i = 0
+        stack = [(root, 0, -1, None)]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node, level, parent, prob = pop()
+
+            nodes_append(node)
+            ys_append(level * LEVEL_HEIGHT + half_level)
+            parents_append(parent)
+            probs_append(prob)
+            children_append([])
+            levels_append(level)
+            index[node.get('id', i)] = i
+
+            if level == len(rows):
+                rows.append([])
+            rows[level].append(i)
+            if parent >= 0:
+                children[parent].append(i)
+
+            if node.get('node_type') == 'CHANCE':
+                kids = visible_children(node)
+            else:
+                kids = [(child, None) for child in node.get('children', ())
+                        if not child.get('pruned', False)]
+
+            is_collapsed = bool(kids) and expanded is not None and node.get('id') not in expanded
+            collapsed_append(is_collapsed)
+
+            if not kids or is_collapsed:
+                xs_append(self.leaf_count * SLOT_WIDTH + half_slot)
+                self.leaf_count += 1
+            else:
+                xs_append(0.0)
+                # Push in reverse so the leftmost child is numbered first
+                level += 1
+                for child, child_prob in reversed(kids):
+                    push((child, level, i, child_prob))
+            i += 1
+
+        for i in range(i - 1, -1, -1):
+            kids = children[i]
+            if kids:
+                xs[i] = (xs[kids[0]] + xs[kids[-1]]) / 2
+
+    def position(self, node_id):
+        """Centre of a node in layout units, looked up by node id"""
+        i = self.index[node_id]
+        return self.xs[i], self.ys[i]
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def nodes_in(self, level, x0, x1):
+        """Indices at a depth whose centre lies between x0 and x1 (layout units)"""
+        xs = self.row_xs[level]
+        lo = bisect.bisect_left(xs, x0)
+        hi = bisect.bisect_right(xs, x1)
+        return self.rows[level][lo:hi], lo, hi
+
+    def node_at(self, x, y):
+        """Index of the node box containing a point in layout units, or None"""
+        level = int(y // LEVEL_HEIGHT)
+        if y < 0 or level >= len(self.rows):
+            return None
+        if abs(y - (level * LEVEL_HEIGHT + LEVEL_HEIGHT / 2)) > BOX_HEIGHT / 2:
+            return None
+
+        hits, _, _ = self.nodes_in(level, x - BOX_WIDTH / 2, x + BOX_WIDTH / 2)
+        return hits[0] if hits else None
+
+
+class VirtualTreeView:
+    def __init__(self, canvas, colors):
+        """
+        Draws a TreeLayout on a canvas, but only the nodes and edges that
+        intersect the visible part of the scroll region. Canvas items of
+        nodes that scroll out of view are hidden and reused for the nodes
+        that scroll in, so the number of items stays proportional to the
+        window size rather than the tree size.
+
+        A new tree starts with only the root expanded; toggle() expands a
+        node, and only expanded subtrees are laid out. Collapsed nodes show
+        a badge with their recorded and searched node counts and best move.
+
+        Below LOD_ZOOM each row is drawn as a heat strip: one cell per few
+        screen pixels, shaded by how many nodes it covers, plus a label
+        with the node count and value range of the visible part.
+
+        Items are drawn progressively, nearest to the root first, in time
+        slices scheduled with after() so the window stays responsive. Every
+        refresh and every new tree takes a new render token; batches that
+        belong to an older token stop drawing.
+        """
+        self.canvas = canvas
+        self.colors = colors
+        self.root = None
+        self.layout = None
+        self.expanded = set()
+        self.zoom = 1.0
+
+        self.drawn_nodes = {}
+        self.drawn_edges = {}
+        self.pools = {'node': [], 'edge': [], 'chance_edge': []}
+        self.refresh_pending = False
+        self.render_token = 0
+        self.render_queue = []
+
+        # Level of detail: heat strip items and per-row bucket summaries
+        self.lod_items = []
+        self.lod_used = 0
+        self.bucket_cache = {}
+
+    # ------------------------------
+    # Coordinates
+    # ------------------------------
+    def to_canvas(self, x, y):
+        return x * self.zoom, HEADER_HEIGHT + y * self.zoom
+
+    def viewport(self):
+        """Visible canvas area in layout units, with a small margin"""
+        c = self.canvas
+        left, top = c.canvasx(0), c.canvasy(0)
+        right = left + max(c.winfo_width(), 1)
+        bottom = top + max(c.winfo_height(), 1)
+
+        margin = BOX_WIDTH
+        return ((left / self.zoom) - margin,
+                ((top - HEADER_HEIGHT) / self.zoom) - margin,
+                (right / self.zoom) + margin,
+                ((bottom - HEADER_HEIGHT) / self.zoom) + margin)
+
+    # ------------------------------
+    # Public API
+    # ------------------------------
+    def set_tree(self, root):
+        """Show a new tree with only the root expanded"""
+        self.clear()
+        self.root = root
+        self.layout = None
+        if root is None:
+            return
+        self.expanded = {root.get('id', 0)}
+        self.relayout()
+
+    def relayout(self):
+        """Lay out the expanded part of the tree again and redraw the view"""
+        self.recycle_all()
+        self.bucket_cache = {}
+        self.layout = TreeLayout(self.root, self.expanded)
+        self.update_scrollregion()
+        self.refresh()
+
+    def toggle(self, i):
+        """Expand or collapse the children of a node, keeping it in place on screen"""
+        layout = self.layout
+        node = layout.nodes[i]
+        node_id = node.get('id')
+
+        if self.expanded is None:
+            # Everything was expanded; remember that explicitly
+            self.expanded = {layout.nodes[k].get('id') for k in range(len(layout))
+                             if layout.children[k]}
+
+        if layout.collapsed[i]:
+            self.expanded.add(node_id)
+        elif node_id in self.expanded and layout.children[i]:
+            self.expanded.discard(node_id)
+        else:
+            return
+
+        before = self.to_canvas(layout.xs[i], layout.ys[i])
+        self.recycle_all()
+        self.bucket_cache = {}
+        self.layout = TreeLayout(self.root, self.expanded)
+        j = self.layout.index[node_id]
+        after = self.to_canvas(self.layout.xs[j], self.layout.ys[j])
+
+        self.update_scrollregion()
+        self.scroll_by(after[0] - before[0], after[1] - before[1])
+        self.refresh()
+
+    def expand_all(self):
+        if self.root is None:
+            return
+        self.expanded = None
+        self.relayout()
+
+    def collapse_all(self):
+        if self.root is None:
+            return
+        self.expanded = {self.root.get('id', 0)}
+        self.relayout()
+
+    def node_at(self, canvas_x, canvas_y):
+        """Index of the node drawn at a canvas position, or None"""
+        if self.layout is None or self.zoom < LOD_ZOOM:
+            return None
+        return self.layout.node_at(canvas_x / self.zoom, (canvas_y - HEADER_HEIGHT) / self.zoom)
+
+    def scroll_by(self, dx, dy):
+        """Scroll the canvas by a distance in canvas pixels"""
+        c = self.canvas
+        left, top, right, bottom = [float(v) for v in str(c.cget('scrollregion')).split()]
+        width = max(right - left, 1)
+        height = max(bottom - top, 1)
+        c.xview_moveto((c.canvasx(0) + dx - left) / width)
+        c.yview_moveto((c.canvasy(0) + dy - top) / height)
+
+    def set_zoom(self, zoom):
+        """
+        Zoom around the centre of the view by scaling the existing canvas
+        items and swapping their fonts; only nodes that come into view are
+        drawn from scratch.
+        """
+        if zoom == self.zoom:
+            return
+
+        c = self.canvas
+        factor = zoom / self.zoom
+        centre_x = c.canvasx(c.winfo_width() / 2)
+        centre_y = c.canvasy(c.winfo_height() / 2)
+
+        old_zoom = self.zoom
+        self.zoom = zoom
+        self.bucket_cache = {}
+
+        if old_zoom < LOD_ZOOM or zoom < LOD_ZOOM:
+            # Heat strips are rebuilt for every zoom level, and crossing
+            # the threshold swaps strips for boxes or back
+            self.recycle_all()
+            self.hide_lod()
+        else:
+            c.scale('tree', 0, HEADER_HEIGHT, factor, factor)
+            self.update_fonts()
+
+        if self.layout is not None:
+            self.update_scrollregion()
+            self.scroll_by(centre_x * (factor - 1), (centre_y - HEADER_HEIGHT) * (factor - 1))
+            self.refresh()
+
+    def update_fonts(self):
+        """Give the scaled items the fonts and line widths of the new zoom level"""
+        c = self.canvas
+        fonts = self.fonts()
+
+        for role in ('title', 'value', 'badge', 'prob'):
+            c.itemconfigure(role, font=fonts[role])
+        c.itemconfigure('edge_line', width=fonts['line_width'])
+        c.itemconfigure('box', width=fonts['box_width'])
+
+        # Bottom labels depend on the node, chance labels on their text
+        for i, items in self.drawn_nodes.items():
+            terminal = self.layout.nodes[i].get('terminal', False)
+            c.itemconfigure(items[4], font=fonts['label_terminal'] if terminal else fonts['label'])
+        for kind, items in self.drawn_edges.values():
+            if kind == 'chance_edge':
+                self.fit_label(items)
+
+    def clear(self):
+        """Forget everything drawn, including the pooled items"""
+        self.render_token += 1
+        self.render_queue = []
+        self.canvas.delete('tree')
+        self.canvas.delete('lod')
+        self.drawn_nodes = {}
+        self.drawn_edges = {}
+        self.pools = {'node': [], 'edge': [], 'chance_edge': []}
+        self.lod_items = []
+        self.lod_used = 0
+        self.bucket_cache = {}
+
+    def update_scrollregion(self):
+        if self.layout is None:
+            return
+        right, bottom = self.to_canvas(self.layout.width, self.layout.height)
+        padding = 50
+        self.canvas.configure(scrollregion=(-padding, 0, right + padding, bottom + padding))
+
+    def schedule_refresh(self, event=None):
+        """Coalesce scroll and drag events into one refresh"""
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.canvas.after_idle(self.refresh)
+
+    def refresh(self):
+        """Recycle what left the view and start drawing what became visible"""
+        self.refresh_pending = False
+        self.render_token += 1
+        self.render_queue = []
+        if self.layout is None:
+            return
+
+        if self.zoom < LOD_ZOOM:
+            self.refresh_lod()
+            return
+
+        nodes, edges = self.visible_items()
+
+        for i in list(self.drawn_nodes):
+            if i not in nodes:
+                self.release('node', self.drawn_nodes.pop(i))
+        for i in list(self.drawn_edges):
+            if i not in edges:
+                kind, items = self.drawn_edges.pop(i)
+                self.release(kind, items)
+
+        # Nearest to the root first; an edge is drawn with the row it leads to
+        levels = self.layout.levels
+        queue = [(levels[i], 0, i) for i in edges if i not in self.drawn_edges]
+        queue += [(levels[i], 1, i) for i in nodes if i not in self.drawn_nodes]
+        queue.sort(reverse=True)
+        self.render_queue = queue
+
+        self.draw_batch(self.render_token)
+
+    def draw_batch(self, token):
+        """Draw queued items for one time slice, then reschedule the rest"""
+        if token != self.render_token:
+            return  # a newer refresh or tree took over
+
+        queue = self.render_queue
+        deadline = time.perf_counter() + BATCH_SECONDS
+        while queue:
+            _, kind, i = queue.pop()
+            if kind == 0:
+                if i not in self.drawn_edges:
+                    self.draw_edge(i)
+            elif i not in self.drawn_nodes:
+                self.draw_node(i)
+
+            if time.perf_counter() >= deadline:
+                break
+
+        self.canvas.tag_raise('node')
+        if queue:
+            self.canvas.after(1, self.draw_batch, token)
+
+    # ------------------------------
+    # Level of detail
+    # ------------------------------
+    def row_buckets(self, level):
+        """
+        Node count and value range per heat strip cell of a row, as sorted
+        cell numbers and matching [count, min, max] lists. Computed once
+        per zoom level.
+        """
+        cached = self.bucket_cache.get(level)
+        if cached is not None:
+            return cached
+
+        layout = self.layout
+        width = LOD_BUCKET / self.zoom
+        buckets = {}
+        for i in layout.rows[level]:
+            node = layout.nodes[i]
+            value = node.get('value', node.get('expected_value', 0)) or 0
+            cell = int(layout.xs[i] // width)
+            entry = buckets.get(cell)
+            if entry is None:
+                buckets[cell] = [1, value, value]
+            else:
+                entry[0] += 1
+                if value < entry[1]:
+                    entry[1] = value
+                if value > entry[2]:
+                    entry[2] = value
+
+        cells = sorted(buckets)
+        cached = (cells, [buckets[cell] for cell in cells])
+        self.bucket_cache[level] = cached
+        return cached
+
+    def lod_item(self, kind):
+        """Reuse a heat strip item or create a new one"""
+        c = self.canvas
+        if self.lod_used < len(self.lod_items):
+            item = self.lod_items[self.lod_used]
+            if c.type(item) != kind:
+                c.delete(item)
+                item = None
+        else:
+            item = None
+            self.lod_items.append(None)
+
+        if item is None:
+            if kind == 'rectangle':
+                item = c.create_rectangle(0, 0, 0, 0, outline='', tags='lod')
+            else:
+                item = c.create_text(0, 0, anchor='w', font=("Arial", 9, "bold"),
+                                     fill='#1e40af', tags='lod')
+            self.lod_items[self.lod_used] = item
+        else:
+            c.itemconfigure(item, state='normal')
+
+        self.lod_used += 1
+        return item
+
+    def hide_lod(self):
+        for item in self.lod_items[:self.lod_used]:
+            self.canvas.itemconfigure(item, state='hidden')
+        self.lod_used = 0
+
+    def refresh_lod(self):
+        """Draw the visible rows as heat strips; the work depends on the window size only"""
+        c = self.canvas
+        layout = self.layout
+        x0, y0, x1, y1 = self.viewport()
+        width = LOD_BUCKET / self.zoom
+        cell_h = max(3, BOX_HEIGHT * self.zoom)
+        view_left = c.canvasx(0)
+
+        self.recycle_all()
+        self.hide_lod()
+
+        for level in range(len(layout.rows)):
+            row_y = level * LEVEL_HEIGHT + LEVEL_HEIGHT / 2
+            if not y0 <= row_y <= y1:
+                continue
+
+            cells, stats = self.row_buckets(level)
+            lo = bisect.bisect_left(cells, int(x0 // width))
+            hi = bisect.bisect_right(cells, int(x1 // width))
+            if lo == hi:
+                continue
+
+            densest = max(entry[0] for entry in stats[lo:hi])
+            total = 0
+            low = high = None
+            _, y = self.to_canvas(0, row_y)
+
+            for cell, (count, vmin, vmax) in zip(cells[lo:hi], stats[lo:hi]):
+                total += count
+                low = vmin if low is None else min(low, vmin)
+                high = vmax if high is None else max(high, vmax)
+
+                # Denser cells are darker
+                shade = count / densest
+                r = int(224 - shade * (224 - 55))
+                g = int(231 - shade * (231 - 48))
+                b = int(255 - shade * (255 - 163))
+
+                item = self.lod_item('rectangle')
+                left = cell * LOD_BUCKET
+                c.coords(item, left, y - cell_h / 2, left + LOD_BUCKET - 1, y + cell_h / 2)
+                c.itemconfigure(item, fill=f'#{r:02x}{g:02x}{b:02x}')
+
+            label = self.lod_item('text')
+            c.coords(label, view_left + 10, y - cell_h / 2 - 8)
+            c.itemconfigure(label, text=f"Depth {level}: {total} nodes | "
+                                        f"values {low:+.0f} .. {high:+.0f}")
+
+    # ------------------------------
+    # Visibility
+    # ------------------------------
+    def visible_items(self):
+        """
+        Indices of the nodes and edges (keyed by child index) that
+        intersect the viewport
+        """
+        layout = self.layout
+        x0, y0, x1, y1 = self.viewport()
+        nodes = set()
+        edges = set()
+
+        for level in range(len(layout.rows)):
+            row_y = level * LEVEL_HEIGHT + LEVEL_HEIGHT / 2
+            next_y = row_y + LEVEL_HEIGHT
+
+            if y0 <= row_y <= y1:
+                visible, _, _ = layout.nodes_in(level, x0, x1)
+                nodes.update(visible)
+
+            # Edges into the next row cross the band between the two rows
+            if level + 1 >= len(layout.rows) or next_y < y0 or row_y > y1:
+                continue
+
+            parents = set()
+            above, _, _ = layout.nodes_in(level, x0, x1)
+            parents.update(above)
+
+            # Children next to the view catch edges passing straight through it
+            below_row = layout.rows[level + 1]
+            _, lo, hi = layout.nodes_in(level + 1, x0, x1)
+            for j in below_row[max(0, lo - 1):hi + 1]:
+                parents.add(layout.parents[j])
+
+            for p in parents:
+                px = layout.xs[p]
+                for c in layout.children[p]:
+                    cx = layout.xs[c]
+                    if min(px, cx) <= x1 and max(px, cx) >= x0:
+                        edges.add(c)
+
+        return nodes, edges
+
+    # ------------------------------
+    # Item recycling
+    # ------------------------------
+    def acquire(self, kind):
+        pool = self.pools[kind]
+        if pool:
+            items = pool.pop()
+            for item in items:
+                self.canvas.itemconfigure(item, state='normal')
+            return items
+        return None
+
+    def release(self, kind, items):
+        for item in items:
+            self.canvas.itemconfigure(item, state='hidden')
+        self.pools[kind].append(items)
+
+    def recycle_all(self):
+        for items in self.drawn_nodes.values():
+            self.release('node', items)
+        for kind, items in self.drawn_edges.values():
+            self.release(kind, items)
+        self.drawn_nodes = {}
+        self.drawn_edges = {}
+
+    # ------------------------------
+    # Drawing
+    # ------------------------------
+    def node_style(self, node):
+        node_type = node.get('node_type', 'UNKNOWN')
+        if node_type == 'MAX':
+            return self.colors['max_node'], self.colors['max_border'], '▲'
+        elif node_type == 'MIN':
+            return self.colors['min_node'], self.colors['min_border'], '▼'
+        elif node_type == 'CHANCE':
+            return self.colors['chance_node'], self.colors['chance_border'], '◆'
+        return self.colors['leaf_node'], self.colors['leaf_border'], '●'
+
+    def fonts(self):
+        """Fonts and line widths for the current zoom level"""
+        z = self.zoom
+        return {
+            'title': ("Arial", max(9, int(10 * z)), "bold"),
+            'value': ("Arial", max(10, int(12 * z)), "bold"),
+            'label': ("Arial", max(7, int(8 * z)), "normal"),
+            'label_terminal': ("Arial", max(7, int(8 * z)), "bold"),
+            'badge': ("Arial", max(7, int(8 * z)), "bold"),
+            'prob': ("Arial", max(8, int(9 * z)), "bold"),
+            'line_width': max(1, int(2 * z)),
+            'box_width': max(2, int(3 * z))
+        }
+
+    def draw_edge(self, i):
+        layout = self.layout
+        c = self.canvas
+        p = layout.parents[i]
+        prob = layout.probs[i]
+
+        x1, y1 = self.to_canvas(layout.xs[p], layout.ys[p])
+        x2, y2 = self.to_canvas(layout.xs[i], layout.ys[i])
+        half_h = BOX_HEIGHT * self.zoom / 2
+        fonts = self.fonts()
+        line_width = fonts['line_width']
+        line = (x1, y1 + half_h, x2, y2 - half_h)
+
+        if prob is None:
+            items = self.acquire('edge')
+            if items is None:
+                # Solid line for regular nodes
+                items = (c.create_line(*line, fill=self.colors['edge'], width=line_width,
+                                       arrow=tk.LAST, arrowshape=(8, 10, 3), tags=('tree', 'edge', 'edge_line')),)
+            else:
+                c.coords(items[0], *line)
+                c.itemconfigure(items[0], width=line_width)
+            self.drawn_edges[i] = ('edge', items)
+            return
+
+        # Dashed line for chance nodes, with the probability on a white label
+        mid_x, mid_y = (x1 + x2) / 2, (y1 + y2) / 2
+        font = fonts['prob']
+        prob_text = f"{prob:.0%}"
+
+        items = self.acquire('chance_edge')
+        if items is None:
+            line_id = c.create_line(*line, fill=self.colors['chance_edge'],
+                                    width=line_width, dash=(6, 3), tags=('tree', 'edge', 'edge_line'))
+            rect_id = c.create_rectangle(0, 0, 0, 0, fill='white', outline='#f59e0b',
+                                         tags=('tree', 'edge'))
+            text_id = c.create_text(mid_x, mid_y, text=prob_text, font=font,
+                                    fill='#f59e0b', tags=('tree', 'edge', 'prob'))
+            items = (line_id, rect_id, text_id)
+        else:
+            line_id, rect_id, text_id = items
+            c.coords(line_id, *line)
+            c.itemconfigure(line_id, width=line_width)
+            c.coords(text_id, mid_x, mid_y)
+            c.itemconfigure(text_id, text=prob_text, font=font)
+
+        self.fit_label(items)
+        self.drawn_edges[i] = ('chance_edge', items)
+
+    def fit_label(self, items):
+        """Size the white box behind a probability label to its text"""
+        _, rect_id, text_id = items
+        bbox = self.canvas.bbox(text_id)
+        if bbox:
+            self.canvas.coords(rect_id, bbox[0] - 2, bbox[1] - 1, bbox[2] + 2, bbox[3] + 1)
+
+    def node_texts(self, node):
+        """Title, value and bottom label of a node box"""
+        move_str = f"Col {node.get('move')}" if node.get('move') is not None else "ROOT"
+        _, _, symbol = self.node_style(node)
+        title = f"{symbol} {move_str}"
+
+        value = node.get('value', node.get('expected_value', 0))
+        if value is None:
+            value = 0
+        value_text = f"{value:+.2f}" if abs(value) < 100 else f"{value:+.0f}"
+
+        if node.get('terminal', False):
+            term_type = node.get('terminal_type', 'T')
+            term_label = {'W': 'WIN', 'L': 'LOSE', 'D': 'DRAW', 'T': 'TERM'}.get(term_type, term_type)
+            label = f"[{term_label}]"
+        else:
+            # Show depth for non-terminal nodes
+            label = f"d:{node.get('depth', '?')}"
+
+        return title, value_text, label
+
+    def badge_text(self, i):
+        """Summary shown under a collapsed node"""
+        if not self.layout.collapsed[i]:
+            return ""
+        node = self.layout.nodes[i]
+        text = f"▸ {recorded_subtree(node) - 1} nodes"
+        if 'searched_subtree' in node:
+            text += f" of {node['searched_subtree'] - 1} searched"
+        if node.get('best_move') is not None:
+            text += f" | best Col {node['best_move']}"
+        return text
+
+    def draw_node(self, i):
+        layout = self.layout
+        c = self.canvas
+        node = layout.nodes[i]
+        z = self.zoom
+
+        x, y = self.to_canvas(layout.xs[i], layout.ys[i])
+        fill_color, outline_color, _ = self.node_style(node)
+        title, value_text, label = self.node_texts(node)
+
+        box_w = BOX_WIDTH * z
+        box_h = BOX_HEIGHT * z
+        shadow = max(2, int(3 * z))
+
+        shadow_box = (x - box_w / 2 + shadow, y - box_h / 2 + shadow,
+                      x + box_w / 2 + shadow, y + box_h / 2 + shadow)
+        box = (x - box_w / 2, y - box_h / 2, x + box_w / 2, y + box_h / 2)
+        title_pos = (x, y - box_h / 2 + 15 * z)
+        value_pos = (x, y + 3 * z)
+        label_pos = (x, y + box_h / 2 - 10 * z)
+        badge_pos = (x, y + box_h / 2 + 10 * z)
+        badge = self.badge_text(i)
+
+        fonts = self.fonts()
+        title_font = fonts['title']
+        value_font = fonts['value']
+        label_font = fonts['label_terminal'] if node.get('terminal', False) else fonts['label']
+        label_color = '#6b7280' if node.get('terminal', False) else '#9ca3af'
+        badge_font = fonts['badge']
+
+        items = self.acquire('node')
+        if items is None:
+            tags = ('tree', 'node')
+            items = (
+                c.create_rectangle(*shadow_box, fill='#d1d5db', outline='', tags=tags),
+                c.create_rectangle(*box, fill=fill_color, outline=outline_color,
+                                   width=fonts['box_width'], tags=tags + ('box',)),
+                c.create_text(*title_pos, text=title, font=title_font, fill=outline_color,
+                              tags=tags + ('title',)),
+                c.create_text(*value_pos, text=value_text, font=value_font, fill='#059669',
+                              tags=tags + ('value',)),
+                c.create_text(*label_pos, text=label, font=label_font, fill=label_color, tags=tags),
+                c.create_text(*badge_pos, text=badge, font=badge_font, fill='#7c3aed',
+                              tags=tags + ('badge',))
+            )
+        else:
+            shadow_id, box_id, title_id, value_id, label_id, badge_id = items
+            c.coords(shadow_id, *shadow_box)
+            c.coords(box_id, *box)
+            c.itemconfigure(box_id, fill=fill_color, outline=outline_color, width=fonts['box_width'])
+            c.coords(title_id, *title_pos)
+            c.itemconfigure(title_id, text=title, font=title_font, fill=outline_color)
+            c.coords(value_id, *value_pos)
+            c.itemconfigure(value_id, text=value_text, font=value_font)
+            c.coords(label_id, *label_pos)
+            c.itemconfigure(label_id, text=label, font=label_font, fill=label_color)
+            c.coords(badge_id, *badge_pos)
+            c.itemconfigure(badge_id, text=badge, font=badge_font)
+
+        self.drawn_nodes[i] = items
+
+
+def save_tree_svg(layout, filename, colors):
+    """
+    Write a laid out tree to an SVG file, reusing the layout arrays.
+    Only the expanded part of the tree is exported.
+    """
+    from xml.sax.saxutils import escape
+
+    width = layout.width
+    height = layout.height
+    half_w = BOX_WIDTH / 2
+    half_h = BOX_HEIGHT / 2
+
+    styles = {
+        'MAX': (colors['max_node'], colors['max_border'], '▲'),
+        'MIN': (colors['min_node'], colors['min_border'], '▼'),
+        'CHANCE': (colors['chance_node'], colors['chance_border'], '◆')
+    }
+    leaf_style = (colors['leaf_node'], colors['leaf_border'], '●')
+
+    try:
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                    f'font-family="Arial" text-anchor="middle">\n')
+
+            # Edges first so the boxes cover their ends
+            for i in range(1, len(layout)):
+                p = layout.parents[i]
+                x1, y1 = layout.xs[p], layout.ys[p] + half_h
+                x2, y2 = layout.xs[i], layout.ys[i] - half_h
+                if layout.probs[i] is None:
+                    f.write(f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
+                            f'stroke="{colors["edge"]}" stroke-width="2"/>\n')
+                else:
+                    f.write(f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" '
+                            f'stroke="{colors["chance_edge"]}" stroke-width="2" stroke-dasharray="6,3"/>\n')
+                    f.write(f'<text x="{(x1 + x2) / 2}" y="{(y1 + y2) / 2}" font-size="9" '
+                            f'fill="#f59e0b">{layout.probs[i]:.0%}</text>\n')
+
+            for i, node in enumerate(layout.nodes):
+                x, y = layout.xs[i], layout.ys[i]
+                fill, outline, symbol = styles.get(node.get('node_type'), leaf_style)
+                move_str = f"Col {node.get('move')}" if node.get('move') is not None else "ROOT"
+                value = node.get('value', node.get('expected_value', 0)) or 0
+                value_text = f"{value:+.2f}" if abs(value) < 100 else f"{value:+.0f}"
+
+                f.write(f'<rect x="{x - half_w}" y="{y - half_h}" width="{BOX_WIDTH}" height="{BOX_HEIGHT}" '
+                        f'fill="{fill}" stroke="{outline}" stroke-width="3"/>\n')
+                f.write(f'<text x="{x}" y="{y - half_h + 18}" font-size="10" font-weight="bold" '
+                        f'fill="{outline}">{escape(symbol + " " + move_str)}</text>\n')
+                f.write(f'<text x="{x}" y="{y + 8}" font-size="12" font-weight="bold" '
+                        f'fill="#059669">{value_text}</text>\n')
+
+            f.write('</svg>\n')
+        print(f"✓ Tree saved to {filename}")
+        return True
+    except Exception as e:
+        print(f"✗ Error saving tree: {e}")
+        return False